@@ -0,0 +1,212 @@
+'''
+Attendance Analytics
+Vectorized attendance statistics over NumPy column arrays
+'''
+
+import numpy as np
+from typing import Dict, List, Optional
+from attendance_database import AttendanceDatabase, day_number
+
+SECONDS_PER_DAY = 86400
+
+class AttendanceColumns:
+    def __init__(self, names: List[str], codes: np.ndarray, days: np.ndarray,
+                 check_in_ts: np.ndarray, hours: np.ndarray):
+        """Attendance rows as parallel arrays
+
+        codes index into names, days are day numbers (days since 1970-01-01),
+        arrivals are check-in seconds after midnight and hours the worked
+        hours; missing values are NaN.
+        """
+        self.names = names
+        self.codes = codes
+        self.days = days
+        self.arrivals = check_in_ts - days * SECONDS_PER_DAY
+        self.hours = hours
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+def load_columns(db: AttendanceDatabase, start_date: str = None, end_date: str = None,
+                 employee_name: str = None, batch_size: int = 100000) -> AttendanceColumns:
+    """Load attendance into column arrays, one batch at a time"""
+    index = {}
+    codes, days, check_ins, hours = [], [], [], []
+    for rows in db.iter_attendance_batches(['name', 'day_number', 'check_in_ts', 'total_hours'],
+                                           start_date, end_date, employee_name, batch_size):
+        batch_names, batch_days, batch_check_ins, batch_hours = zip(*rows)
+        codes.append(np.fromiter((index.setdefault(name, len(index)) for name in batch_names),
+                                 dtype=np.int64, count=len(rows)))
+        # None becomes NaN in float arrays
+        days.append(np.array(batch_days, dtype=np.float64))
+        check_ins.append(np.array(batch_check_ins, dtype=np.float64))
+        hours.append(np.array(batch_hours, dtype=np.float64))
+
+    if not codes:
+        empty = np.empty(0)
+        return AttendanceColumns([], empty.astype(np.int64), empty.astype(np.int64), empty, empty)
+
+    days = np.concatenate(days)
+    valid = ~np.isnan(days)
+    return AttendanceColumns(
+        list(index),
+        np.concatenate(codes)[valid],
+        days[valid].astype(np.int64),
+        np.concatenate(check_ins)[valid],
+        np.concatenate(hours)[valid]
+    )
+
+def format_clock(seconds: float) -> str:
+    """Seconds after midnight as HH:MM:SS"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def parse_clock(value: str) -> int:
+    """HH:MM or HH:MM:SS as seconds after midnight"""
+    parts = [int(part) for part in value.split(':')]
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) > 2 else 0)
+
+def monthly_hours(columns: AttendanceColumns) -> List[Dict]:
+    """Hours worked and days attended per employee and month"""
+    if not len(columns):
+        return []
+
+    months = columns.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    first_month = months.min()
+    span = int(months.max() - first_month + 1)
+    keys = columns.codes * span + (months - first_month)
+    size = len(columns.names) * span
+
+    days_attended = np.bincount(keys, minlength=size)
+    hours_worked = np.bincount(keys, weights=np.nan_to_num(columns.hours), minlength=size)
+
+    present = np.flatnonzero(days_attended)
+    codes, offsets = np.divmod(present, span)
+    return [
+        {
+            'name': columns.names[code],
+            'month': str(np.datetime64(int(first_month + offset), 'M')),
+            'hours': round(float(hours_worked[key]), 2),
+            'days': int(days_attended[key])
+        }
+        for key, code, offset in zip(present, codes, offsets)
+    ]
+
+def arrival_distribution(columns: AttendanceColumns, bin_minutes: int = 15) -> Dict:
+    """Histogram and percentiles of check-in times, plus each employee's median"""
+    valid = ~np.isnan(columns.arrivals)
+    arrivals = columns.arrivals[valid]
+    if not len(arrivals):
+        return {'count': 0, 'bin_minutes': bin_minutes, 'bins': [], 'counts': [],
+                'percentiles': {}, 'median_by_employee': {}}
+
+    edges = np.arange(0, SECONDS_PER_DAY + bin_minutes * 60, bin_minutes * 60)
+    counts, _ = np.histogram(arrivals, bins=edges)
+    used = np.flatnonzero(counts)
+    first, last = used[0], used[-1] + 1
+
+    # Per-employee medians: sort by (employee, arrival) and pick each group's middle
+    codes = columns.codes[valid]
+    order = np.lexsort((arrivals, codes))
+    group_sizes = np.bincount(codes, minlength=len(columns.names))
+    group_starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+    present = np.flatnonzero(group_sizes)
+    middles = arrivals[order][group_starts[present] + (group_sizes[present] - 1) // 2]
+
+    percentiles = np.percentile(arrivals, [10, 25, 50, 75, 90])
+    return {
+        'count': int(len(arrivals)),
+        'bin_minutes': bin_minutes,
+        'bins': [format_clock(edge) for edge in edges[first:last]],
+        'counts': counts[first:last].tolist(),
+        'percentiles': {f"p{p}": format_clock(value) for p, value in zip((10, 25, 50, 75, 90), percentiles)},
+        'median_by_employee': {columns.names[code]: format_clock(value) for code, value in zip(present, middles)}
+    }
+
+def lateness(columns: AttendanceColumns, start_time: str = '09:00', grace_minutes: int = 0) -> List[Dict]:
+    """Late arrivals per employee, latest first
+
+    A check-in counts as late after start_time plus grace_minutes; minutes
+    late are measured from start_time.
+    """
+    start = parse_clock(start_time)
+    valid = ~np.isnan(columns.arrivals)
+    late = valid & (columns.arrivals > start + grace_minutes * 60)
+    size = len(columns.names)
+
+    days_attended = np.bincount(columns.codes[valid], minlength=size)
+    late_days = np.bincount(columns.codes[late], minlength=size)
+    late_minutes = np.bincount(columns.codes[late], weights=(columns.arrivals[late] - start) / 60, minlength=size)
+
+    present = np.flatnonzero(days_attended)
+    late_rate = late_days[present] / days_attended[present]
+    average_late = np.divide(late_minutes[present], late_days[present],
+                             out=np.zeros(len(present)), where=late_days[present] > 0)
+    order = np.lexsort((-average_late, -late_rate))
+    return [
+        {
+            'name': columns.names[present[i]],
+            'days': int(days_attended[present[i]]),
+            'late_days': int(late_days[present[i]]),
+            'late_rate': round(float(late_rate[i]) * 100, 1),
+            'average_minutes_late': round(float(average_late[i]), 1)
+        }
+        for i in order
+    ]
+
+def attendance_rate(columns: AttendanceColumns, total_employees: int = None, window: int = 7,
+                    start_date: str = None, end_date: str = None) -> List[Dict]:
+    """Daily present count and attendance rate with a rolling mean
+
+    Covers every day from start_date to end_date (by default the first and
+    last day with a check-in); days without any check-in are included with
+    zero. total_employees defaults to the number of people in the data.
+    """
+    valid = ~np.isnan(columns.arrivals)
+    days = columns.days[valid]
+    first_day = day_number(start_date) if start_date else (days.min() if len(days) else None)
+    last_day = day_number(end_date) if end_date else (days.max() if len(days) else None)
+    if first_day is None or last_day is None or last_day < first_day:
+        return []
+
+    in_range = (days >= first_day) & (days <= last_day)
+    total = total_employees or len(np.unique(columns.codes[valid][in_range]))
+    present = np.bincount(days[in_range] - first_day, minlength=last_day - first_day + 1)
+    rates = present / total * 100 if total else np.zeros(len(present))
+
+    # Rolling mean over the last window days via cumulative sums
+    sums = np.concatenate(([0.0], np.cumsum(rates)))
+    ends = np.arange(1, len(rates) + 1)
+    starts = np.maximum(ends - window, 0)
+    rolling = (sums[ends] - sums[starts]) / (ends - starts)
+
+    dates = np.arange(first_day, first_day + len(present)).astype('datetime64[D]')
+    return [
+        {'date': str(day), 'present': int(count), 'rate': round(float(rate), 1), 'rolling_rate': round(float(mean), 1)}
+        for day, count, rate, mean in zip(dates, present, rates, rolling)
+    ]
+
+# Analytics available from the CLI and /api/analytics/<kind>
+ANALYTICS = {
+    'monthly-hours': monthly_hours,
+    'arrivals': arrival_distribution,
+    'lateness': lateness,
+    'attendance-rate': attendance_rate,
+}
+
+def run_analytics(db: AttendanceDatabase, kind: str, start_date: str = None, end_date: str = None,
+                  employee_name: str = None, **options) -> Optional[object]:
+    """Load the filtered attendance and compute one kind of analytics"""
+    if kind not in ANALYTICS:
+        print(f"Unknown analytics: {kind}")
+        return None
+    try:
+        columns = load_columns(db, start_date, end_date, employee_name)
+        if kind == 'attendance-rate':
+            options.update(start_date=start_date, end_date=end_date)
+            if 'total_employees' not in options and not employee_name:
+                options['total_employees'] = db.get_daily_summary().get('total_employees') or None
+        return ANALYTICS[kind](columns, **options)
+    except Exception as e:
+        print(f"Error computing {kind} analytics: {e}")
+        return None
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Attendance ASGI Server
+Async front end for the attendance web server: live feeds and polled API
+endpoints without a thread per connection
+
+The hot /api/* endpoints and /api/events are handled here; database calls
+run on a bounded thread pool. Every other path (pages, reports, exports,
+analytics) is passed to the Flask app in attendance_web_server.py on the
+same pool, so both serve the same URLs and JSON.
+
+Usage:
+    pip install uvicorn
+    python attendance_asgi.py --port 8000 --db attendance.db
+    python attendance_asgi.py --workers 4 --db-threads 16
+    uvicorn attendance_asgi:app        # configured from ATTENDANCE_* environment variables
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import threading
+import urllib.parse
+from io import BytesIO
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import attendance_web_server as web
+from event_broker import EventBroker, HEARTBEAT
+from attendance_feed import AttendanceFeed
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+class Overloaded(Exception):
+    """More blocking work is queued than the executor accepts"""
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int = 16, max_pending: int = 256):
+        """Initialize the executor
+
+        Blocking work (database calls, Flask requests) runs on max_workers
+        threads, each keeping its own SQLite connection. At most max_pending
+        requests may be admitted at once; beyond that admit() raises
+        Overloaded straight away, so an overloaded server answers 503 instead
+        of queueing without limit. Admission is counted on the event loop
+        thread only, so it needs no lock.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='attendance-db')
+
+        self.stats = {'admitted': 0, 'rejected': 0}
+
+    @contextmanager
+    def admit(self):
+        """Reserve a place for one request's blocking work"""
+        if self.pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise Overloaded()
+        self.pending += 1
+        self.stats['admitted'] += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def call(self, func: Callable, *args) -> asyncio.Future:
+        """Run func on the pool without admission (the caller was admitted already)"""
+        return asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args))
+
+    async def run(self, func: Callable, *args):
+        """Admit and run one blocking call"""
+        with self.admit():
+            return await self.call(func, *args)
+
+    def get_stats(self) -> Dict:
+        """Get admission counters and current load"""
+        return {**self.stats, 'pending': self.pending, 'max_pending': self.max_pending,
+                'threads': self.max_workers}
+
+    def shutdown(self):
+        """Wait for running calls and stop the threads"""
+        self._pool.shutdown(wait=True)
+
+def get_header(scope: Dict, name: bytes) -> Optional[str]:
+    """Value of a request header, or None"""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+def parse_json(body: bytes):
+    """Decoded JSON body, or None if it is not valid JSON"""
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+async def read_body(receive: Callable, limit: int) -> Optional[bytes]:
+    """The whole request body, or None if it is larger than limit"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return b''.join(chunks)
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def send_response(send: Callable, status: int, body: bytes, content_type: str = 'application/json',
+                        headers: List[Tuple[bytes, bytes]] = ()):
+    """Send a complete response"""
+    response_headers = [(b'content-type', content_type.encode('latin-1')),
+                        (b'content-length', str(len(body)).encode('latin-1'))]
+    response_headers.extend(headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send: Callable, status: int, data, headers: List[Tuple[bytes, bytes]] = ()):
+    """Send data as JSON, byte for byte what the Flask app's jsonify sends"""
+    await send_response(send, status, web.app.json.response(data).get_data(), 'application/json', headers)
+
+def wsgi_environ(scope: Dict, body: bytes) -> Dict:
+    """WSGI environ for an ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def run_wsgi(wsgi_app: Callable, environ: Dict, put: Callable):
+    """Run one WSGI request to completion on the calling thread, passing its output to put
+
+    The whole request, streamed body included, stays on one thread, as
+    Flask's request context expects.
+    """
+    def start_response(status, headers, exc_info=None):
+        put(('start', int(status.split(' ', 1)[0]), headers))
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        for chunk in iterable:
+            if chunk:
+                put(('body', chunk, None))
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    put(('end', None, None))
+
+class AttendanceAPI:
+    def __init__(self, flask_app=None, db_threads: int = 16, max_pending: int = 256,
+                 max_streams: int = 10000, heartbeat: float = 15.0, max_body: int = 10 << 20):
+        """Initialize the ASGI application
+
+        /api/events streams are coroutines woken by the event broker, so an
+        idle viewer holds no thread, only a small buffer; up to max_streams
+        may be connected. The other native endpoints await their database
+        call on a BoundedExecutor of db_threads threads. Requests for any
+        other path run the Flask app on the same executor.
+        """
+        self.flask_app = flask_app or web.app
+        self.executor = BoundedExecutor(db_threads, max_pending)
+        self.max_streams = max_streams
+        self.heartbeat = heartbeat
+        self.max_body = max_body
+        self._feed_lock = threading.Lock()
+
+        self.stats = {'native': 0, 'bridged': 0, 'streams': 0, 'open_streams': 0}
+
+        self.routes = {
+            ('GET', '/api/events'): self.events,
+            ('GET', '/api/summary'): partial(self.cached, web.summary_resource),
+            ('GET', '/api/employees'): partial(self.cached, web.employees_resource),
+            ('POST', '/api/check_in'): partial(self.single, 'check_in'),
+            ('POST', '/api/check_out'): partial(self.single, 'check_out'),
+            ('POST', '/api/check_in/batch'): partial(self.batch, 'check_in'),
+            ('POST', '/api/check_out/batch'): partial(self.batch, 'check_out'),
+        }
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get((scope['method'], scope['path']))
+        try:
+            if handler is None:
+                self.stats['bridged'] += 1
+                await self.bridge(scope, receive, send)
+            else:
+                self.stats['native'] += 1
+                await handler(scope, receive, send)
+        except Overloaded:
+            await send_json(send, 503, {'success': False, 'message': 'Server busy, retry shortly'},
+                            [(b'retry-after', b'1')])
+
+    async def lifespan(self, receive: Callable, send: Callable):
+        """Close the feed, database and executor when the server stops"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        """End live streams, stop background threads and close the database"""
+        web.shutdown()
+        self.executor.shutdown()
+
+    def get_feed(self) -> AttendanceFeed:
+        """The web server's live feed, created with room for max_streams viewers"""
+        with self._feed_lock:
+            if web.attendance_feed is None:
+                broker = EventBroker(max_subscribers=self.max_streams, heartbeat=self.heartbeat)
+                web.attendance_feed = AttendanceFeed(web.get_db(), broker)
+                web.attendance_feed.start()
+            return web.attendance_feed
+
+    def get_stats(self) -> Dict:
+        """Get request, stream and executor counters"""
+        return {**self.stats, 'executor': self.executor.get_stats()}
+
+    async def events(self, scope: Dict, receive: Callable, send: Callable):
+        """GET /api/events as an async stream; see attendance_web_server.api_events"""
+        last_event_id = get_header(scope, b'last-event-id')
+        if not last_event_id:
+            query = urllib.parse.parse_qs(scope['query_string'].decode('latin-1'))
+            last_event_id = query.get('last_event_id', [None])[0]
+
+        feed = web.attendance_feed
+        if feed is None:
+            # Not admission-counted: a burst of viewers arriving at startup all wait for the one feed
+            feed = await self.executor.call(self.get_feed)
+        subscription = feed.broker.subscribe(last_event_id)
+        if subscription is None:
+            await send_json(send, 503, {'success': False, 'message': 'Too many live viewers'})
+            return
+
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def wake_up():
+            # Called from whichever thread published; the loop may be gone at shutdown
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscription.close()
+
+        subscription.listener = wake_up
+        watcher = asyncio.create_task(watch_disconnect())
+        self.stats['streams'] += 1
+        self.stats['open_streams'] += 1
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')]})
+            await send({'type': 'http.response.body', 'body': f"retry: {feed.broker.retry_ms}\n\n".encode(),
+                        'more_body': True})
+
+            while not subscription.closed:
+                message = subscription.get_nowait()
+                if message is None:
+                    wake.clear()
+                    # A message may have arrived between the check and the clear
+                    message = subscription.get_nowait()
+                if message is None:
+                    try:
+                        await asyncio.wait_for(wake.wait(), self.heartbeat)
+                        continue
+                    except asyncio.TimeoutError:
+                        message = HEARTBEAT
+                await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+
+            await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # The client went away while we were writing
+            pass
+        finally:
+            watcher.cancel()
+            subscription.listener = None
+            feed.broker.unsubscribe(subscription)
+            self.stats['open_streams'] -= 1
+
+    def render_cached(self, resource: Callable, if_none_match: Optional[str]) -> Tuple[int, bytes, str]:
+        key, build = resource()
+        return web.get_response_cache().conditional(key, build, 'application/json', if_none_match)
+
+    async def cached(self, resource: Callable, scope: Dict, receive: Callable, send: Callable):
+        """GET /api/summary or /api/employees from the response cache, with ETags"""
+        status, body, etag = await self.executor.run(self.render_cached, resource,
+                                                     get_header(scope, b'if-none-match'))
+        headers = [(b'etag', f'"{etag}"'.encode('latin-1')), (b'cache-control', b'no-cache')]
+        if status == 304:
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await send_response(send, status, body, 'application/json', headers)
+
+    async def single(self, action: str, scope: Dict, receive: Callable, send: Callable):
+        """POST /api/check_in or /api/check_out"""
+        body = await read_body(receive, self.max_body)
+        if body is None:
+            await send_json(send, 413, {'success': False, 'message': 'Request body too large'})
+            return
+        data = parse_json(body)
+        result = await self.executor.run(web.record_attendance, action, data if isinstance(data, dict) else None)
+        await send_json(send, 200, result)
+
+    async def batch(self, action: str, scope: Dict, receive: Callable, send: Callable):
+        """POST /api/check_in/batch or /api/check_out/batch"""
+        body = await read_body(receive, self.max_body)
+        if body is None:
+            await send_json(send, 413, {'success': False, 'message': 'Request body too large'})
+            return
+        result, status = await self.executor.run(web.record_batch, action, parse_json(body))
+        await send_json(send, status, result)
+
+    async def bridge(self, scope: Dict, receive: Callable, send: Callable):
+        """Serve the request with the Flask app on the executor, streaming its body back"""
+        body = await read_body(receive, self.max_body)
+        if body is None:
+            await send_json(send, 413, {'success': False, 'message': 'Request body too large'})
+            return
+
+        loop = asyncio.get_running_loop()
+        # A few chunks of slack; a slow client makes the Flask thread wait
+        output = asyncio.Queue(maxsize=8)
+        aborted = threading.Event()
+
+        def put(item):
+            if aborted.is_set():
+                raise ConnectionAbortedError("client disconnected")
+            asyncio.run_coroutine_threadsafe(output.put(item), loop).result()
+
+        def produce(environ):
+            try:
+                run_wsgi(self.flask_app, environ, put)
+            except ConnectionAbortedError:
+                pass
+            except Exception as e:
+                try:
+                    put(('error', e, None))
+                except (ConnectionAbortedError, RuntimeError):
+                    pass
+
+        with self.executor.admit():
+            self.executor.call(produce, wsgi_environ(scope, body))
+            started = finished = False
+            try:
+                while not finished:
+                    kind, first, second = await output.get()
+                    if kind == 'error':
+                        raise first
+                    if kind == 'start':
+                        headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in second]
+                        await send({'type': 'http.response.start', 'status': first, 'headers': headers})
+                        started = True
+                    elif kind == 'body':
+                        await send({'type': 'http.response.body', 'body': first, 'more_body': True})
+                    else:
+                        await send({'type': 'http.response.body', 'body': b''})
+                        finished = True
+            except Exception as e:
+                print(f"Error serving {scope['path']}: {e}")
+                if not started:
+                    await send_json(send, 500, {'success': False, 'message': 'Internal server error'})
+            finally:
+                if not finished:
+                    # Stop the Flask thread at its next chunk, freeing it if it is waiting on the queue
+                    aborted.set()
+                    while not output.empty():
+                        output.get_nowait()
+
+def create_app() -> AttendanceAPI:
+    """Application configured from the environment, for uvicorn attendance_asgi:app
+
+    ATTENDANCE_DB (database path), ATTENDANCE_DB_THREADS, ATTENDANCE_MAX_PENDING,
+    ATTENDANCE_MAX_STREAMS and ATTENDANCE_PUBLISH_SNAPSHOT (0 when another
+    process publishes the reporting snapshot).
+    """
+    web.db_path = os.environ.get('ATTENDANCE_DB', web.db_path)
+    web.publish_snapshot = os.environ.get('ATTENDANCE_PUBLISH_SNAPSHOT', '1') != '0'
+    if 'ATTENDANCE_SECRET_KEY' in os.environ:
+        web.app.secret_key = os.environ['ATTENDANCE_SECRET_KEY']
+    return AttendanceAPI(db_threads=int(os.environ.get('ATTENDANCE_DB_THREADS', 16)),
+                         max_pending=int(os.environ.get('ATTENDANCE_MAX_PENDING', 256)),
+                         max_streams=int(os.environ.get('ATTENDANCE_MAX_STREAMS', 10000)))
+
+app = create_app()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the attendance API with an async (ASGI) server')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--db', default='attendance.db', help='Attendance database')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+    parser.add_argument('--db-threads', type=int, default=16, help='Threads for database calls per worker')
+    parser.add_argument('--max-pending', type=int, default=256,
+                        help='Requests waiting for a database thread before new ones get 503')
+    parser.add_argument('--max-streams', type=int, default=10000, help='Live feed viewers per worker')
+
+    args = parser.parse_args()
+
+    if uvicorn is None:
+        print("No ASGI server available. Install one with: pip install uvicorn")
+        return 1
+
+    # Only missing templates are written, so edited ones are kept
+    template_dir = os.path.join(web.app.root_path, 'templates')
+    os.makedirs(template_dir, exist_ok=True)
+    web.create_templates(overwrite=False, directory=template_dir)
+
+    os.environ.update({
+        'ATTENDANCE_DB': args.db,
+        'ATTENDANCE_DB_THREADS': str(args.db_threads),
+        'ATTENDANCE_MAX_PENDING': str(args.max_pending),
+        'ATTENDANCE_MAX_STREAMS': str(args.max_streams),
+        'ATTENDANCE_PUBLISH_SNAPSHOT': '1' if args.workers == 1 else '0',
+    })
+
+    publisher = None
+    if args.workers > 1:
+        from serve_attendance import start_snapshot_publisher
+        publisher = start_snapshot_publisher(argparse.Namespace(db=args.db, snapshot_interval=60.0))
+    try:
+        uvicorn.run('attendance_asgi:app', host=args.host, port=args.port, workers=args.workers,
+                    lifespan='on')
+    finally:
+        if publisher is not None:
+            publisher.terminate()
+            publisher.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
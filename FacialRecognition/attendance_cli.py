@@ -4,9 +4,11 @@ Simple CLI for managing attendance records
 '''
 
 import argparse
+import json
 import sys
 from datetime import datetime, date
 from attendance_database import AttendanceDatabase
+from attendance_analytics import ANALYTICS, run_analytics
 
 def print_header():
     """Print application header"""
@@ -159,13 +161,30 @@ def main():
     parser.add_argument('--check-in', type=str, help='Check in employee')
     parser.add_argument('--check-out', type=str, help='Check out employee')
     parser.add_argument('--summary', action='store_true', help='Show daily summary')
+    parser.add_argument('--migrate', action='store_true', help='Apply schema migrations and show the schema version')
+    parser.add_argument('--rebuild-summary', action='store_true', help='Rebuild the daily summary table')
     parser.add_argument('--report', action='store_true', help='Show attendance report')
     parser.add_argument('--add-employee', type=str, help='Add employee name')
     parser.add_argument('--list-employees', action='store_true', help='List all employees')
-    parser.add_argument('--import-csv', type=str, help='Import from CSV file')
+    parser.add_argument('--import-csv', type=str, nargs='+', help='Import from one or more CSV files')
+    parser.add_argument('--workers', type=int, default=1, help='Parallel parsers for --import-csv')
     parser.add_argument('--export-csv', type=str, help='Export to CSV file')
+    parser.add_argument('--archive', action='store_true', help='Move closed months to archive databases')
+    parser.add_argument('--keep-months', type=int, default=1, help='Months kept in the main database by --archive')
+    parser.add_argument('--compact-events', action='store_true', help='Fold recognition events into attendance')
+    parser.add_argument('--sightings-check-out', action='store_true',
+                        help='With --compact-events, also check out at the last sighting of the day')
+    parser.add_argument('--presence', action='store_true', help="Show today's presence intervals")
     parser.add_argument('--employee-history', type=str, help='Show employee history')
     parser.add_argument('--days', type=int, default=30, help='Number of days for history')
+    parser.add_argument('--analytics', choices=sorted(ANALYTICS), help='Show attendance analytics as JSON')
+    parser.add_argument('--start-date', type=str, help='First date (YYYY-MM-DD) for --analytics')
+    parser.add_argument('--end-date', type=str, help='Last date (YYYY-MM-DD) for --analytics')
+    parser.add_argument('--employee', type=str, help='Limit --analytics to one employee')
+    parser.add_argument('--start-time', type=str, default='09:00', help='Work start time for lateness analytics')
+    parser.add_argument('--grace-minutes', type=int, default=0, help='Minutes after start time before a check-in is late')
+    parser.add_argument('--bin-minutes', type=int, default=15, help='Histogram bin width for arrivals analytics')
+    parser.add_argument('--window', type=int, default=7, help='Rolling window in days for attendance-rate analytics')
     
     args = parser.parse_args()
     
@@ -183,10 +202,13 @@ def main():
             print("=== Daily Summary ===")
             for key, value in summary.items():
                 print(f"{key}: {value}")
+        elif args.migrate:
+            print(f"Schema version: {db.schema_version()}")
+        elif args.rebuild_summary:
+            db.rebuild_daily_summary()
         elif args.report:
-            records = db.get_attendance_report()
             print("=== Attendance Report ===")
-            for record in records:
+            for record in db.iter_attendance_report():
                 print(f"{record['name']} | {record['date']} | "
                       f"Check-in: {record['check_in_time'] or 'N/A'} | "
                       f"Check-out: {record['check_out_time'] or 'N/A'}")
@@ -198,9 +220,23 @@ def main():
             for emp in employees:
                 print(f"{emp['name']} | {emp['employee_id'] or 'N/A'}")
         elif args.import_csv:
-            db.import_from_csv(args.import_csv)
+            db.import_csv_files(args.import_csv, workers=args.workers)
         elif args.export_csv:
             db.export_to_csv(args.export_csv)
+        elif args.archive:
+            db.archive_months(keep_months=args.keep_months)
+            for partition in db.get_archive_partitions():
+                print(f"{partition['month']} | {partition['row_count']} rows | {partition['path']}")
+        elif args.compact_events:
+            stats = db.compact_recognition_events(sightings_check_out=args.sightings_check_out)
+            if stats is not None:
+                print(f"Compacted {stats['events']} events: {stats['check_ins']} check-ins, "
+                      f"{stats['check_outs']} check-outs, {stats['intervals']} presence intervals")
+        elif args.presence:
+            print("=== Presence Today ===")
+            for interval in db.get_presence_intervals():
+                print(f"{interval['name']} | {interval['start_time'][11:]} - {interval['end_time'][11:]} | "
+                      f"{interval['minutes']} min | {interval['sightings']} sightings")
         elif args.employee_history:
             records = db.get_employee_attendance(args.employee_history, args.days)
             print(f"=== {args.employee_history}'s History ===")
@@ -208,6 +244,15 @@ def main():
                 print(f"{record['date']} | "
                       f"Check-in: {record['check_in_time'] or 'N/A'} | "
                       f"Check-out: {record['check_out_time'] or 'N/A'}")
+        elif args.analytics:
+            options = {
+                'arrivals': {'bin_minutes': args.bin_minutes},
+                'lateness': {'start_time': args.start_time, 'grace_minutes': args.grace_minutes},
+                'attendance-rate': {'window': args.window},
+            }.get(args.analytics, {})
+            result = run_analytics(db, args.analytics, args.start_date, args.end_date, args.employee, **options)
+            if result is not None:
+                print(json.dumps(result, indent=2))
         else:
             # No arguments provided, show help
             parser.print_help()
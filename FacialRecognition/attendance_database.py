@@ -4,32 +4,821 @@ SQLite-based attendance tracking with check-in/check-out functionality
 '''
 
 import sqlite3
+import base64
+import calendar
 import csv
+import heapq
+import io
+import itertools
+import json
 import os
-from datetime import datetime, date
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
 try:
     import pandas as pd
 except ImportError:
     # Fallback if pandas is not available
     pd = None
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+
+# Register logs (register_log.RegisterLog, recognise_write.py) are written as
+# "Name,YYYY/DD/MM, HH:MM:SS": day before month, and the datetime holds an unquoted comma
+REGISTER_TIME_FORMAT = "%Y/%d/%m, %H:%M:%S"
+REGISTER_DATETIME = re.compile(r'(\d{4})/(\d{2})/(\d{2}),\s*(\d{2}:\d{2}:\d{2})$')
+EXPORT_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+# Integer time columns: days since 1970-01-01 and epoch seconds of the naive
+# local timestamps, so range filters and hour arithmetic need no string parsing
+EPOCH_DATE = date(1970, 1, 1)
+DAY_NUMBER_SQL = "CAST(julianday({0}) - 2440587.5 AS INTEGER)"
+EPOCH_SECONDS_SQL = "CAST(strftime('%s', {0}) AS INTEGER)"
+
+REPORT_COLUMNS = ['name', 'date', 'check_in_time', 'check_out_time', 'total_hours', 'status']
+EXPORT_HEADER = ['Name', 'Date', 'Check In Time', 'Check Out Time', 'Total Hours', 'Status']
+SELECTABLE_COLUMNS = ['id'] + REPORT_COLUMNS
+# Columns returned by get_attendance_changes
+CHANGE_COLUMNS = ['updated_seq', 'name', 'date', 'check_in_time', 'check_out_time', 'total_hours']
+# Columns available to bulk readers such as attendance_analytics.py
+RAW_COLUMNS = SELECTABLE_COLUMNS + ['day_number', 'check_in_ts', 'check_out_ts']
+
+# Report sort orders as (column, direction) keys. Each ends in id so the order
+# is total, which keyset pagination needs; 'newest' follows idx_attendance_day_name.
+REPORT_SORTS = {
+    'newest': [('day_number', 'DESC'), ('name', 'ASC'), ('id', 'ASC')],
+    'oldest': [('day_number', 'ASC'), ('name', 'ASC'), ('id', 'ASC')],
+    'name': [('name', 'ASC'), ('day_number', 'DESC'), ('id', 'ASC')],
+}
+
+# Materialized daily summary kept current by triggers, so every write path
+# (check-in, check-out, imports, add_employee) updates it in the same transaction.
+# A person counts as present on a date while they have at least one checked-in row.
+# Summary rows are created with INSERT ... WHERE NOT EXISTS rather than INSERT OR
+# IGNORE: inside an upsert's DO UPDATE the outer statement's conflict handling
+# replaces OR IGNORE and the trigger would fail on an existing date.
+DAILY_SUMMARY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_summary (
+        date TEXT PRIMARY KEY,
+        present_employees INTEGER NOT NULL DEFAULT 0,
+        hours_total REAL NOT NULL DEFAULT 0,
+        hours_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS employee_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        active_employees INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        INSERT INTO daily_summary (date)
+        SELECT NEW.date WHERE NOT EXISTS (SELECT 1 FROM daily_summary WHERE date = NEW.date);
+        UPDATE daily_summary SET
+            present_employees = present_employees + (NEW.check_in_time IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM attendance
+                WHERE name = NEW.name AND date = NEW.date AND check_in_time IS NOT NULL AND id != NEW.id)),
+            hours_total = hours_total + COALESCE(NEW.total_hours, 0),
+            hours_count = hours_count + (NEW.total_hours IS NOT NULL)
+        WHERE date = NEW.date;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_delete
+    AFTER DELETE ON attendance
+    BEGIN
+        UPDATE daily_summary SET
+            present_employees = present_employees - (OLD.check_in_time IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM attendance
+                WHERE name = OLD.name AND date = OLD.date AND check_in_time IS NOT NULL)),
+            hours_total = hours_total - COALESCE(OLD.total_hours, 0),
+            hours_count = hours_count - (OLD.total_hours IS NOT NULL)
+        WHERE date = OLD.date;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_update
+    AFTER UPDATE OF name, date, check_in_time, total_hours ON attendance
+    BEGIN
+        UPDATE daily_summary SET
+            present_employees = present_employees - (OLD.check_in_time IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM attendance
+                WHERE name = OLD.name AND date = OLD.date AND check_in_time IS NOT NULL AND id != OLD.id)),
+            hours_total = hours_total - COALESCE(OLD.total_hours, 0),
+            hours_count = hours_count - (OLD.total_hours IS NOT NULL)
+        WHERE date = OLD.date;
+        INSERT INTO daily_summary (date)
+        SELECT NEW.date WHERE NOT EXISTS (SELECT 1 FROM daily_summary WHERE date = NEW.date);
+        UPDATE daily_summary SET
+            present_employees = present_employees + (NEW.check_in_time IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM attendance
+                WHERE name = NEW.name AND date = NEW.date AND check_in_time IS NOT NULL AND id != NEW.id)),
+            hours_total = hours_total + COALESCE(NEW.total_hours, 0),
+            hours_count = hours_count + (NEW.total_hours IS NOT NULL)
+        WHERE date = NEW.date;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_employee_insert
+    AFTER INSERT ON employees
+    BEGIN
+        UPDATE employee_stats SET active_employees = active_employees + (NEW.is_active = 1) WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_employee_delete
+    AFTER DELETE ON employees
+    BEGIN
+        UPDATE employee_stats SET active_employees = active_employees - (OLD.is_active = 1) WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_summary_employee_update
+    AFTER UPDATE OF is_active ON employees
+    BEGIN
+        UPDATE employee_stats
+        SET active_employees = active_employees + (NEW.is_active = 1) - (OLD.is_active = 1)
+        WHERE id = 1;
+    END
+    ''',
+]
+
+# Derived integer columns are filled by triggers, so every writer (including
+# older code and external tools that only write the TEXT columns) keeps them in sync
+TIME_COLUMNS_SCHEMA = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_time_columns_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        UPDATE attendance SET
+            day_number = {DAY_NUMBER_SQL.format('NEW.date')},
+            check_in_ts = {EPOCH_SECONDS_SQL.format('NEW.check_in_time')},
+            check_out_ts = {EPOCH_SECONDS_SQL.format('NEW.check_out_time')}
+        WHERE id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_time_columns_update
+    AFTER UPDATE OF date, check_in_time, check_out_time ON attendance
+    BEGIN
+        UPDATE attendance SET
+            day_number = {DAY_NUMBER_SQL.format('NEW.date')},
+            check_in_ts = {EPOCH_SECONDS_SQL.format('NEW.check_in_time')},
+            check_out_ts = {EPOCH_SECONDS_SQL.format('NEW.check_out_time')}
+        WHERE id = NEW.id;
+    END
+    ''',
+    # Range reports filter on day_number and sort newest first, by name
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_day_name
+    ON attendance(day_number DESC, name)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_name_day
+    ON attendance(name, day_number)
+    ''',
+]
+
+# One statement each: the UNIQUE(name, date) index turns a second check-in into
+# a no-op, and check-out computes total_hours from check_in_ts inside SQLite
+CHECK_IN_SQL = '''
+    INSERT INTO attendance (name, date, check_in_time)
+    VALUES (?, ?, ?)
+    ON CONFLICT (name, date) DO UPDATE SET check_in_time = excluded.check_in_time
+    WHERE check_in_time IS NULL
+'''
+CHECK_OUT_SQL = f'''
+    UPDATE attendance
+    SET check_out_time = ?1, total_hours = ({EPOCH_SECONDS_SQL.format('?1')} - check_in_ts) / 3600.0
+    WHERE name = ?2 AND date = ?3 AND check_in_time IS NOT NULL
+'''
+# RETURNING (SQLite 3.35+) reads back total_hours without a second query
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def day_number(date_str: str) -> int:
+    """Convert a YYYY-MM-DD date to days since 1970-01-01"""
+    return (date.fromisoformat(date_str) - EPOCH_DATE).days
+
+def encode_cursor(key: List) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> List:
+    """Decode a cursor from encode_cursor(); raises ValueError if it is malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(key, list) or not all(value is None or isinstance(value, (str, int, float))
+                                            for value in key):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+def keyset_condition(sort_keys: List[Tuple[str, str]], key: List) -> Tuple[str, List]:
+    """WHERE clause selecting the rows after key in the given sort order
+
+    Expands (a, b, c) > (x, y, z) per column so ascending and descending keys
+    can be mixed: a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z).
+    The redundant a >= x in front lets SQLite seek the index on a and walk it
+    in order instead of splitting the OR into separate index scans.
+    """
+    if len(key) != len(sort_keys):
+        raise ValueError("Cursor does not match the sort order")
+    
+    clauses = []
+    params = []
+    for i, (column, direction) in enumerate(sort_keys):
+        terms = [f"{prev} = ?" for prev, _ in sort_keys[:i]]
+        terms.append(f"{column} {'<' if direction == 'DESC' else '>'} ?")
+        clauses.append('(' + ' AND '.join(terms) + ')')
+        params.extend(key[:i + 1])
+    
+    column, direction = sort_keys[0]
+    bound = f"{column} {'<=' if direction == 'DESC' else '>='} ?"
+    return f"{bound} AND ({' OR '.join(clauses)})", [key[0]] + params
+
+def merge_key(sort_keys: List[Tuple[str, str]]):
+    """Python sort key matching ORDER BY sort_keys, for merging partition streams
+
+    Descending keys are numeric (day_number) and are negated; NULLs sort
+    first ascending and last descending, as in SQLite.
+    """
+    def key(values: List) -> Tuple:
+        parts = []
+        for (_, direction), value in zip(sort_keys, values):
+            if direction == 'DESC':
+                parts.append((value is None, -value if value is not None else 0))
+            else:
+                parts.append((value is not None, value if value is not None else 0))
+        return tuple(parts)
+    return key
+
+def rebuild_summary_tables(cursor: sqlite3.Cursor, keep_archived: bool = False):
+    """Recompute the summary tables from attendance and employees
+
+    With keep_archived, summary rows of archived months are left alone since
+    their attendance rows are no longer in this database.
+    """
+    hot_dates = "WHERE substr(date, 1, 7) NOT IN (SELECT month FROM archive_partitions)" if keep_archived else ""
+    cursor.execute(f'DELETE FROM daily_summary {hot_dates}')
+    cursor.execute(f'''
+        INSERT INTO daily_summary (date, present_employees, hours_total, hours_count)
+        SELECT date,
+               COUNT(DISTINCT CASE WHEN check_in_time IS NOT NULL THEN name END),
+               COALESCE(SUM(total_hours), 0),
+               COUNT(total_hours)
+        FROM attendance
+        {hot_dates}
+        GROUP BY date
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO employee_stats (id, active_employees)
+        SELECT 1, COUNT(*) FROM employees WHERE is_active = 1
+    ''')
+
+def migrate_daily_summary(cursor: sqlite3.Cursor):
+    """Create the daily summary tables and triggers and fill them"""
+    for statement in DAILY_SUMMARY_SCHEMA:
+        cursor.execute(statement)
+    rebuild_summary_tables(cursor)
+
+def migrate_time_columns(cursor: sqlite3.Cursor):
+    """Add and backfill the integer day/epoch columns and their indexes"""
+    cursor.execute('PRAGMA table_info(attendance)')
+    columns = {row[1] for row in cursor.fetchall()}
+    for column in ('day_number', 'check_in_ts', 'check_out_ts'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE attendance ADD COLUMN {column} INTEGER')
+    
+    cursor.execute(f'''
+        UPDATE attendance SET
+            day_number = {DAY_NUMBER_SQL.format('date')},
+            check_in_ts = {EPOCH_SECONDS_SQL.format('check_in_time')},
+            check_out_ts = {EPOCH_SECONDS_SQL.format('check_out_time')}
+    ''')
+    for statement in TIME_COLUMNS_SCHEMA:
+        cursor.execute(statement)
+
+def migrate_unique_name_date(cursor: sqlite3.Cursor):
+    """Merge duplicate (name, date) rows and make the pair unique
+
+    The oldest row of each group is kept with the earliest check-in, the
+    latest check-out and total_hours recomputed from the two.
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE attendance_dedupe AS
+        SELECT MIN(id) AS id, name, date,
+               MIN(check_in_time) AS check_in_time, MAX(check_out_time) AS check_out_time
+        FROM attendance
+        GROUP BY name, date
+        HAVING COUNT(*) > 1
+    ''')
+    cursor.execute('''
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT id FROM attendance_dedupe)
+          AND EXISTS (SELECT 1 FROM attendance_dedupe d
+                      WHERE d.name = attendance.name AND d.date = attendance.date)
+    ''')
+    merged = cursor.rowcount
+    cursor.execute('''
+        UPDATE attendance SET
+            check_in_time = (SELECT check_in_time FROM attendance_dedupe d WHERE d.id = attendance.id),
+            check_out_time = (SELECT check_out_time FROM attendance_dedupe d WHERE d.id = attendance.id)
+        WHERE id IN (SELECT id FROM attendance_dedupe)
+    ''')
+    cursor.execute('''
+        UPDATE attendance SET total_hours = (check_out_ts - check_in_ts) / 3600.0
+        WHERE id IN (SELECT id FROM attendance_dedupe) AND check_out_ts IS NOT NULL
+    ''')
+    cursor.execute('DROP TABLE attendance_dedupe')
+    if merged:
+        print(f"Merged {merged} duplicate attendance rows")
+    
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_name_date_unique
+        ON attendance(name, date)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_attendance_name_date')
+
+# Every attendance insert or change takes the next updated_seq, giving each
+# database a monotonic change counter that attendance_merge.py uses as a high-water mark
+CHANGE_TRACKING_SCHEMA = [
+    '''
+    CREATE INDEX IF NOT EXISTS idx_attendance_updated_seq
+    ON attendance(updated_seq)
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_change_seq_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        UPDATE attendance SET updated_seq = (SELECT COALESCE(MAX(updated_seq), 0) + 1 FROM attendance)
+        WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_change_seq_update
+    AFTER UPDATE OF name, date, check_in_time, check_out_time, total_hours, status ON attendance
+    BEGIN
+        UPDATE attendance SET updated_seq = (SELECT COALESCE(MAX(updated_seq), 0) + 1 FROM attendance)
+        WHERE id = NEW.id;
+    END
+    ''',
+    # Last updated_seq merged from each source database
+    '''
+    CREATE TABLE IF NOT EXISTS merge_state (
+        source TEXT PRIMARY KEY,
+        high_water INTEGER NOT NULL DEFAULT 0,
+        rows_merged INTEGER NOT NULL DEFAULT 0,
+        merged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+def migrate_change_tracking(cursor: sqlite3.Cursor):
+    """Add the updated_seq change counter and the merge_state table"""
+    cursor.execute('PRAGMA table_info(attendance)')
+    if 'updated_seq' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute('ALTER TABLE attendance ADD COLUMN updated_seq INTEGER')
+    cursor.execute('UPDATE attendance SET updated_seq = id WHERE updated_seq IS NULL')
+    for statement in CHANGE_TRACKING_SCHEMA:
+        cursor.execute(statement)
+    
+    # Recreate the summary triggers created with INSERT OR IGNORE by version 1
+    for trigger in ('trg_summary_attendance_insert', 'trg_summary_attendance_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for statement in DAILY_SUMMARY_SCHEMA:
+        cursor.execute(statement)
+
+# Closed months can be moved to archive/attendance_YYYY_MM.db files; the
+# partition table maps each month to its file. Rows deleted while archiving
+# keep their daily_summary totals, so summaries cover the full history.
+ARCHIVE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        month TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        first_day INTEGER NOT NULL,
+        last_day INTEGER NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'DROP TRIGGER IF EXISTS trg_summary_attendance_delete',
+    '''
+    CREATE TRIGGER trg_summary_attendance_delete
+    AFTER DELETE ON attendance
+    WHEN NOT EXISTS (SELECT 1 FROM archive_partitions WHERE month = substr(OLD.date, 1, 7))
+    BEGIN
+        UPDATE daily_summary SET
+            present_employees = present_employees - (OLD.check_in_time IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM attendance
+                WHERE name = OLD.name AND date = OLD.date AND check_in_time IS NOT NULL)),
+            hours_total = hours_total - COALESCE(OLD.total_hours, 0),
+            hours_count = hours_count - (OLD.total_hours IS NOT NULL)
+        WHERE date = OLD.date;
+    END
+    ''',
+]
+
+# Indexes created in each archive file for the report queries
+ARCHIVE_INDEXES = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS arc.idx_attendance_name_date_unique ON attendance(name, date)',
+    'CREATE INDEX IF NOT EXISTS arc.idx_attendance_day_name ON attendance(day_number DESC, name)',
+    'CREATE INDEX IF NOT EXISTS arc.idx_attendance_name_day ON attendance(name, day_number)',
+]
+
+def migrate_archive_partitions(cursor: sqlite3.Cursor):
+    """Add the archive partition table and make archiving keep summaries"""
+    for statement in ARCHIVE_SCHEMA:
+        cursor.execute(statement)
+
+# Every recognition sighting is appended to recognition_events (no triggers, one
+# index); compact_recognition_events() later folds them into attendance rows and
+# presence_intervals, remembering the last compacted event id in event_compaction.
+# AUTOINCREMENT keeps ids above that mark even after old events are pruned.
+RECOGNITION_EVENTS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS recognition_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        confidence REAL,
+        source TEXT
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_recognition_events_name_date_ts
+    ON recognition_events(name, date, ts)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS presence_intervals (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        sightings INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_presence_intervals_name_date
+    ON presence_intervals(name, date, start_ts)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_presence_intervals_date
+    ON presence_intervals(date)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS event_compaction (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        high_water INTEGER NOT NULL DEFAULT 0,
+        compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'INSERT OR IGNORE INTO event_compaction (id, high_water) VALUES (1, 0)',
+]
+
+# The seen_at text is parsed once, inside SQLite: ?1 name, ?2 seen_at, ?3 confidence, ?4 source
+APPEND_EVENT_SQL = f'''
+    INSERT INTO recognition_events (name, date, ts, confidence, source)
+    VALUES (?1, substr(?2, 1, 10), {EPOCH_SECONDS_SQL.format('?2')}, ?3, ?4)
+'''
+
+# Per person and day: first and last sighting among the new events, and where
+# presence intervals must be rebuilt from (the start of the last interval that
+# began before the first new sighting; earlier intervals cannot change)
+COMPACT_BATCH_SQL = '''
+    CREATE TEMP TABLE compact_batch AS
+    SELECT name, date, first_ts, last_ts,
+           COALESCE((SELECT MAX(p.start_ts) FROM presence_intervals p
+                     WHERE p.name = g.name AND p.date = g.date AND p.start_ts <= g.first_ts), 0) AS since_ts
+    FROM (
+        SELECT name, date, MIN(ts) AS first_ts, MAX(ts) AS last_ts
+        FROM recognition_events
+        WHERE id > ? AND id <= ? AND name != 'Unknown'
+        GROUP BY name, date
+    ) g
+'''
+# A check-in that moves earlier leaves the previous one as the latest sighting,
+# which becomes the check-out only if sighting check-outs are on (?)
+COMPACT_CHECK_IN_SQL = '''
+    INSERT INTO attendance (name, date, check_in_time)
+    SELECT name, date, datetime(first_ts, 'unixepoch') FROM compact_batch WHERE 1
+    ON CONFLICT (name, date) DO UPDATE SET
+        check_in_time = excluded.check_in_time,
+        check_out_time = CASE WHEN ? THEN COALESCE(check_out_time, check_in_time) ELSE check_out_time END
+    WHERE check_in_time IS NULL OR excluded.check_in_time < check_in_time
+'''
+# Opt-in: the last sighting becomes the check-out once it is later than the check-in
+COMPACT_CHECK_OUT_SQL = '''
+    UPDATE attendance SET check_out_time = (
+        SELECT datetime(b.last_ts, 'unixepoch') FROM compact_batch b
+        WHERE b.name = attendance.name AND b.date = attendance.date)
+    WHERE EXISTS (
+        SELECT 1 FROM compact_batch b
+        WHERE b.name = attendance.name AND b.date = attendance.date
+          AND b.last_ts > attendance.check_in_ts
+          AND (attendance.check_out_ts IS NULL OR b.last_ts > attendance.check_out_ts))
+'''
+# Intervals that new sightings may extend or join: from the last one starting
+# at or before each person's first new sighting onwards
+COMPACT_OPEN_INTERVALS_SQL = '''
+    CREATE TEMP TABLE compact_intervals AS
+    SELECT p.id, p.name, p.date, p.start_ts, p.end_ts, p.sightings
+    FROM presence_intervals p
+    JOIN compact_batch b ON p.name = b.name AND p.date = b.date AND p.start_ts >= b.since_ts
+'''
+# Gaps and islands over the open intervals plus the new sightings (?1 < id <= ?2).
+# Only stored intervals are read back, so pruned events never shorten an interval.
+COMPACT_INTERVALS_SQL = '''
+    INSERT INTO presence_intervals (name, date, start_ts, end_ts, sightings)
+    WITH pieces AS (
+        SELECT e.name, e.date, e.ts AS start_ts, e.ts AS end_ts, 1 AS sightings
+        FROM recognition_events e
+        JOIN compact_batch b ON e.name = b.name AND e.date = b.date
+        WHERE e.id > ?1 AND e.id <= ?2
+        UNION ALL
+        SELECT name, date, start_ts, end_ts, sightings FROM compact_intervals
+    ), flagged AS (
+        SELECT name, date, start_ts, end_ts, sightings,
+               CASE WHEN start_ts - MAX(end_ts) OVER (PARTITION BY name, date ORDER BY start_ts, end_ts
+                                                      ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) <= ?3
+                    THEN 0 ELSE 1 END AS starts_interval
+        FROM pieces
+    ), numbered AS (
+        SELECT name, date, start_ts, end_ts, sightings,
+               SUM(starts_interval) OVER (PARTITION BY name, date ORDER BY start_ts, end_ts
+                                          ROWS UNBOUNDED PRECEDING) AS interval_number
+        FROM flagged
+    )
+    SELECT name, date, MIN(start_ts), MAX(end_ts), SUM(sightings)
+    FROM numbered
+    GROUP BY name, date, interval_number
+'''
+
+def migrate_recognition_events(cursor: sqlite3.Cursor):
+    """Add the raw recognition event log and the presence interval table"""
+    for statement in RECOGNITION_EVENTS_SCHEMA:
+        cursor.execute(statement)
+
+# Keys of batch events already applied, so a replayed batch (a client retrying
+# after a timeout) is not applied twice; kept for IDEMPOTENCY_KEY_DAYS
+IDEMPOTENCY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        action TEXT NOT NULL,
+        name TEXT NOT NULL,
+        event_time TEXT NOT NULL,
+        success INTEGER NOT NULL,
+        created_ts INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created
+    ON idempotency_keys(created_ts)
+    ''',
+]
+IDEMPOTENCY_KEY_DAYS = 7
+
+# SQL and result messages of each batch action
+BATCH_ACTIONS = {
+    'check_in': (CHECK_IN_SQL, '{name} checked in', '{name} already checked in on {date}'),
+    'check_out': (CHECK_OUT_SQL, '{name} checked out', 'No check-in record found for {name} on {date}'),
+}
+
+def migrate_idempotency_keys(cursor: sqlite3.Cursor):
+    """Add the idempotency key table for batch check-ins and check-outs"""
+    for statement in IDEMPOTENCY_SCHEMA:
+        cursor.execute(statement)
+
+# Once a month is archived its rows live only in the archive file, so a late
+# write for that month (an import, a merge, a queued or replayed check-in) would
+# start a second row for the same (name, date) in this database and be counted
+# twice. Every insert path goes through this table, so the trigger drops them all.
+ARCHIVED_MONTH_GUARD_SCHEMA = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_archived_month_insert
+    BEFORE INSERT ON attendance
+    WHEN EXISTS (SELECT 1 FROM archive_partitions WHERE month = substr(NEW.date, 1, 7))
+    BEGIN
+        SELECT RAISE(IGNORE);
+    END
+    ''',
+]
+
+def migrate_archived_month_guard(cursor: sqlite3.Cursor):
+    """Stop inserts into months that were already archived"""
+    for statement in ARCHIVED_MONTH_GUARD_SCHEMA:
+        cursor.execute(statement)
+
+# Schema migrations as (version, description, function); the applied version
+# is stored in PRAGMA user_version. Append new steps, never edit applied ones.
+MIGRATIONS = [
+    (1, 'daily summary tables', migrate_daily_summary),
+    (2, 'integer day and epoch columns', migrate_time_columns),
+    (3, 'unique attendance per name and date', migrate_unique_name_date),
+    (4, 'change tracking for merges, upsert-safe summary triggers', migrate_change_tracking),
+    (5, 'monthly archive partitions', migrate_archive_partitions),
+    (6, 'recognition event log and presence intervals', migrate_recognition_events),
+    (7, 'idempotency keys for batch events', migrate_idempotency_keys),
+    (8, 'reject writes to archived months', migrate_archived_month_guard),
+]
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed write may succeed if retried (another connection held the lock)"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+def is_valid_timestamp(time_str: str, checked_dates: Dict[str, bool]) -> bool:
+    """Whether a string shaped like YYYY-MM-DD HH:MM:SS is a real date and time
+
+    Each date is parsed once and remembered in checked_dates, as a file
+    holds few distinct dates.
+    """
+    day = time_str[:10]
+    valid = checked_dates.get(day)
+    if valid is None:
+        try:
+            datetime.strptime(day, "%Y-%m-%d")
+            valid = True
+        except ValueError:
+            valid = False
+        checked_dates[day] = valid
+    return valid and time_str[11:13] < '24' and time_str[14:16] < '60' and time_str[17:19] < '60'
+
+def parse_attendance_csv(csv_file: str) -> Tuple[Dict[Tuple[str, str], str], int]:
+    """Stream-parse a CSV into the first check-in time per (name, date)
+
+    Accepts both the register log format (Name, Datetime) and the format
+    written by export_to_csv (Name, Date, Check In Time, ...). Returns the
+    first-seen map and the number of rows that could not be parsed or hold
+    an impossible date. Lives at module level so it can run in a process pool.
+    """
+    first_seen = {}
+    bad_rows = 0
+    checked_dates = {}
+    with open(csv_file, 'r', newline='') as file:
+        reader = csv.reader(file)
+        header = [field.strip() for field in next(reader, [])]
+        export_format = 'Check In Time' in header
+        name_col = header.index('Name') if 'Name' in header else 0
+        time_col = header.index('Check In Time') if export_format else name_col + 1
+
+        for row in reader:
+            if len(row) <= time_col:
+                continue
+            name = row[name_col].strip()
+            if not name or name == 'Unknown':
+                continue
+
+            if export_format:
+                time_str = row[time_col].strip()
+                if not EXPORT_TIMESTAMP.match(time_str):
+                    bad_rows += 1
+                    continue
+            else:
+                match = REGISTER_DATETIME.match(','.join(row[time_col:]).strip())
+                if not match:
+                    bad_rows += 1
+                    continue
+                year, day, month, clock = match.groups()
+                time_str = f"{year}-{month}-{day} {clock}"
+
+            if not is_valid_timestamp(time_str, checked_dates):
+                bad_rows += 1
+                continue
+
+            key = (name, time_str[:10])
+            if key not in first_seen or time_str < first_seen[key]:
+                first_seen[key] = time_str
+
+    return first_seen, bad_rows
 
 class AttendanceDatabase:
-    def __init__(self, db_path: str = "attendance.db"):
-        """Initialize the attendance database"""
+    def __init__(self, db_path: str = "attendance.db", timeout: float = 30.0, read_only: bool = False):
+        """Initialize the attendance database
+
+        Each thread gets its own connection (the web server, the Tk thread and
+        the monitor thread all share one instance). Connections left behind by
+        finished threads are recycled for new threads. With read_only the file
+        is opened with mode=ro and no schema setup or migration is done, as
+        for the published reporting snapshot.
+        """
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.timeout = timeout
+        self.read_only = read_only
+        self.initialized = False
+        self._local = threading.local()
+        self._owners = {}  # thread -> connection
+        self._pool_lock = threading.Lock()
+        self._watch_conn = None  # never writes, so its data_version sees every commit
+        self._watch_version = None
+        self._generation = 0
+        self._watch_lock = threading.Lock()
+        self._write_listeners = []
         self.init_database()
     
+    def connect(self) -> sqlite3.Connection:
+        """Open a new connection with a busy timeout"""
+        # check_same_thread is off so close() can release other threads'
+        # connections; each connection is still only used by its owner thread
+        if self.read_only:
+            uri = f"file:{urllib.parse.quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+    
+    def _acquire_connection(self) -> sqlite3.Connection:
+        """Get a connection for the current thread, reusing idle ones"""
+        with self._pool_lock:
+            conn = None
+            for thread, owned in list(self._owners.items()):
+                if thread.is_alive():
+                    continue
+                del self._owners[thread]
+                if conn is None and not owned.in_transaction:
+                    conn = owned
+                else:
+                    owned.close()
+            
+            if conn is None:
+                conn = self.connect()
+            self._owners[threading.current_thread()] = conn
+        
+        self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        return conn
+    
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """Connection owned by the calling thread"""
+        if not self.initialized:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._acquire_connection()
+        return conn
+    
+    @property
+    def cursor(self) -> Optional[sqlite3.Cursor]:
+        """Cursor owned by the calling thread"""
+        if self.conn is None:
+            return None
+        return self._local.cursor
+    
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """Run a block of statements as one transaction
+
+        Yields a cursor on the calling thread's connection. BEGIN IMMEDIATE
+        takes the write lock up front so read-then-write sequences cannot
+        interleave with another writer. Nested calls join the outer
+        transaction.
+        """
+        conn = self.conn
+        if conn is None:
+            raise sqlite3.OperationalError("Database not initialized")
+        
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+        
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+    
     def init_database(self):
         """Initialize the database and create tables if they don't exist"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
+            conn = self.connect()
+            if self.read_only:
+                # Fail now rather than on the first query if the file is not a database
+                conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+                self._adopt_connection(conn)
+                return
+            
+            # WAL lets readers run alongside the writer; the mode is stored in the file
+            conn.execute('PRAGMA journal_mode = WAL')
+            cursor = conn.cursor()
             
             # Create attendance table
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS attendance (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL,
@@ -43,7 +832,7 @@ class AttendanceDatabase:
             ''')
             
             # Create employees table for registered users
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS employees (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT UNIQUE NOT NULL,
@@ -55,18 +844,96 @@ class AttendanceDatabase:
                 )
             ''')
             
-            # Create index for faster queries
-            self.cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_attendance_name_date 
-                ON attendance(name, date)
-            ''')
+            conn.commit()
             
-            self.conn.commit()
-            print(f"Database initialized: {self.db_path}")
+            self.migrate(conn)
+            
+            self._adopt_connection(conn)
             
         except Exception as e:
             print(f"Error initializing database: {e}")
     
+    def _adopt_connection(self, conn: sqlite3.Connection):
+        """Hand the setup connection to the pool for this thread"""
+        with self._pool_lock:
+            self._owners[threading.current_thread()] = conn
+        self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        self.initialized = True
+        print(f"Database initialized: {self.db_path}{' (read-only)' if self.read_only else ''}")
+    
+    def migrate(self, conn: sqlite3.Connection) -> int:
+        """Apply pending schema migrations and return the schema version
+
+        Each step runs in its own BEGIN IMMEDIATE transaction and re-reads the
+        version under the write lock, so several processes opening the same
+        file at once apply every step exactly once.
+        """
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, description, migration in MIGRATIONS:
+            if target <= version:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if target > version:
+                    print(f"Migrating {self.db_path} to schema version {target} ({description})")
+                    migration(conn.cursor())
+                    conn.execute(f'PRAGMA user_version = {target}')
+                    version = target
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+        return version
+    
+    def schema_version(self) -> int:
+        """Schema version recorded in the database file"""
+        try:
+            self.cursor.execute('PRAGMA user_version')
+            return self.cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Error reading schema version: {e}")
+            return 0
+    
+    def data_generation(self) -> int:
+        """Counter that increases whenever any connection commits a change
+
+        Polls PRAGMA data_version on a dedicated connection that never writes,
+        so commits from this process, the web server and other kiosks all
+        count. Costs no disk read; caches use it to tell when to reload.
+        """
+        with self._watch_lock:
+            try:
+                if self._watch_conn is None:
+                    self._watch_conn = self.connect()
+                version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            except Exception as e:
+                print(f"Error reading data version: {e}")
+                return self._generation
+            if version != self._watch_version:
+                self._watch_version = version
+                self._generation += 1
+            return self._generation
+
+    def add_write_listener(self, callback: Callable[[str, Dict], None]):
+        """Call callback(event, record) after each check-in or check-out this instance commits
+
+        event is 'check_in' or 'check_out' and record holds name, date, time
+        and total_hours. Callbacks run on the writing thread right after the
+        commit, so they must be quick. Writes by other processes are not
+        reported; watch data_generation() and get_attendance_changes() for those.
+        """
+        self._write_listeners.append(callback)
+
+    def _notify_write(self, event: str, name: str, day: str, time_str: str, total_hours: float = None):
+        for callback in self._write_listeners:
+            try:
+                callback(event, {'name': name, 'date': day, 'time': time_str, 'total_hours': total_hours})
+            except Exception as e:
+                print(f"Error in write listener: {e}")
+    
     def add_employee(self, name: str, employee_id: Optional[str] = None, 
                     department: Optional[str] = None, position: Optional[str] = None) -> bool:
         """Add a new employee to the database"""
@@ -122,24 +989,16 @@ class AttendanceDatabase:
             
             current_date = datetime.now().strftime("%Y-%m-%d")
             
-            # Check if already checked in today
-            self.cursor.execute('''
-                SELECT id FROM attendance 
-                WHERE name = ? AND date = ? AND check_in_time IS NOT NULL
-            ''', (name, current_date))
+            with self.transaction() as cursor:
+                cursor.execute(CHECK_IN_SQL, (name, current_date, check_in_time))
+                checked_in = cursor.rowcount == 1
             
-            if self.cursor.fetchone():
+            if not checked_in:
                 print(f"{name} already checked in today")
                 return False
             
-            # Record check-in
-            self.cursor.execute('''
-                INSERT INTO attendance (name, date, check_in_time)
-                VALUES (?, ?, ?)
-            ''', (name, current_date, check_in_time))
-            
-            self.conn.commit()
             print(f"{name} checked in at {check_in_time}")
+            self._notify_write('check_in', name, current_date, check_in_time)
             return True
             
         except Exception as e:
@@ -154,107 +1013,625 @@ class AttendanceDatabase:
             
             current_date = datetime.now().strftime("%Y-%m-%d")
             
-            # Find today's check-in record
-            self.cursor.execute('''
-                SELECT id, check_in_time FROM attendance 
-                WHERE name = ? AND date = ? AND check_in_time IS NOT NULL
-            ''', (name, current_date))
+            with self.transaction() as cursor:
+                if SUPPORTS_RETURNING:
+                    cursor.execute(CHECK_OUT_SQL + ' RETURNING total_hours', (check_out_time, name, current_date))
+                    record = cursor.fetchone()
+                else:
+                    cursor.execute(CHECK_OUT_SQL, (check_out_time, name, current_date))
+                    record = None
+                    if cursor.rowcount:
+                        cursor.execute('SELECT total_hours FROM attendance WHERE name = ? AND date = ?',
+                                       (name, current_date))
+                        record = cursor.fetchone()
             
-            record = self.cursor.fetchone()
             if not record:
                 print(f"No check-in record found for {name} today")
                 return False
             
-            attendance_id, check_in_time = record
-            
-            # Calculate total hours
-            check_in_dt = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
-            check_out_dt = datetime.strptime(check_out_time, "%Y-%m-%d %H:%M:%S")
-            total_hours = (check_out_dt - check_in_dt).total_seconds() / 3600
-            
-            # Update check-out time
-            self.cursor.execute('''
-                UPDATE attendance 
-                SET check_out_time = ?, total_hours = ?
-                WHERE id = ?
-            ''', (check_out_time, total_hours, attendance_id))
-            
-            self.conn.commit()
+            total_hours = record[0] or 0
             print(f"{name} checked out at {check_out_time} (Total hours: {total_hours:.2f})")
+            self._notify_write('check_out', name, current_date, check_out_time, total_hours)
             return True
             
         except Exception as e:
             print(f"Error during check-out: {e}")
             return False
-    
-    def get_attendance_report(self, start_date: str = None, end_date: str = None, 
-                            employee_name: str = None) -> List[Dict]:
-        """Get attendance report with optional filters"""
+
+    def check_in_batch(self, events: List[Tuple[str, str]]) -> Optional[List[bool]]:
+        """Record many check-ins in one transaction
+
+        events is a list of (name, check_in_time) pairs. The attendance date
+        comes from each timestamp, so late-written events keep their day.
+        Returns one success flag per event, or None if the database was
+        locked or busy and the batch should be retried. Other errors (a bad
+        event, a read-only or corrupt file) would fail again on retry, so
+        they are raised for the caller to deal with.
+        """
         try:
+            results = []
+            with self.transaction() as cursor:
+                for name, check_in_time in events:
+                    cursor.execute(CHECK_IN_SQL, (name, check_in_time[:10], check_in_time))
+                    results.append(cursor.rowcount == 1)
+
+            for (name, check_in_time), checked_in in zip(events, results):
+                if checked_in:
+                    self._notify_write('check_in', name, check_in_time[:10], check_in_time)
+            return results
+
+        except Exception as e:
+            if not is_transient_error(e):
+                raise
+            print(f"Error during batch check-in: {e}")
+            return None
+
+    def check_out_batch(self, events: List[Tuple[str, str]]) -> Optional[List[bool]]:
+        """Record many check-outs in one transaction
+
+        events is a list of (name, check_out_time) pairs; each check-out
+        applies to the check-in on its timestamp's date. Returns one success
+        flag per event, or None if the database was locked or busy; other
+        errors are raised, as in check_in_batch.
+        """
+        try:
+            results = []
+            with self.transaction() as cursor:
+                for name, check_out_time in events:
+                    cursor.execute(CHECK_OUT_SQL, (check_out_time, name, check_out_time[:10]))
+                    results.append(cursor.rowcount == 1)
+
+            for (name, check_out_time), checked_out in zip(events, results):
+                if checked_out:
+                    self._notify_write('check_out', name, check_out_time[:10], check_out_time)
+            return results
+
+        except Exception as e:
+            if not is_transient_error(e):
+                raise
+            print(f"Error during batch check-out: {e}")
+            return None
+
+    def record_attendance_batch(self, action: str, events: List[Dict]) -> Optional[List[Dict]]:
+        """Apply many check-ins or check-outs in one transaction, once per idempotency key
+
+        action is 'check_in' or 'check_out'. Each event is a dict with name,
+        an optional time ("YYYY-MM-DD HH:MM:SS", default now; the attendance
+        date is taken from it) and an optional idempotency_key. Returns one
+        result per event with name, time, success and message. An event whose
+        key was applied before is not applied again; its result repeats the
+        original success with duplicate set. Invalid events fail on their own.
+        Events dated in an archived month fail. Returns None if the
+        transaction failed, in which case nothing was applied and the whole
+        batch can be retried with the same keys.
+        """
+        sql, applied_message, rejected_message = BATCH_ACTIONS[action]
+        now = datetime.now()
+        default_time = now.strftime("%Y-%m-%d %H:%M:%S")
+        expired_ts = int(now.timestamp()) - IDEMPOTENCY_KEY_DAYS * 86400
+
+        try:
+            results = []
+            with self.transaction() as cursor:
+                cursor.execute('DELETE FROM idempotency_keys WHERE created_ts < ?', (expired_ts,))
+                cursor.execute('SELECT month FROM archive_partitions')
+                archived_months = {row[0] for row in cursor.fetchall()}
+
+                for event in events:
+                    if not isinstance(event, dict):
+                        results.append({'success': False, 'message': 'Event must be an object'})
+                        continue
+                    name = event.get('name')
+                    name = name.strip() if isinstance(name, str) else ''
+                    time_str = event.get('time') or default_time
+                    key = event.get('idempotency_key')
+                    result = {'name': name, 'time': time_str}
+                    if key is not None:
+                        result['idempotency_key'] = key
+                    results.append(result)
+
+                    if not name:
+                        result.update(success=False, message='Name is required')
+                        continue
+                    if not isinstance(time_str, str) or not EXPORT_TIMESTAMP.match(time_str):
+                        result.update(success=False, message='time must be YYYY-MM-DD HH:MM:SS')
+                        continue
+
+                    if key is not None:
+                        cursor.execute('SELECT success FROM idempotency_keys WHERE key = ?', (str(key),))
+                        row = cursor.fetchone()
+                        if row is not None:
+                            success = bool(row[0])
+                            message = applied_message if success else rejected_message
+                            result.update(success=success, duplicate=True,
+                                          message=message.format(name=name, date=time_str[:10]))
+                            continue
+
+                    if time_str[:7] in archived_months:
+                        result.update(success=False, message=f'{time_str[:7]} is archived and closed to changes')
+                        continue
+
+                    if action == 'check_in':
+                        cursor.execute(sql, (name, time_str[:10], time_str))
+                    else:
+                        cursor.execute(sql, (time_str, name, time_str[:10]))
+                    success = cursor.rowcount == 1
+                    message = applied_message if success else rejected_message
+                    result.update(success=success, message=message.format(name=name, date=time_str[:10]))
+
+                    if key is not None:
+                        cursor.execute('''
+                            INSERT INTO idempotency_keys (key, action, name, event_time, success, created_ts)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        ''', (str(key), action, name, time_str, int(success), int(now.timestamp())))
+
+            for result in results:
+                if result.get('success') and not result.get('duplicate'):
+                    self._notify_write(action, result['name'], result['time'][:10], result['time'])
+            return results
+
+        except Exception as e:
+            print(f"Error during batch {action.replace('_', '-')}: {e}")
+            return None
+
+    def append_recognition_events(self, events: List[Tuple[str, str, Optional[float]]],
+                                  source: str = None) -> bool:
+        """Append raw recognition sightings in one transaction
+
+        events is a list of (name, seen_at, confidence) with seen_at as
+        YYYY-MM-DD HH:MM:SS. Only the event log is written, so the cost does
+        not grow with attendance history; compact_recognition_events() turns
+        the events into attendance later. Returns False if the batch could not
+        be written and should be retried.
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.executemany(APPEND_EVENT_SQL, [(name, seen_at, confidence, source)
+                                                      for name, seen_at, confidence in events])
+            return True
+
+        except Exception as e:
+            print(f"Error appending recognition events: {e}")
+            return False
+
+    def compact_recognition_events(self, gap_seconds: int = 300, retain_days: int = None,
+                                   sightings_check_out: bool = False,
+                                   sightings_check_in: bool = True) -> Optional[Dict]:
+        """Fold new recognition events into attendance rows and presence intervals
+
+        Per person and day the first sighting is the check-in; existing rows
+        only move to an earlier check-in. Without sightings_check_in
+        attendance is left alone, for writers whose check-ins already go
+        through AttendanceEventQueue. Being seen is not leaving, so the last
+        sighting only becomes the check-out (or a later one) with
+        sightings_check_out, for sites without a check-out step. Sightings at
+        most gap_seconds apart form one presence interval. Only events after
+        the stored high-water mark are read. With retain_days, compacted
+        events older than that are deleted. Returns counts, or None if
+        compaction failed.
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute('SELECT high_water FROM event_compaction WHERE id = 1')
+                high_water = cursor.fetchone()[0]
+                cursor.execute('SELECT COALESCE(MAX(id), 0), COUNT(*) FROM recognition_events WHERE id > ?',
+                               (high_water,))
+                max_id, new_events = cursor.fetchone()
+                stats = {'events': new_events, 'check_ins': 0, 'check_outs': 0, 'intervals': 0, 'pruned': 0}
+
+                if new_events:
+                    cursor.execute('SELECT COALESCE(MAX(updated_seq), 0) FROM attendance')
+                    target_seq = cursor.fetchone()[0]
+
+                    cursor.execute('DROP TABLE IF EXISTS temp.compact_batch')
+                    cursor.execute(COMPACT_BATCH_SQL, (high_water, max_id))
+                    if sightings_check_in:
+                        cursor.execute(COMPACT_CHECK_IN_SQL, (sightings_check_out,))
+                        stats['check_ins'] = cursor.rowcount
+                    if sightings_check_out:
+                        cursor.execute(COMPACT_CHECK_OUT_SQL)
+                        stats['check_outs'] = cursor.rowcount
+
+                    # Recompute hours for every row this compaction inserted or changed
+                    cursor.execute('''
+                        UPDATE attendance SET total_hours = (check_out_ts - check_in_ts) / 3600.0
+                        WHERE updated_seq > ? AND check_out_ts IS NOT NULL AND check_in_ts IS NOT NULL
+                          AND total_hours IS NOT (check_out_ts - check_in_ts) / 3600.0
+                    ''', (target_seq,))
+
+                    cursor.execute('DROP TABLE IF EXISTS temp.compact_intervals')
+                    cursor.execute(COMPACT_OPEN_INTERVALS_SQL)
+                    cursor.execute('DELETE FROM presence_intervals WHERE id IN (SELECT id FROM compact_intervals)')
+                    cursor.execute(COMPACT_INTERVALS_SQL, (high_water, max_id, gap_seconds))
+                    stats['intervals'] = cursor.rowcount
+                    cursor.execute('DROP TABLE temp.compact_intervals')
+                    cursor.execute('DROP TABLE temp.compact_batch')
+
+                    cursor.execute('''
+                        UPDATE event_compaction SET high_water = ?, compacted_at = CURRENT_TIMESTAMP
+                        WHERE id = 1
+                    ''', (max_id,))
+
+                if retain_days is not None:
+                    cutoff = (datetime.now() - timedelta(days=retain_days)).strftime("%Y-%m-%d")
+                    cursor.execute('DELETE FROM recognition_events WHERE id <= ? AND date < ?',
+                                   (max(max_id, high_water), cutoff))
+                    stats['pruned'] = cursor.rowcount
+
+            return stats
+
+        except Exception as e:
+            print(f"Error compacting recognition events: {e}")
+            return None
+
+    def get_presence_intervals(self, employee_name: str = None, target_date: str = None) -> List[Dict]:
+        """Get the compacted presence intervals of one day"""
+        try:
+            if target_date is None:
+                target_date = datetime.now().strftime("%Y-%m-%d")
+
             query = '''
-                SELECT name, date, check_in_time, check_out_time, total_hours, status
-                FROM attendance
-                WHERE 1=1
+                SELECT name, date, datetime(start_ts, 'unixepoch'), datetime(end_ts, 'unixepoch'),
+                       (end_ts - start_ts) / 60.0, sightings
+                FROM presence_intervals
+                WHERE date = ?
             '''
-            params = []
-            
-            if start_date:
-                query += " AND date >= ?"
-                params.append(start_date)
-            
-            if end_date:
-                query += " AND date <= ?"
-                params.append(end_date)
-            
+            params = [target_date]
             if employee_name:
                 query += " AND name = ?"
                 params.append(employee_name)
-            
-            query += " ORDER BY date DESC, name"
-            
-            self.cursor.execute(query, params)
-            records = []
-            for row in self.cursor.fetchall():
-                records.append({
+            self.cursor.execute(query + " ORDER BY name, start_ts", params)
+
+            return [
+                {
                     'name': row[0],
                     'date': row[1],
-                    'check_in_time': row[2],
-                    'check_out_time': row[3],
-                    'total_hours': row[4],
-                    'status': row[5]
-                })
-            return records
+                    'start_time': row[2],
+                    'end_time': row[3],
+                    'minutes': round(row[4], 1),
+                    'sightings': row[5]
+                }
+                for row in self.cursor.fetchall()
+            ]
+
+        except Exception as e:
+            print(f"Error getting presence intervals: {e}")
+            return []
+
+    def _report_filters(self, start_date: str = None, end_date: str = None,
+                        employee_name: str = None) -> Tuple[str, List]:
+        """Build the WHERE clause shared by report queries"""
+        where = "WHERE 1=1"
+        params = []
+        
+        if start_date:
+            where += " AND day_number >= ?"
+            params.append(day_number(start_date))
+        
+        if end_date:
+            where += " AND day_number <= ?"
+            params.append(day_number(end_date))
+        
+        if employee_name:
+            where += " AND name = ?"
+            params.append(employee_name)
+        
+        return where, params
+    
+    def _query_report(self, start_date: str = None, end_date: str = None,
+                      employee_name: str = None, batch_size: int = 500, limit: int = None,
+                      columns: List[str] = None, sort: str = 'newest',
+                      after: List = None) -> Iterator[Tuple[Dict, List]]:
+        """Yield (record, sort key) pairs with filters, order and limit done in SQL
+
+        Archived months in the date range are queried in their own files and
+        merged in sort order. Time-ordered partitions that do not overlap are
+        read one after another, so a newest-first page that the current
+        partition fills never opens an archive.
+        """
+        columns = columns or REPORT_COLUMNS
+        unknown = [column for column in columns if column not in SELECTABLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown report columns: {', '.join(unknown)}")
+        if sort not in REPORT_SORTS:
+            raise ValueError(f"Unknown sort order: {sort}")
+        sort_keys = REPORT_SORTS[sort]
+        
+        where, params = self._report_filters(start_date, end_date, employee_name)
+        if after is not None:
+            clause, keyset_params = keyset_condition(sort_keys, after)
+            where += f" AND ({clause})"
+            params += keyset_params
+        
+        query = f'''
+            SELECT {', '.join(columns + [column for column, _ in sort_keys])}
+            FROM attendance
+            {where}
+            ORDER BY {', '.join(f"{column} {direction}" for column, direction in sort_keys)}
+        '''
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        partitions = self._archive_partitions_in_range(start_date, end_date)
+        hot = self._run_report_query(None, query, params, columns, batch_size)
+        if not partitions:
+            yield from hot
+            return
+        
+        hot_first, hot_last = self._hot_day_range()
+        segments = [(first_day, last_day, self._run_report_query(path, query, params, columns, batch_size))
+                    for path, first_day, last_day in partitions]
+        if hot_first is not None:
+            segments.append((hot_first, hot_last, hot))
+        
+        if sort in ('newest', 'oldest'):
+            newest_first = sort == 'newest'
+            segments.sort(key=lambda segment: segment[0], reverse=newest_first)
+            ordered = all(
+                (earlier[0] > later[1]) if newest_first else (earlier[1] < later[0])
+                for earlier, later in zip(segments, segments[1:])
+            )
+        else:
+            ordered = False
+        
+        if ordered:
+            merged = itertools.chain.from_iterable(stream for _, _, stream in segments)
+        else:
+            key = merge_key(sort_keys)
+            merged = heapq.merge(*(stream for _, _, stream in segments), key=lambda item: key(item[1]))
+        yield from itertools.islice(merged, limit) if limit is not None else merged
+    
+    def _run_report_query(self, archive_path: Optional[str], query: str, params: List,
+                          columns: List[str], batch_size: int) -> Iterator[Tuple[Dict, List]]:
+        """Run a report query on the current database or one archive file
+
+        The archive is only opened once the stream is first read.
+        """
+        archive = self._open_archive(archive_path) if archive_path is not None else None
+        cursor = archive.cursor() if archive is not None else self.conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row)), list(row[len(columns):])
+        finally:
+            cursor.close()
+            if archive is not None:
+                archive.close()
+    
+    def _open_archive(self, path: str) -> sqlite3.Connection:
+        """Open an archive partition read-only"""
+        uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=self.timeout)
+    
+    def _archive_partitions_in_range(self, start_date: str = None,
+                                     end_date: str = None) -> List[Tuple[str, int, int]]:
+        """(path, first_day, last_day) of archived months overlapping the range"""
+        try:
+            self.cursor.execute('''
+                SELECT path, first_day, last_day FROM archive_partitions
+                WHERE (? IS NULL OR last_day >= ?) AND (? IS NULL OR first_day <= ?)
+                ORDER BY month
+            ''', (start_date, day_number(start_date) if start_date else None,
+                  end_date, day_number(end_date) if end_date else None))
+            partitions = self.cursor.fetchall()
+        except sqlite3.OperationalError:
+            # A read-only copy of a database from before archiving existed
+            return []
+        
+        # Paths are stored relative to the database, so copies and snapshots
+        # in the same directory find the same archives
+        base = os.path.dirname(os.path.abspath(self.db_path))
+        return [(os.path.join(base, path), first_day, last_day) for path, first_day, last_day in partitions]
+    
+    def _hot_day_range(self) -> Tuple[Optional[int], Optional[int]]:
+        """Earliest and latest day_number still in the current partition"""
+        self.cursor.execute('''
+            SELECT (SELECT MIN(day_number) FROM attendance), (SELECT MAX(day_number) FROM attendance)
+        ''')
+        return self.cursor.fetchone()
+    
+    def iter_attendance_report(self, start_date: str = None, end_date: str = None,
+                               employee_name: str = None, batch_size: int = 500,
+                               limit: int = None, columns: List[str] = None,
+                               sort: str = 'newest') -> Iterator[Dict]:
+        """Stream attendance records in cursor batches
+
+        Only one batch is held in memory at a time, so exports and HTTP
+        responses stay flat regardless of result size. Uses its own cursor so
+        other queries on this thread can run while the stream is open.
+        columns picks a subset of SELECTABLE_COLUMNS and sort one of REPORT_SORTS.
+        An error part-way through is printed and raised, so a streamed
+        response is aborted instead of ending as if it were complete.
+        """
+        try:
+            for record, _ in self._query_report(start_date, end_date, employee_name, batch_size,
+                                                limit, columns, sort):
+                yield record
             
         except Exception as e:
             print(f"Error getting attendance report: {e}")
+            raise
+    
+    def get_attendance_report(self, start_date: str = None, end_date: str = None, 
+                            employee_name: str = None, limit: int = None,
+                            columns: List[str] = None, sort: str = 'newest') -> List[Dict]:
+        """Get attendance report with optional filters"""
+        try:
+            return list(self.iter_attendance_report(start_date, end_date, employee_name,
+                                                    limit=limit, columns=columns, sort=sort))
+        except Exception:
+            return []
+    
+    def iter_attendance_batches(self, columns: List[str], start_date: str = None, end_date: str = None,
+                                employee_name: str = None, batch_size: int = 100000) -> Iterator[List[Tuple]]:
+        """Stream raw row tuples in large batches, in no particular order
+
+        For bulk consumers that build their own arrays: no dicts and no
+        sorting. Covers the current database and archived months in range.
+        """
+        unknown = [column for column in columns if column not in RAW_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        
+        where, params = self._report_filters(start_date, end_date, employee_name)
+        query = f"SELECT {', '.join(columns)} FROM attendance {where}"
+        
+        connections = [(self.conn, False)]
+        connections += [(path, True) for path, _, _ in self._archive_partitions_in_range(start_date, end_date)]
+        for source, is_archive in connections:
+            conn = self._open_archive(source) if is_archive else source
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+                if is_archive:
+                    conn.close()
+    
+    def get_attendance_page(self, start_date: str = None, end_date: str = None,
+                            employee_name: str = None, limit: int = 100, cursor: str = None,
+                            columns: List[str] = None, sort: str = 'newest') -> Dict:
+        """Get one page of the attendance report using keyset pagination
+
+        Pass the returned next_cursor back to get the following page; it is
+        None on the last page. Each page is an index seek from the previous
+        page's last row, so deep pages cost the same as the first.
+        """
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            rows = list(self._query_report(start_date, end_date, employee_name, limit=limit + 1,
+                                           columns=columns, sort=sort, after=after))
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            return {
+                'records': [record for record, _ in rows],
+                'next_cursor': encode_cursor(rows[-1][1]) if has_more else None
+            }
+            
+        except Exception as e:
+            print(f"Error getting attendance page: {e}")
+            return {}
+    
+    def count_attendance(self, start_date: str = None, end_date: str = None,
+                         employee_name: str = None) -> int:
+        """Count attendance records matching the report filters"""
+        try:
+            where, params = self._report_filters(start_date, end_date, employee_name)
+            self.cursor.execute(f"SELECT COUNT(*) FROM attendance {where}", params)
+            count = self.cursor.fetchone()[0]
+            
+            for path, _, _ in self._archive_partitions_in_range(start_date, end_date):
+                archive = self._open_archive(path)
+                try:
+                    count += archive.execute(f"SELECT COUNT(*) FROM attendance {where}", params).fetchone()[0]
+                finally:
+                    archive.close()
+            return count
+        except Exception as e:
+            print(f"Error counting attendance: {e}")
+            return 0
+    
+    def iter_attendance_csv(self, start_date: str = None, end_date: str = None,
+                            employee_name: str = None, batch_size: int = 500) -> Iterator[str]:
+        """Stream the attendance report as CSV text, one chunk per batch"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADER)
+        
+        count = 0
+        for record in self.iter_attendance_report(start_date, end_date, employee_name, batch_size):
+            writer.writerow([
+                record['name'],
+                record['date'],
+                record['check_in_time'] or '',
+                record['check_out_time'] or '',
+                record['total_hours'] or '',
+                record['status']
+            ])
+            count += 1
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
+    
+    def get_change_seq(self) -> Optional[int]:
+        """Highest updated_seq so far, to pass to get_attendance_changes"""
+        try:
+            self.cursor.execute('SELECT COALESCE(MAX(updated_seq), 0) FROM attendance')
+            return self.cursor.fetchone()[0]
+
+        except Exception as e:
+            print(f"Error getting change sequence: {e}")
+            return None
+
+    def get_attendance_changes(self, since_seq: int = 0, limit: int = 1000) -> List[Dict]:
+        """Attendance rows inserted or changed after since_seq, in the order they changed"""
+        try:
+            self.cursor.execute('''
+                SELECT updated_seq, name, date, check_in_time, check_out_time, total_hours
+                FROM attendance
+                WHERE updated_seq > ?
+                ORDER BY updated_seq
+                LIMIT ?
+            ''', (since_seq, limit))
+            return [dict(zip(CHANGE_COLUMNS, row)) for row in self.cursor.fetchall()]
+
+        except Exception as e:
+            print(f"Error getting attendance changes: {e}")
+            return []
+
+    def get_checked_in_names(self, target_date: str = None) -> List[str]:
+        """Names of everyone with a check-in on a date (default today)"""
+        try:
+            if target_date is None:
+                target_date = datetime.now().strftime("%Y-%m-%d")
+            self.cursor.execute('''
+                SELECT name FROM attendance
+                WHERE day_number = ? AND check_in_time IS NOT NULL
+            ''', (day_number(target_date),))
+            return [row[0] for row in self.cursor.fetchall()]
+        
+        except Exception as e:
+            print(f"Error getting checked-in names: {e}")
             return []
     
     def get_daily_summary(self, target_date: str = None) -> Dict:
-        """Get daily attendance summary"""
+        """Get daily attendance summary from the materialized summary tables"""
         try:
             if target_date is None:
                 target_date = datetime.now().strftime("%Y-%m-%d")
             
             # Get total employees
-            self.cursor.execute('SELECT COUNT(*) FROM employees WHERE is_active = 1')
-            total_employees = self.cursor.fetchone()[0]
+            self.cursor.execute('SELECT active_employees FROM employee_stats WHERE id = 1')
+            row = self.cursor.fetchone()
+            total_employees = row[0] if row else 0
             
-            # Get present employees
+            # Get present employees and hours worked
             self.cursor.execute('''
-                SELECT COUNT(DISTINCT name) FROM attendance 
-                WHERE date = ? AND check_in_time IS NOT NULL
+                SELECT present_employees, hours_total, hours_count
+                FROM daily_summary WHERE date = ?
             ''', (target_date,))
-            present_employees = self.cursor.fetchone()[0]
+            row = self.cursor.fetchone()
+            present_employees, hours_total, hours_count = row if row else (0, 0, 0)
             
             # Get absent employees
             absent_employees = total_employees - present_employees
             
             # Get average hours worked
-            self.cursor.execute('''
-                SELECT AVG(total_hours) FROM attendance 
-                WHERE date = ? AND total_hours IS NOT NULL
-            ''', (target_date,))
-            avg_hours = self.cursor.fetchone()[0] or 0
+            avg_hours = hours_total / hours_count if hours_count else 0
             
             return {
                 'date': target_date,
@@ -269,70 +1646,218 @@ class AttendanceDatabase:
             print(f"Error getting daily summary: {e}")
             return {}
     
+    def rebuild_daily_summary(self) -> bool:
+        """Rebuild the daily summary table from scratch"""
+        try:
+            with self.transaction() as cursor:
+                rebuild_summary_tables(cursor, keep_archived=True)
+            print("Daily summary rebuilt")
+            return True
+        except Exception as e:
+            print(f"Error rebuilding daily summary: {e}")
+            return False
+    
     def import_from_csv(self, csv_file: str) -> bool:
         """Import attendance data from CSV file"""
+        if not os.path.exists(csv_file):
+            print(f"CSV file not found: {csv_file}")
+            return False
+        
+        if self.import_csv_files([csv_file]) is None:
+            return False
+        
+        print(f"Successfully imported data from {csv_file}")
+        return True
+    
+    def import_csv_files(self, csv_files: List[str], workers: int = 1,
+                         batch_size: int = 10000) -> Optional[int]:
+        """Bulk import one or more CSV files
+
+        Files are parsed (in parallel when workers > 1) into the first
+        check-in per (name, date), staged in a temp table with executemany and
+        inserted with one set-based statement that skips days already in the
+        database. Returns the number of check-ins inserted, or None on error.
+        """
         try:
-            if not os.path.exists(csv_file):
-                print(f"CSV file not found: {csv_file}")
-                return False
+            csv_files = [f for f in csv_files if os.path.exists(f)]
             
-            with open(csv_file, 'r') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    name = row.get('Name', '').strip()
-                    datetime_str = row.get('Datetime', '').strip()
-                    
-                    if name and datetime_str and name != 'Unknown':
-                        # Parse datetime
-                        try:
-                            dt = datetime.strptime(datetime_str, "%Y/%m/%d, %H:%M:%S")
-                            date_str = dt.strftime("%Y-%m-%d")
-                            time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-                            
-                            # Check if this is a check-in (first record of the day for this person)
-                            self.cursor.execute('''
-                                SELECT id FROM attendance 
-                                WHERE name = ? AND date = ?
-                            ''', (name, date_str))
-                            
-                            if not self.cursor.fetchone():
-                                # This is a check-in
-                                self.cursor.execute('''
-                                    INSERT INTO attendance (name, date, check_in_time)
-                                    VALUES (?, ?, ?)
-                                ''', (name, date_str, time_str))
-                            
-                        except ValueError as e:
-                            print(f"Error parsing datetime {datetime_str}: {e}")
-                            continue
+            if workers > 1 and len(csv_files) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    parsed = list(executor.map(parse_attendance_csv, csv_files))
+            else:
+                parsed = [parse_attendance_csv(f) for f in csv_files]
             
-            self.conn.commit()
-            print(f"Successfully imported data from {csv_file}")
-            return True
+            # Merge the per-file results, keeping the earliest time
+            first_seen = {}
+            bad_rows = 0
+            for file_first_seen, file_bad_rows in parsed:
+                bad_rows += file_bad_rows
+                for key, time_str in file_first_seen.items():
+                    if key not in first_seen or time_str < first_seen[key]:
+                        first_seen[key] = time_str
+            
+            if bad_rows:
+                print(f"Skipped {bad_rows} rows with unparseable or impossible datetimes")
+            
+            rows = [(name, date_str, time_str) for (name, date_str), time_str in first_seen.items()]
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    CREATE TEMP TABLE IF NOT EXISTS import_staging (
+                        name TEXT NOT NULL,
+                        date TEXT NOT NULL,
+                        check_in_time TEXT NOT NULL
+                    )
+                ''')
+                cursor.execute('DELETE FROM import_staging')
+                for start in range(0, len(rows), batch_size):
+                    cursor.executemany(
+                        'INSERT INTO import_staging (name, date, check_in_time) VALUES (?, ?, ?)',
+                        rows[start:start + batch_size]
+                    )
+                
+                # Archived months are closed; their days are not reopened here
+                cursor.execute('''
+                    DELETE FROM import_staging
+                    WHERE substr(date, 1, 7) IN (SELECT month FROM archive_partitions)
+                ''')
+                archived_rows = cursor.rowcount
+                
+                # Only days without any record become check-ins
+                cursor.execute('''
+                    INSERT INTO attendance (name, date, check_in_time)
+                    SELECT s.name, s.date, s.check_in_time
+                    FROM import_staging s
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM attendance a
+                        WHERE a.name = s.name AND a.date = s.date
+                    )
+                ''')
+                inserted = cursor.rowcount
+                cursor.execute('DELETE FROM import_staging')
+            
+            if archived_rows:
+                print(f"Skipped {archived_rows} check-ins in archived months")
+            print(f"Imported {inserted} check-ins from {len(csv_files)} file(s)")
+            return inserted
             
         except Exception as e:
             print(f"Error importing from CSV: {e}")
-            return False
+            return None
+    
+    def archive_months(self, keep_months: int = 1, archive_dir: str = "archive") -> Optional[int]:
+        """Move closed months into per-month archive database files
+
+        Months before the last keep_months (1 keeps only the current month)
+        are copied to <archive_dir>/attendance_YYYY_MM.db, recorded in
+        archive_partitions and deleted from this database, then each archive
+        is compacted with VACUUM. Reports keep reading archived months
+        transparently; check-ins and summaries only touch this database, and
+        later inserts dated in an archived month are dropped.
+        Returns the number of rows archived, or None on error.
+        """
+        try:
+            month_start = date.today().replace(day=1)
+            for _ in range(keep_months - 1):
+                month_start = (month_start - timedelta(days=1)).replace(day=1)
+            
+            self.cursor.execute('''
+                SELECT DISTINCT substr(date, 1, 7) FROM attendance
+                WHERE day_number < ? ORDER BY 1
+            ''', (day_number(month_start.isoformat()),))
+            months = [row[0] for row in self.cursor.fetchall()]
+            
+            base = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(os.path.join(base, archive_dir), exist_ok=True)
+            
+            archived = 0
+            for month in months:
+                path = os.path.join(archive_dir, f"attendance_{month.replace('-', '_')}.db")
+                rows = self._archive_month(month, path, os.path.join(base, path))
+                archived += rows
+                print(f"Archived {rows} rows from {month} to {path}")
+            return archived
+            
+        except Exception as e:
+            print(f"Error archiving attendance: {e}")
+            return None
+    
+    def _archive_month(self, month: str, path: str, full_path: str) -> int:
+        """Move one month of attendance into its archive file"""
+        year, month_number = (int(part) for part in month.split('-'))
+        first_day = day_number(f"{month}-01")
+        last_day = first_day + calendar.monthrange(year, month_number)[1] - 1
+        
+        conn = self.conn
+        # ATTACH cannot run inside a transaction
+        conn.execute('ATTACH DATABASE ? AS arc', (full_path,))
+        try:
+            with self.transaction() as cursor:
+                cursor.execute('CREATE TABLE IF NOT EXISTS arc.attendance AS SELECT * FROM main.attendance WHERE 0')
+                for statement in ARCHIVE_INDEXES:
+                    cursor.execute(statement)
+                
+                # Copy the columns both sides have, so older archives keep working
+                cursor.execute('PRAGMA arc.table_info(attendance)')
+                archive_columns = {row[1] for row in cursor.fetchall()}
+                cursor.execute('PRAGMA main.table_info(attendance)')
+                columns = ', '.join(row[1] for row in cursor.fetchall() if row[1] in archive_columns)
+                
+                # Rows left by an interrupted run, or written before schema version 8
+                # closed archived months, replace their archived copy
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO arc.attendance ({columns})
+                    SELECT {columns} FROM main.attendance
+                    WHERE day_number BETWEEN ? AND ?
+                ''', (first_day, last_day))
+                moved = cursor.rowcount
+                cursor.execute('SELECT COUNT(*) FROM arc.attendance')
+                row_count = cursor.fetchone()[0]
+            
+            # Commits across WAL and attached files are not atomic together, so
+            # the copy is committed first; if the delete below never happens the
+            # rows stay here, reports ignore the unregistered archive and the
+            # next run copies them again
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO archive_partitions (month, path, first_day, last_day, row_count)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (month) DO UPDATE SET
+                        row_count = excluded.row_count,
+                        archived_at = CURRENT_TIMESTAMP
+                ''', (month, path, first_day, last_day, row_count))
+                
+                # The partition row above keeps the summary triggers from
+                # subtracting these rows
+                cursor.execute('DELETE FROM main.attendance WHERE day_number BETWEEN ? AND ?',
+                               (first_day, last_day))
+        finally:
+            conn.execute('DETACH DATABASE arc')
+        
+        archive = sqlite3.connect(full_path)
+        try:
+            archive.execute('VACUUM')
+        finally:
+            archive.close()
+        return moved
+    
+    def get_archive_partitions(self) -> List[Dict]:
+        """List the archived months"""
+        try:
+            self.cursor.execute('''
+                SELECT month, path, row_count, archived_at FROM archive_partitions ORDER BY month
+            ''')
+            return [dict(zip(['month', 'path', 'row_count', 'archived_at'], row))
+                    for row in self.cursor.fetchall()]
+        except Exception as e:
+            print(f"Error getting archive partitions: {e}")
+            return []
     
     def export_to_csv(self, filename: str, start_date: str = None, end_date: str = None) -> bool:
         """Export attendance data to CSV"""
         try:
-            records = self.get_attendance_report(start_date, end_date)
-            
             with open(filename, 'w', newline='') as file:
-                fieldnames = ['Name', 'Date', 'Check In Time', 'Check Out Time', 'Total Hours', 'Status']
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for record in records:
-                    writer.writerow({
-                        'Name': record['name'],
-                        'Date': record['date'],
-                        'Check In Time': record['check_in_time'] or '',
-                        'Check Out Time': record['check_out_time'] or '',
-                        'Total Hours': record['total_hours'] or '',
-                        'Status': record['status']
-                    })
+                for chunk in self.iter_attendance_csv(start_date, end_date):
+                    file.write(chunk)
             
             print(f"Attendance data exported to {filename}")
             return True
@@ -359,10 +1884,20 @@ class AttendanceDatabase:
             return []
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            print("Database connection closed")
+        """Close all database connections"""
+        if not self.initialized:
+            return
+        with self._pool_lock:
+            for conn in self._owners.values():
+                conn.close()
+            self._owners.clear()
+        with self._watch_lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
+        self._local = threading.local()
+        self.initialized = False
+        print("Database connection closed")
 
 def main():
     """Main function to demonstrate the attendance database"""
@@ -380,11 +1915,7 @@ def main():
         db.add_employee(*emp)
     
     # Import existing CSV data
-    if os.path.exists("20250704_register_log.csv"):
-        db.import_from_csv("20250704_register_log.csv")
-    
-    if os.path.exists("20250705_register_log.csv"):
-        db.import_from_csv("20250705_register_log.csv")
+    db.import_csv_files(["20250704_register_log.csv", "20250705_register_log.csv"])
     
     # Show daily summary
     summary = db.get_daily_summary()
@@ -0,0 +1,121 @@
+'''
+Attendance Feed
+Publishes check-ins, check-outs and the daily summary to an EventBroker as they happen
+'''
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict
+from attendance_database import AttendanceDatabase
+from event_broker import EventBroker
+from ttl_cache import TTLCache
+
+class AttendanceFeed:
+    def __init__(self, db: AttendanceDatabase, broker: EventBroker, poll_interval: float = 0.5,
+                 dedupe_seconds: float = 60.0):
+        """Initialize the feed
+
+        Writes made through db in this process are published the moment they
+        commit (db.add_write_listener). Writes from kiosks and other processes
+        are picked up by a watcher thread that polls db.data_generation()
+        every poll_interval seconds and reads the rows whose updated_seq moved;
+        a write seen both ways within dedupe_seconds is published once. After
+        each change the daily summary is queried once and published as a
+        retained event, so new viewers get it without a query of their own; it
+        is also republished when the date changes.
+        """
+        self.db = db
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.dedupe_seconds = dedupe_seconds
+
+        self._published = TTLCache(ttl=dedupe_seconds, max_entries=4096)
+        self._seq = None
+        self._generation = None
+        self._summary = None
+        self._watcher_thread = None
+        self._stop = threading.Event()
+
+        self.stats = {'local': 0, 'remote': 0, 'duplicates': 0, 'summaries': 0}
+
+    def publish_write(self, event: str, record: Dict) -> bool:
+        """Publish one check-in or check-out unless it was published recently"""
+        if not self._published.allow((event, record['name'], record['date'], record['time'])):
+            self.stats['duplicates'] += 1
+            return False
+        self.broker.publish(event, record)
+        return True
+
+    def on_write(self, event: str, record: Dict):
+        """Write listener for db"""
+        if self.publish_write(event, record):
+            self.stats['local'] += 1
+
+    def poll(self) -> bool:
+        """Publish rows changed by any process since the last poll; returns True if there were changes"""
+        generation = self.db.data_generation()
+        new_day = self._summary is not None and self._summary.get('date') != date.today().isoformat()
+        if generation == self._generation and not new_day:
+            return False
+
+        if self._seq is None:
+            # Only changes made from now on are news
+            self._seq = self.db.get_change_seq()
+            if self._seq is None:
+                return False
+        today = date.today().isoformat()
+        # Older check-ins have been published already or are no longer news
+        recent = (datetime.now() - timedelta(seconds=self.dedupe_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+        for change in self.db.get_attendance_changes(self._seq):
+            self._seq = change['updated_seq']
+            # Rows for other days come from imports and merges, not from someone arriving
+            if change['date'] != today:
+                continue
+            # A check-in and check-out between two polls show up as one checked-out row
+            events = []
+            check_in_time = change['check_in_time']
+            if check_in_time and (not change['check_out_time'] or check_in_time >= recent):
+                events.append(('check_in', check_in_time, None))
+            if change['check_out_time']:
+                events.append(('check_out', change['check_out_time'], change['total_hours']))
+            for event, time_str, total_hours in events:
+                record = {'name': change['name'], 'date': change['date'], 'time': time_str,
+                          'total_hours': total_hours}
+                if self.publish_write(event, record):
+                    self.stats['remote'] += 1
+
+        summary = self.db.get_daily_summary()
+        if summary and summary != self._summary:
+            self._summary = summary
+            self.broker.publish('summary', summary, retain=True)
+            self.stats['summaries'] += 1
+        # A batch larger than get_attendance_changes' limit is finished next poll
+        self._generation = generation if self._seq >= (self.db.get_change_seq() or 0) else None
+        return True
+
+    def watcher_loop(self):
+        """Poll for database changes"""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Attendance feed error: {e}")
+
+    def start(self):
+        """Publish the current summary and start following the database"""
+        self.db.add_write_listener(self.on_write)
+        self.poll()
+        self._stop.clear()
+        self._watcher_thread = threading.Thread(target=self.watcher_loop, daemon=True)
+        self._watcher_thread.start()
+
+    def stop(self):
+        """Stop following the database"""
+        self._stop.set()
+        if self._watcher_thread is not None:
+            self._watcher_thread.join()
+            self._watcher_thread = None
+
+    def get_stats(self) -> Dict:
+        """Get feed counters together with the broker's"""
+        return {**self.stats, **self.broker.get_stats()}
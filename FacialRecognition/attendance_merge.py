@@ -0,0 +1,178 @@
+'''
+Attendance Merge
+Consolidate the attendance databases written by several kiosks into one
+'''
+
+import os
+import time
+import argparse
+from typing import Dict, List
+from attendance_database import AttendanceDatabase
+
+# Reconcile one attached kiosk database into the main one: a person's day keeps
+# the earliest check-in and the latest check-out seen by any kiosk. Months the
+# target has archived are closed and skipped.
+MERGE_ATTENDANCE_SQL = '''
+    INSERT INTO main.attendance (name, date, check_in_time, check_out_time)
+    SELECT name, date, MIN(check_in_time), MAX(check_out_time)
+    FROM src.attendance
+    WHERE ({where}) AND substr(date, 1, 7) NOT IN (SELECT month FROM main.archive_partitions)
+    GROUP BY name, date
+    ON CONFLICT (name, date) DO UPDATE SET
+        check_in_time = COALESCE(MIN(check_in_time, excluded.check_in_time), check_in_time, excluded.check_in_time),
+        check_out_time = COALESCE(MAX(check_out_time, excluded.check_out_time), check_out_time, excluded.check_out_time)
+    WHERE excluded.check_in_time < check_in_time
+       OR excluded.check_out_time > check_out_time
+       OR (check_in_time IS NULL AND excluded.check_in_time IS NOT NULL)
+       OR (check_out_time IS NULL AND excluded.check_out_time IS NOT NULL)
+'''
+
+# Employees are deduplicated by name; the first kiosk to know someone wins
+MERGE_EMPLOYEES_SQL = '''
+    INSERT OR IGNORE INTO main.employees (name, employee_id, department, position, is_active)
+    SELECT name, employee_id, department, position, is_active
+    FROM src.employees
+'''
+
+def collect_sources(paths: List[str]) -> List[str]:
+    """Expand directories into the .db files they contain"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.db')))
+        else:
+            sources.append(path)
+    return sources
+
+class AttendanceMerger:
+    def __init__(self, db: AttendanceDatabase):
+        """Initialize the merger for a target database"""
+        self.db = db
+
+    def source_columns(self, table: str) -> List[str]:
+        """Columns of a table in the attached source, empty if it is missing"""
+        self.db.cursor.execute(f'PRAGMA src.table_info({table})')
+        return [row[1] for row in self.db.cursor.fetchall()]
+
+    def merge_source(self, source_path: str, full: bool = False) -> Dict:
+        """Merge one kiosk database into the target
+
+        Sources with an updated_seq column (any database opened by a current
+        AttendanceDatabase) are merged incrementally from the high-water mark
+        stored in merge_state; older sources are merged in full, which is
+        safe because merging is idempotent.
+        """
+        source_key = os.path.abspath(source_path)
+        stats = {'source': source_path, 'rows_scanned': 0, 'rows_merged': 0, 'incremental': False}
+        conn = self.db.conn
+
+        # ATTACH cannot run inside a transaction
+        conn.execute('ATTACH DATABASE ? AS src', (source_path,))
+        try:
+            attendance_columns = self.source_columns('attendance')
+            if not attendance_columns:
+                print(f"Skipping {source_path}: no attendance table")
+                return stats
+
+            with self.db.transaction() as cursor:
+                high_water = 0
+                incremental = 'updated_seq' in attendance_columns and not full
+                if incremental:
+                    cursor.execute('SELECT high_water FROM merge_state WHERE source = ?', (source_key,))
+                    row = cursor.fetchone()
+                    high_water = row[0] if row else 0
+
+                    cursor.execute('SELECT COALESCE(MAX(updated_seq), 0) FROM src.attendance')
+                    source_max = cursor.fetchone()[0]
+                    if source_max < high_water:
+                        # The kiosk database was recreated; start over
+                        high_water = 0
+                    where = 'updated_seq > ? AND updated_seq <= ?'
+                    params = (high_water, source_max)
+                else:
+                    source_max = 0
+                    where = '1'
+                    params = ()
+
+                cursor.execute(f'SELECT COUNT(*) FROM src.attendance WHERE {where}', params)
+                stats['rows_scanned'] = cursor.fetchone()[0]
+
+                cursor.execute('SELECT COALESCE(MAX(updated_seq), 0) FROM main.attendance')
+                target_seq = cursor.fetchone()[0]
+
+                cursor.execute(MERGE_ATTENDANCE_SQL.format(where=where), params)
+                stats['rows_merged'] = cursor.rowcount
+
+                # Recompute hours for every row this merge inserted or changed
+                cursor.execute('''
+                    UPDATE main.attendance SET total_hours = (check_out_ts - check_in_ts) / 3600.0
+                    WHERE updated_seq > ? AND check_out_ts IS NOT NULL AND check_in_ts IS NOT NULL
+                      AND total_hours IS NOT (check_out_ts - check_in_ts) / 3600.0
+                ''', (target_seq,))
+
+                if 'name' in self.source_columns('employees'):
+                    cursor.execute(MERGE_EMPLOYEES_SQL)
+                    stats['employees_added'] = cursor.rowcount
+
+                cursor.execute('''
+                    INSERT INTO merge_state (source, high_water, rows_merged, merged_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (source) DO UPDATE SET
+                        high_water = excluded.high_water,
+                        rows_merged = rows_merged + excluded.rows_merged,
+                        merged_at = excluded.merged_at
+                ''', (source_key, source_max, stats['rows_merged']))
+
+                stats['incremental'] = incremental
+            return stats
+
+        finally:
+            conn.execute('DETACH DATABASE src')
+
+    def merge(self, source_paths: List[str], full: bool = False) -> List[Dict]:
+        """Merge several kiosk databases, one transaction per source"""
+        results = []
+        target_path = os.path.abspath(self.db.db_path)
+        for source_path in collect_sources(source_paths):
+            if os.path.abspath(source_path) == target_path:
+                continue
+            if not os.path.exists(source_path):
+                print(f"Source database not found: {source_path}")
+                continue
+
+            start_time = time.time()
+            try:
+                stats = self.merge_source(source_path, full)
+            except Exception as e:
+                print(f"Error merging {source_path}: {e}")
+                continue
+            stats['seconds'] = round(time.time() - start_time, 3)
+            results.append(stats)
+
+            mode = 'incremental' if stats['incremental'] else 'full'
+            print(f"Merged {source_path} ({mode}): {stats['rows_scanned']} rows scanned, "
+                  f"{stats['rows_merged']} inserted or updated in {stats['seconds']}s")
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge kiosk attendance databases')
+    parser.add_argument('sources', nargs='+', help='Kiosk database files or directories of .db files')
+    parser.add_argument('--into', default='attendance.db', help='Target attendance database')
+    parser.add_argument('--full', action='store_true', help='Ignore high-water marks and merge everything')
+
+    args = parser.parse_args()
+
+    db = AttendanceDatabase(args.into)
+    if not db.initialized:
+        return
+
+    try:
+        start_time = time.time()
+        results = AttendanceMerger(db).merge(args.sources, full=args.full)
+        print(f"\nMerged {len(results)} database(s), "
+              f"{sum(r['rows_merged'] for r in results)} rows changed in {time.time() - start_time:.2f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
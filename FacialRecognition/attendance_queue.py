@@ -0,0 +1,265 @@
+'''
+Attendance Event Queue
+Write-behind queue for recognition-driven check-ins, backed by an on-disk spool
+'''
+
+import os
+import json
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from attendance_database import AttendanceDatabase, is_transient_error
+
+class AttendanceEventQueue:
+    def __init__(self, db: AttendanceDatabase, spool_path: str = "attendance_spool.jsonl",
+                 batch_size: int = 200, flush_interval: float = 0.5, retry_delay: float = 2.0,
+                 max_retries: int = 30, dead_letter_path: str = None,
+                 on_result: Optional[Callable[[str, bool], None]] = None):
+        """Initialize the queue
+
+        Events are appended to the spool file before check_in() returns and are
+        removed from it only after the database transaction that stores them
+        has committed. Spool lines are flushed to the operating system on every
+        check_in() but only fsynced by the writer thread once per batch, so a
+        crash of this process loses nothing, while a power failure can lose the
+        events queued since the last batch (about flush_interval seconds).
+
+        A batch the database refuses because it is locked or busy is retried
+        every retry_delay seconds, up to max_retries times. Events that fail
+        for any other reason, or are still locked out after the last retry,
+        are moved to the dead-letter file (spool_path + '.dead' by default)
+        with their error, instead of blocking the events behind them.
+        on_result(name, checked_in) is called from the writer thread.
+        """
+        self.db = db
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path or spool_path + '.dead'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.on_result = on_result
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._unacked = OrderedDict()  # seq -> event, in spool order
+        self._held = []  # batch that failed to write, retried first
+        self._attempts = 0  # failed attempts at the held batch
+        self._spool_lines = 0
+        self._next_seq = 1
+        self._spool = None
+        self._writer_thread = None
+        self._stop = threading.Event()
+
+        self.stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'retries': 0, 'dead_lettered': 0}
+
+    def start(self):
+        """Replay any spooled events and start the writer thread"""
+        replayed = self.load_spool()
+        self._spool = open(self.spool_path, 'a')
+        self.rewrite_spool()
+
+        for event in replayed:
+            self._queue.put(event)
+        if replayed:
+            print(f"Replaying {len(replayed)} spooled attendance events")
+
+        self._stop.clear()
+        self._writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def load_spool(self) -> List[Dict]:
+        """Read events left in the spool by a previous run"""
+        events = []
+        if not os.path.exists(self.spool_path):
+            return events
+
+        with open(self.spool_path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                event['seq'] = self._next_seq
+                self._next_seq += 1
+                self._unacked[event['seq']] = event
+                events.append(event)
+        return events
+
+    def check_in(self, name: str, check_in_time: str = None) -> int:
+        """Queue a check-in and return immediately"""
+        if check_in_time is None:
+            check_in_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self._lock:
+            event = {'seq': self._next_seq, 'action': 'check_in', 'name': name, 'time': check_in_time}
+            self._next_seq += 1
+            self._spool.write(json.dumps({k: event[k] for k in ('action', 'name', 'time')}) + '\n')
+            self._spool.flush()
+            self._spool_lines += 1
+            self._unacked[event['seq']] = event
+            self.stats['enqueued'] += 1
+
+        self._queue.put(event)
+        return event['seq']
+
+    def next_batch(self) -> List[Dict]:
+        """Wait for one event, then drain whatever else is already queued
+
+        A batch that failed to write is retried first, ahead of newer events.
+        """
+        batch = self._held
+        self._held = []
+        if not batch:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def coalesce(self, batch: List[Dict]) -> List[Dict]:
+        """Keep only the earliest check-in per person and day"""
+        earliest = {}
+        for event in batch:
+            key = (event['name'], event['time'][:10])
+            if key not in earliest or event['time'] < earliest[key]['time']:
+                earliest[key] = event
+        return list(earliest.values())
+
+    def writer_loop(self):
+        """Write queued events in batched transactions"""
+        while not (self._stop.is_set() and self._queue.empty() and not self._held):
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            self.sync_spool()
+            events = self.coalesce(batch)
+            results = self.write(events)
+
+            if results is None:
+                # Database locked or busy: keep the events and retry
+                self.stats['retries'] += 1
+                self._attempts += 1
+                if self._attempts <= self.max_retries:
+                    self._held = batch
+                    if self._stop.is_set():
+                        # Shutting down; the events stay in the spool
+                        break
+                    self._stop.wait(self.retry_delay)
+                    continue
+                self.dead_letter(events, f"database still locked after {self.max_retries} retries")
+                results = [False] * len(events)
+            self._attempts = 0
+
+            self.acknowledge(batch)
+            self.stats['written'] += sum(results)
+            self.stats['batches'] += 1
+
+            if self.on_result is not None:
+                for event, checked_in in zip(events, results):
+                    try:
+                        self.on_result(event['name'], checked_in)
+                    except Exception as e:
+                        print(f"Attendance result callback error: {e}")
+
+    def write(self, events: List[Dict]) -> Optional[List[bool]]:
+        """Check events in, returning one flag per event or None to retry later
+
+        When a batch fails with an error retrying cannot fix, its events are
+        written one at a time so only the ones that fail on their own are
+        dead-lettered.
+        """
+        try:
+            return self.db.check_in_batch([(event['name'], event['time']) for event in events])
+        except Exception as e:
+            if len(events) == 1:
+                self.dead_letter(events, str(e))
+                return [False]
+            print(f"Attendance batch failed ({e}); writing its {len(events)} events one at a time")
+
+        results = []
+        for event in events:
+            result = self.write([event])
+            if result is None:
+                # Written events are no-ops when the batch is retried
+                return None
+            results += result
+        return results
+
+    def dead_letter(self, events: List[Dict], error: str):
+        """Append events that could not be written to the dead-letter file"""
+        with open(self.dead_letter_path, 'a') as f:
+            for event in events:
+                f.write(json.dumps({**{k: event[k] for k in ('action', 'name', 'time')}, 'error': error}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats['dead_lettered'] += len(events)
+        print(f"Moved {len(events)} attendance events to {self.dead_letter_path}: {error}")
+
+    def sync_spool(self):
+        """Make the spooled events durable before their batch is written"""
+        with self._lock:
+            if self._spool is not None:
+                os.fsync(self._spool.fileno())
+
+    def acknowledge(self, batch: List[Dict]):
+        """Drop committed events from the spool"""
+        with self._lock:
+            for event in batch:
+                self._unacked.pop(event['seq'], None)
+
+            if self._spool is None:
+                return
+
+            if not self._unacked:
+                # Everything is committed: empty the spool in place
+                self._spool.truncate(0)
+                self._spool_lines = 0
+            elif self._spool_lines > 2 * len(self._unacked) + 1000:
+                # Compact once most spooled lines are committed
+                self.rewrite_spool()
+
+    def rewrite_spool(self):
+        """Rewrite the spool with only the pending events"""
+        temp_path = self.spool_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for event in self._unacked.values():
+                f.write(json.dumps({k: event[k] for k in ('action', 'name', 'time')}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._spool.close()
+        os.replace(temp_path, self.spool_path)
+        self._spool = open(self.spool_path, 'a')
+        self._spool_lines = len(self._unacked)
+
+    def pending(self) -> int:
+        """Number of events not yet committed to the database"""
+        with self._lock:
+            return len(self._unacked)
+
+    def stop(self, timeout: float = 10.0):
+        """Flush queued events and stop the writer thread
+
+        Events still pending after the timeout stay in the spool and are
+        written on the next start().
+        """
+        self._stop.set()
+        if self._writer_thread is not None:
+            self._writer_thread.join(timeout)
+            self._writer_thread = None
+
+        with self._lock:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
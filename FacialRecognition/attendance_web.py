@@ -4,9 +4,13 @@ Flask-based web application for attendance management
 '''
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Response, stream_template, stream_with_context
 from datetime import datetime, date
 import os
+from reporting_snapshot import ReportingSnapshot
 from attendance_database import AttendanceDatabase
+import attendance_web_common as common
+from attendance_web_common import get_report_filters, check_report_dates
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this in production
@@ -14,6 +18,9 @@ app.secret_key = 'your-secret-key-here'  # Change this in production
 # Global database instance
 db = None
 
+# Read-only copy of the database that reports and exports query
+snapshot = None
+
 def get_db():
     """Get database instance"""
     global db
@@ -21,6 +28,22 @@ def get_db():
         db = AttendanceDatabase()
     return db
 
+def get_snapshot():
+    """Get the reporting snapshot, publishing the first copy on first use"""
+    global snapshot
+    if snapshot is None:
+        snapshot = ReportingSnapshot(get_db().db_path)
+        snapshot.start()
+    return snapshot
+
+def get_report_db():
+    """Get the database that report queries should run against"""
+    return common.report_database(get_snapshot(), get_db())
+
+def snapshot_headers():
+    """Response headers telling clients how old report data may be"""
+    return common.snapshot_headers(get_snapshot())
+
 @app.route('/')
 def index():
     """Home page"""
@@ -31,7 +54,7 @@ def dashboard():
     """Dashboard with summary"""
     db = get_db()
     summary = db.get_daily_summary()
-    recent_records = db.get_attendance_report()[:10]
+    recent_records = db.get_attendance_report(limit=10)
     employees = db.get_employees()
     
     return render_template('dashboard.html', 
@@ -104,48 +127,68 @@ def add_employee():
 @app.route('/reports')
 def reports():
     """Reports page"""
-    db = get_db()
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    employee = request.args.get('employee', '')
+    db = get_report_db()
+    filters = get_report_filters()
+    try:
+        check_report_dates(*filters)
+    except ValueError as e:
+        flash(f'{e}.', 'error')
+        return redirect(url_for('reports'))
     
-    records = db.get_attendance_report(
-        start_date if start_date else None,
-        end_date if end_date else None,
-        employee if employee else None
-    )
+    # Rows are rendered as they are fetched instead of being loaded up front
+    return Response(stream_with_context(stream_template(
+        'reports.html',
+        records=db.iter_attendance_report(*filters),
+        record_count=db.count_attendance(*filters)
+    )), headers=snapshot_headers())
+
+@app.route('/reports/export.csv')
+def export_csv():
+    """Stream the filtered report as a CSV download"""
+    db = get_report_db()
+    filters = get_report_filters()
+    try:
+        check_report_dates(*filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return render_template('reports.html', records=records)
+    return Response(
+        stream_with_context(db.iter_attendance_csv(*filters)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=attendance_report.csv',
+                 **snapshot_headers()}
+    )
 
 @app.route('/api/check_in', methods=['POST'])
 def api_check_in():
     """API endpoint for check-in"""
-    data = request.get_json()
-    name = data.get('name', '').strip()
-    
-    if not name:
-        return jsonify({'success': False, 'message': 'Name is required'})
-    
-    db = get_db()
-    if db.check_in(name):
-        return jsonify({'success': True, 'message': f'{name} checked in successfully!'})
-    else:
-        return jsonify({'success': False, 'message': f'{name} already checked in today'})
+    return jsonify(common.record_attendance(get_db(), 'check_in', request.get_json()))
 
 @app.route('/api/check_out', methods=['POST'])
 def api_check_out():
     """API endpoint for check-out"""
-    data = request.get_json()
-    name = data.get('name', '').strip()
-    
-    if not name:
-        return jsonify({'success': False, 'message': 'Name is required'})
-    
-    db = get_db()
-    if db.check_out(name):
-        return jsonify({'success': True, 'message': f'{name} checked out successfully!'})
-    else:
-        return jsonify({'success': False, 'message': f'No check-in record found for {name} today'})
+    return jsonify(common.record_attendance(get_db(), 'check_out', request.get_json()))
+
+@app.route('/api/check_in/batch', methods=['POST'])
+def api_check_in_batch():
+    """API endpoint for many timestamped check-ins in one transaction"""
+    result, status = common.record_batch(get_db(), 'check_in', request.get_json(silent=True))
+    return jsonify(result), status
+
+@app.route('/api/check_out/batch', methods=['POST'])
+def api_check_out_batch():
+    """API endpoint for many timestamped check-outs in one transaction"""
+    result, status = common.record_batch(get_db(), 'check_out', request.get_json(silent=True))
+    return jsonify(result), status
+
+@app.route('/api/attendance')
+def api_attendance():
+    """API endpoint for attendance data, served from the reporting snapshot
+
+    Pages with ?limit= and ?cursor=, or streams JSON or NDJSON; see
+    attendance_web_common.attendance_listing.
+    """
+    return common.attendance_listing(get_report_db(), snapshot_headers())
 
 @app.route('/api/summary')
 def api_summary():
@@ -476,11 +519,12 @@ def create_templates():
 </div>
 
 <div class="card">
-    <div class="card-header">
-        <h5 class="card-title mb-0">Attendance Records ({{ records|length }} records)</h5>
+    <div class="card-header d-flex justify-content-between align-items-center">
+        <h5 class="card-title mb-0">Attendance Records ({{ record_count }} records)</h5>
+        <a href="/reports/export.csv?{{ request.query_string.decode() }}" class="btn btn-sm btn-outline-secondary">Export CSV</a>
     </div>
     <div class="card-body">
-        {% if records %}
+        {% if record_count %}
             <div class="table-responsive">
                 <table class="table table-striped">
                     <thead>
@@ -0,0 +1,166 @@
+'''
+Attendance Web Common
+Request handling shared by attendance_web.py and attendance_web_server.py,
+so both apps validate and answer the same way
+'''
+
+import re
+import json
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from flask import Response, jsonify, request, stream_with_context
+from attendance_database import AttendanceDatabase, SELECTABLE_COLUMNS, REPORT_SORTS, decode_cursor
+from reporting_snapshot import ReportingSnapshot
+
+# Largest batch accepted by /api/check_in/batch and /api/check_out/batch
+MAX_BATCH_EVENTS = 1000
+
+# Success and failure messages of /api/check_in and /api/check_out
+SINGLE_MESSAGES = {
+    'check_in': ('{name} checked in successfully!', '{name} already checked in today'),
+    'check_out': ('{name} checked out successfully!', 'No check-in record found for {name} today'),
+}
+
+def get_report_filters() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Read the report filters (start_date, end_date, employee) from the query string"""
+    start_date = request.args.get('start_date', '')
+    end_date = request.args.get('end_date', '')
+    employee = request.args.get('employee', '')
+
+    return (
+        start_date if start_date else None,
+        end_date if end_date else None,
+        employee if employee else None
+    )
+
+def check_report_dates(start_date: Optional[str], end_date: Optional[str], employee: Optional[str] = None):
+    """Raise ValueError unless the report filter dates are real YYYY-MM-DD dates"""
+    for field, value in (('start_date', start_date), ('end_date', end_date)):
+        if value is None:
+            continue
+        try:
+            if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+                raise ValueError
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'{field} must be a date as YYYY-MM-DD')
+
+def get_listing_options():
+    """Read limit, columns and sort from the query string
+
+    Raises ValueError for values the database layer would reject.
+    """
+    limit = request.args.get('limit', 100, type=int)
+    if not 1 <= limit <= 1000:
+        raise ValueError('limit must be between 1 and 1000')
+    
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or None
+    unknown = [c for c in columns or [] if c not in SELECTABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    
+    sort = request.args.get('sort', 'newest')
+    if sort not in REPORT_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(REPORT_SORTS)}")
+    
+    return limit, columns, sort
+
+def report_database(snapshot: ReportingSnapshot, db: AttendanceDatabase) -> AttendanceDatabase:
+    """The database that report queries should run against
+
+    Reports read the snapshot so they never compete with kiosk check-ins;
+    the live database is only used if no snapshot could be published.
+    """
+    return snapshot.database() or db
+
+def snapshot_headers(snapshot: ReportingSnapshot) -> Dict[str, str]:
+    """Response headers telling clients how old report data may be"""
+    age = snapshot.age()
+    return {'X-Snapshot-Age': f"{age:.0f}"} if age is not None else {}
+
+def record_attendance(db: AttendanceDatabase, action: str, data) -> Dict:
+    """Result of /api/check_in or /api/check_out for a parsed JSON body"""
+    if not isinstance(data, dict):
+        return {'success': False, 'message': 'Invalid JSON data'}
+
+    name = data.get('name')
+    name = name.strip() if isinstance(name, str) else ''
+
+    if not name:
+        return {'success': False, 'message': 'Name is required'}
+
+    applied, rejected = SINGLE_MESSAGES[action]
+    if getattr(db, action)(name):
+        return {'success': True, 'message': applied.format(name=name)}
+    else:
+        return {'success': False, 'message': rejected.format(name=name)}
+
+def record_batch(db: AttendanceDatabase, action: str, data) -> Tuple[Dict, int]:
+    """Result and status code of a batch of check-ins or check-outs
+
+    Accepts {"events": [...]} or a bare list of {"name", "time",
+    "idempotency_key"} objects and returns per-event results. Nothing is
+    applied if the database is unavailable (503), so the client can retry
+    the same batch; idempotency keys keep a retry from applying events twice.
+    """
+    events = data.get('events') if isinstance(data, dict) else data
+    if not isinstance(events, list):
+        return {'success': False, 'message': 'Expected a JSON list of events or {"events": [...]}'}, 400
+    if len(events) > MAX_BATCH_EVENTS:
+        return {'success': False, 'message': f'At most {MAX_BATCH_EVENTS} events per batch'}, 413
+
+    results = db.record_attendance_batch(action, events)
+    if results is None:
+        return {'success': False, 'message': 'Database unavailable, retry the batch'}, 503
+    return {
+        'success': True,
+        'processed': len(results),
+        'applied': sum(1 for r in results if r.get('success') and not r.get('duplicate')),
+        'duplicates': sum(1 for r in results if r.get('duplicate')),
+        'failed': sum(1 for r in results if not r.get('success')),
+        'results': results
+    }, 200
+
+def attendance_listing(db: AttendanceDatabase, headers: Dict[str, str]):
+    """Response of /api/attendance for the current request
+
+    With ?limit= or ?cursor= returns one page as {"records": [...],
+    "next_cursor": ...}; pass next_cursor back to get the following page.
+    Otherwise streams a JSON array, or one JSON object per line with
+    ?format=ndjson, so large date ranges never sit in memory. ?columns=
+    and ?sort= apply to both. Bad filters answer 400.
+    """
+    filters = get_report_filters()
+    try:
+        check_report_dates(*filters)
+        limit, columns, sort = get_listing_options()
+        cursor = request.args.get('cursor')
+        if cursor and len(decode_cursor(cursor)) != len(REPORT_SORTS[sort]):
+            raise ValueError('cursor does not match the sort order')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if 'limit' in request.args or cursor:
+        page = db.get_attendance_page(*filters, limit=limit, cursor=cursor, columns=columns, sort=sort)
+        if not page:
+            return jsonify({'success': False, 'message': 'Error reading attendance'}), 500
+        return jsonify(page), 200, headers
+    
+    records = db.iter_attendance_report(*filters, columns=columns, sort=sort)
+    
+    if request.args.get('format') == 'ndjson':
+        def generate_ndjson():
+            for record in records:
+                yield json.dumps(record) + '\n'
+        
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson',
+                        headers=headers)
+    
+    def generate_json():
+        yield '['
+        for i, record in enumerate(records):
+            yield (',' if i else '') + json.dumps(record)
+        yield ']'
+    
+    return Response(stream_with_context(generate_json()), mimetype='application/json',
+                    headers=headers)
@@ -3,26 +3,153 @@ Attendance Web Server
 Remote web interface for attendance management
 '''
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Response, stream_template, stream_with_context
 from datetime import datetime, date
 import os
 import threading
 import time
+from reporting_snapshot import ReportingSnapshot
+from response_cache import ResponseCache
+from event_broker import EventBroker
+from attendance_feed import AttendanceFeed
 from attendance_database import AttendanceDatabase
+from attendance_analytics import ANALYTICS, run_analytics
+import attendance_web_common as common
+from attendance_web_common import get_report_filters, check_report_dates
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this in production
 
-# Global database instance
+# Global database instance, opened on first use in each process
 db = None
+db_path = "attendance.db"
+db_pid = None
+
+# Whether this process publishes the reporting snapshot; under serve_attendance.py
+# the master process publishes it once for all workers
+publish_snapshot = True
+
+# Read-only copy of the database that reports and exports query
+snapshot = None
+
+# Query results and rendered pages, valid until the next database write
+response_cache = None
+
+# Live check-ins and check-outs pushed to /api/events viewers
+attendance_feed = None
+
+# Kiosk camera streams (mjpeg_stream.py) shown on /live, e.g.
+# ATTENDANCE_CAMERA_STREAMS=http://kiosk-1:8090,http://kiosk-2:8090
+camera_streams = [url.strip().rstrip('/') for url in os.environ.get('ATTENDANCE_CAMERA_STREAMS', '').split(',')
+                  if url.strip()]
+STREAM_QUALITIES = ['high', 'medium', 'low']
 
 def get_db():
-    """Get database instance"""
-    global db
+    """Get database instance
+
+    SQLite connections must not cross a fork, so a worker process forked
+    after the database was opened gets fresh state of its own.
+    """
+    global db, db_pid
+    if db is not None and db_pid is not None and db_pid != os.getpid():
+        reset_worker_state()
     if db is None:
-        db = AttendanceDatabase()
+        db = AttendanceDatabase(db_path)
+        db_pid = os.getpid()
     return db
 
+def reset_worker_state():
+    """Forget the database, caches and feed inherited from a parent process
+
+    The inherited objects are dropped, not closed: their connections and
+    threads belong to the parent.
+    """
+    global db, db_pid, snapshot, response_cache, attendance_feed
+    db = None
+    db_pid = None
+    snapshot = None
+    response_cache = None
+    attendance_feed = None
+
+def shutdown():
+    """Stop background threads, end live streams and close the database"""
+    if attendance_feed is not None:
+        attendance_feed.stop()
+        attendance_feed.broker.close()
+    if snapshot is not None:
+        snapshot.stop()
+    if db is not None:
+        db.close()
+    reset_worker_state()
+
+def get_snapshot():
+    """Get the reporting snapshot, publishing the first copy on first use"""
+    global snapshot
+    if snapshot is None:
+        snapshot = ReportingSnapshot(get_db().db_path)
+        if publish_snapshot:
+            snapshot.start()
+    return snapshot
+
+def get_response_cache():
+    """Get the response cache for the live database"""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache(get_db())
+    return response_cache
+
+def get_attendance_feed():
+    """Get the live attendance feed, following the database from first use"""
+    global attendance_feed
+    if attendance_feed is None:
+        attendance_feed = AttendanceFeed(get_db(), EventBroker())
+        attendance_feed.start()
+    return attendance_feed
+
+def get_today_summary():
+    """Today's summary, queried once per database change"""
+    return get_response_cache().get(('daily_summary', date.today().isoformat()),
+                                     get_db().get_daily_summary)
+
+def get_report_db():
+    """Get the database that report queries should run against"""
+    return common.report_database(get_snapshot(), get_db())
+
+def snapshot_headers():
+    """Response headers telling clients how old report data may be"""
+    return common.snapshot_headers(get_snapshot())
+
+def get_analytics_options(kind):
+    """Read the options of one kind of analytics from the query string
+
+    Raises ValueError for missing or out of range values.
+    """
+    if kind == 'arrivals':
+        bin_minutes = request.args.get('bin_minutes', 15, type=int)
+        if not 1 <= bin_minutes <= 1440:
+            raise ValueError('bin_minutes must be between 1 and 1440')
+        return {'bin_minutes': bin_minutes}
+    
+    if kind == 'lateness':
+        start_time = request.args.get('start_time', '09:00')
+        try:
+            datetime.strptime(start_time, '%H:%M')
+        except ValueError:
+            raise ValueError('start_time must be HH:MM')
+        grace_minutes = request.args.get('grace_minutes', 0, type=int)
+        if grace_minutes < 0:
+            raise ValueError('grace_minutes must not be negative')
+        return {'start_time': start_time, 'grace_minutes': grace_minutes}
+    
+    if kind == 'attendance-rate':
+        window = request.args.get('window', 7, type=int)
+        if not 1 <= window <= 366:
+            raise ValueError('window must be between 1 and 366')
+        return {'window': window}
+    
+    return {}
+
 @app.route('/')
 def index():
     """Home page"""
@@ -32,14 +159,17 @@ def index():
 def dashboard():
     """Dashboard with summary"""
     db = get_db()
-    summary = db.get_daily_summary()
-    recent_records = db.get_attendance_report()[:10]
-    employees = db.get_employees()
     
-    return render_template('dashboard.html', 
-                         summary=summary, 
-                         recent_records=recent_records,
-                         employees=employees)
+    def render():
+        return render_template('dashboard.html', 
+                             summary=get_today_summary(), 
+                             recent_records=db.get_attendance_report(limit=10),
+                             employees=db.get_employees())
+    
+    # Pending flash messages are rendered into the page, so it cannot be shared
+    if '_flashes' in session:
+        return render()
+    return get_response_cache().response(('dashboard', date.today().isoformat()), render)
 
 @app.route('/check_in', methods=['GET', 'POST'])
 def check_in():
@@ -106,90 +236,158 @@ def add_employee():
 @app.route('/reports')
 def reports():
     """Reports page"""
-    db = get_db()
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    employee = request.args.get('employee', '')
+    db = get_report_db()
+    filters = get_report_filters()
+    try:
+        check_report_dates(*filters)
+    except ValueError as e:
+        flash(f'{e}.', 'error')
+        return redirect(url_for('reports'))
     
-    records = db.get_attendance_report(
-        start_date if start_date else None,
-        end_date if end_date else None,
-        employee if employee else None
-    )
+    # Rows are rendered as they are fetched instead of being loaded up front
+    return Response(stream_with_context(stream_template(
+        'reports.html',
+        records=db.iter_attendance_report(*filters),
+        record_count=db.count_attendance(*filters)
+    )), headers=snapshot_headers())
+
+@app.route('/reports/export.csv')
+def export_csv():
+    """Stream the filtered report as a CSV download"""
+    db = get_report_db()
+    filters = get_report_filters()
+    try:
+        check_report_dates(*filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return render_template('reports.html', records=records)
+    return Response(
+        stream_with_context(db.iter_attendance_csv(*filters)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=attendance_report.csv',
+                 **snapshot_headers()}
+    )
+
+def record_attendance(action, data):
+    """Result of /api/check_in or /api/check_out for a parsed JSON body
+
+    Shared with attendance_asgi.py so both serve the same responses.
+    """
+    return common.record_attendance(get_db(), action, data)
+
+@app.route('/live')
+def live():
+    """Annotated camera streams from the kiosks
+
+    Browsers load each stream straight from its kiosk, which encodes a frame
+    once for all viewers, so watching costs this server nothing.
+    """
+    quality = request.args.get('quality', 'medium')
+    if quality not in STREAM_QUALITIES:
+        quality = 'medium'
+    return render_template('live.html', streams=camera_streams, quality=quality,
+                           qualities=STREAM_QUALITIES)
 
 @app.route('/api/check_in', methods=['POST'])
 def api_check_in():
     """API endpoint for check-in"""
-    data = request.get_json()
-    if data is None:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'})
-    
-    name = data.get('name', '').strip()
-    
-    if not name:
-        return jsonify({'success': False, 'message': 'Name is required'})
-    
-    db = get_db()
-    if db.check_in(name):
-        return jsonify({'success': True, 'message': f'{name} checked in successfully!'})
-    else:
-        return jsonify({'success': False, 'message': f'{name} already checked in today'})
+    return jsonify(record_attendance('check_in', request.get_json()))
 
 @app.route('/api/check_out', methods=['POST'])
 def api_check_out():
     """API endpoint for check-out"""
-    data = request.get_json()
-    if data is None:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'})
-    
-    name = data.get('name', '').strip()
-    
-    if not name:
-        return jsonify({'success': False, 'message': 'Name is required'})
-    
-    db = get_db()
-    if db.check_out(name):
-        return jsonify({'success': True, 'message': f'{name} checked out successfully!'})
-    else:
-        return jsonify({'success': False, 'message': f'No check-in record found for {name} today'})
+    return jsonify(record_attendance('check_out', request.get_json()))
+
+def record_batch(action, data):
+    """Result and status code of a batch of check-ins or check-outs (see attendance_web_common)"""
+    return common.record_batch(get_db(), action, data)
+
+@app.route('/api/check_in/batch', methods=['POST'])
+def api_check_in_batch():
+    """API endpoint for many timestamped check-ins in one transaction"""
+    result, status = record_batch('check_in', request.get_json(silent=True))
+    return jsonify(result), status
+
+@app.route('/api/check_out/batch', methods=['POST'])
+def api_check_out_batch():
+    """API endpoint for many timestamped check-outs in one transaction"""
+    result, status = record_batch('check_out', request.get_json(silent=True))
+    return jsonify(result), status
+
+def summary_resource():
+    """Response cache key and body builder of /api/summary"""
+    return ('summary', date.today().isoformat()), lambda: app.json.dumps(get_today_summary())
+
+def employees_resource():
+    """Response cache key and body builder of /api/employees"""
+    return ('employees',), lambda: app.json.dumps(get_db().get_employees())
 
 @app.route('/api/summary')
 def api_summary():
     """API endpoint for daily summary"""
-    db = get_db()
-    summary = db.get_daily_summary()
-    return jsonify(summary)
+    return get_response_cache().response(*summary_resource(), 'application/json')
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of live attendance
+
+    Sends check_in and check_out events ({name, date, time, total_hours}),
+    summary (the /api/summary body, on connect and after every change) and
+    resync when events were missed and the client should reload. Browsers
+    reconnect with Last-Event-ID and are sent what they missed. Viewers are
+    fed from memory, so they add no database queries.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = get_attendance_feed().broker.subscribe(last_event_id)
+    if subscription is None:
+        return jsonify({'success': False, 'message': 'Too many live viewers'}), 503
+    return Response(
+        subscription.stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/attendance')
 def api_attendance():
-    """API endpoint for attendance data"""
-    db = get_db()
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    employee = request.args.get('employee', '')
+    """API endpoint for attendance data, served from the reporting snapshot
+
+    Pages with ?limit= and ?cursor=, or streams JSON or NDJSON; see
+    attendance_web_common.attendance_listing.
+    """
+    return common.attendance_listing(get_report_db(), snapshot_headers())
+
+@app.route('/api/analytics/<kind>')
+def api_analytics(kind):
+    """API endpoint for attendance analytics
+
+    kind is one of monthly-hours, arrivals, lateness or attendance-rate.
+    Takes the same start_date, end_date and employee filters as
+    /api/attendance and is served from the reporting snapshot.
+    """
+    if kind not in ANALYTICS:
+        return jsonify({'success': False, 'message': f'Unknown analytics: {kind}'}), 404
     
-    records = db.get_attendance_report(
-        start_date if start_date else None,
-        end_date if end_date else None,
-        employee if employee else None
-    )
+    try:
+        check_report_dates(*get_report_filters())
+        options = get_analytics_options(kind)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return jsonify(records)
+    result = run_analytics(get_report_db(), kind, *get_report_filters(), **options)
+    if result is None:
+        return jsonify({'success': False, 'message': f'Error computing {kind} analytics'}), 500
+    return jsonify(result), 200, snapshot_headers()
 
 @app.route('/api/employees')
 def api_employees():
     """API endpoint for employees list"""
-    db = get_db()
-    employees = db.get_employees()
-    return jsonify(employees)
+    return get_response_cache().response(*employees_resource(), 'application/json')
 
 @app.route('/status')
 def status():
     """System status page"""
     db = get_db()
-    summary = db.get_daily_summary()
+    summary = get_today_summary()
     
     status_info = {
         'database_connected': db is not None,
@@ -197,13 +395,20 @@ def status():
         'total_employees': summary.get('total_employees', 0),
         'present_today': summary.get('present_employees', 0),
         'attendance_rate': summary.get('attendance_rate', 0),
+        'reporting_snapshot_age_seconds': get_snapshot().age(),
+        'response_cache': get_response_cache().get_stats(),
+        'live_feed': attendance_feed.get_stats() if attendance_feed else None,
         'system_status': 'Online'
     }
     
     return jsonify(status_info)
 
-def create_templates():
-    """Create basic HTML templates"""
+def create_templates(overwrite: bool = True, directory: str = 'templates'):
+    """Create basic HTML templates
+
+    With overwrite=False only missing files are written, so templates
+    edited on the server survive a restart.
+    """
     
     # Base template
     base_template = '''<!DOCTYPE html>
@@ -232,6 +437,7 @@ def create_templates():
                 <a class="nav-link" href="/check_out">Check Out</a>
                 <a class="nav-link" href="/employees">Employees</a>
                 <a class="nav-link" href="/reports">Reports</a>
+                <a class="nav-link" href="/live">Live</a>
                 <a class="nav-link" href="/status">Status</a>
             </div>
         </div>
@@ -339,12 +545,12 @@ def create_templates():
                 <h5 class="card-title mb-0">Daily Summary</h5>
             </div>
             <div class="card-body">
-                <p><strong>Date:</strong> {{ summary.date }}</p>
-                <p><strong>Total Employees:</strong> {{ summary.total_employees }}</p>
-                <p><strong>Present:</strong> {{ summary.present_employees }}</p>
-                <p><strong>Absent:</strong> {{ summary.absent_employees }}</p>
-                <p><strong>Attendance Rate:</strong> {{ "%.1f"|format(summary.attendance_rate) }}%</p>
-                <p><strong>Average Hours:</strong> {{ summary.average_hours }}</p>
+                <p><strong>Date:</strong> <span id="summary-date">{{ summary.date }}</span></p>
+                <p><strong>Total Employees:</strong> <span id="summary-total">{{ summary.total_employees }}</span></p>
+                <p><strong>Present:</strong> <span id="summary-present">{{ summary.present_employees }}</span></p>
+                <p><strong>Absent:</strong> <span id="summary-absent">{{ summary.absent_employees }}</span></p>
+                <p><strong>Attendance Rate:</strong> <span id="summary-rate">{{ "%.1f"|format(summary.attendance_rate) }}</span>%</p>
+                <p><strong>Average Hours:</strong> <span id="summary-hours">{{ summary.average_hours }}</span></p>
             </div>
         </div>
     </div>
@@ -354,7 +560,7 @@ def create_templates():
             <div class="card-header">
                 <h5 class="card-title mb-0">Recent Activity</h5>
             </div>
-            <div class="card-body">
+            <div class="card-body" id="recent-activity">
                 {% if recent_records %}
                     {% for record in recent_records %}
                         <div class="mb-2">
@@ -364,12 +570,50 @@ def create_templates():
                         </div>
                     {% endfor %}
                 {% else %}
-                    <p>No recent activity</p>
+                    <p id="no-activity">No recent activity</p>
                 {% endif %}
             </div>
         </div>
     </div>
 </div>
+{% endblock %}
+
+{% block scripts %}
+<script>
+// Live updates pushed by the server instead of reloading the page
+const feed = new EventSource("{{ url_for('api_events') }}");
+
+feed.addEventListener('summary', (e) => {
+    const summary = JSON.parse(e.data);
+    document.getElementById('summary-date').textContent = summary.date;
+    document.getElementById('summary-total').textContent = summary.total_employees;
+    document.getElementById('summary-present').textContent = summary.present_employees;
+    document.getElementById('summary-absent').textContent = summary.absent_employees;
+    document.getElementById('summary-rate').textContent = summary.attendance_rate.toFixed(1);
+    document.getElementById('summary-hours').textContent = summary.average_hours;
+});
+
+function addActivity(label, record) {
+    const item = document.createElement('div');
+    item.className = 'mb-2';
+    const name = document.createElement('strong');
+    name.textContent = record.name;
+    const detail = document.createElement('small');
+    detail.textContent = label + ': ' + record.time;
+    item.append(name, ' - ' + record.date, document.createElement('br'), detail);
+
+    const list = document.getElementById('recent-activity');
+    document.getElementById('no-activity')?.remove();
+    list.prepend(item);
+    while (list.children.length > 10) {
+        list.lastElementChild.remove();
+    }
+}
+
+feed.addEventListener('check_in', (e) => addActivity('Check-in', JSON.parse(e.data)));
+feed.addEventListener('check_out', (e) => addActivity('Check-out', JSON.parse(e.data)));
+feed.addEventListener('resync', () => location.reload());
+</script>
 {% endblock %}'''
 
     # Check-in template
@@ -552,11 +796,12 @@ def create_templates():
 </div>
 
 <div class="card">
-    <div class="card-header">
-        <h5 class="card-title mb-0">Attendance Records ({{ records|length }} records)</h5>
+    <div class="card-header d-flex justify-content-between align-items-center">
+        <h5 class="card-title mb-0">Attendance Records ({{ record_count }} records)</h5>
+        <a href="/reports/export.csv?{{ request.query_string.decode() }}" class="btn btn-sm btn-outline-secondary">Export CSV</a>
     </div>
     <div class="card-body">
-        {% if records %}
+        {% if record_count %}
             <div class="table-responsive">
                 <table class="table table-striped">
                     <thead>
@@ -588,6 +833,45 @@ def create_templates():
         {% endif %}
     </div>
 </div>
+{% endblock %}'''
+
+    # Live camera template
+    live_template = '''{% extends "base.html" %}
+{% block title %}Live Cameras - Attendance Database{% endblock %}
+
+{% block content %}
+<div class="d-flex justify-content-between align-items-center mb-4">
+    <h1>Live Cameras</h1>
+    <div class="btn-group">
+        {% for option in qualities %}
+        <a href="?quality={{ option }}" class="btn btn-sm {{ 'btn-primary' if option == quality else 'btn-outline-primary' }}">{{ option|capitalize }}</a>
+        {% endfor %}
+    </div>
+</div>
+
+{% if streams %}
+<div class="row">
+    {% for url in streams %}
+    <div class="col-lg-6">
+        <div class="card">
+            <div class="card-header d-flex justify-content-between">
+                <h5 class="card-title mb-0">{{ url }}</h5>
+                <a href="{{ url }}/stats" class="small">Stats</a>
+            </div>
+            <div class="card-body p-0 bg-dark">
+                <img src="{{ url }}/stream.mjpg?quality={{ quality }}" class="img-fluid w-100" alt="Camera {{ loop.index }}">
+            </div>
+        </div>
+    </div>
+    {% endfor %}
+</div>
+<p class="text-muted small">Quality and frame rate drop automatically on slow connections.</p>
+{% else %}
+<div class="alert alert-info">
+    No camera streams configured. Set ATTENDANCE_CAMERA_STREAMS to the kiosks' stream addresses,
+    e.g. <code>http://kiosk-1:8090,http://kiosk-2:8090</code>.
+</div>
+{% endif %}
 {% endblock %}'''
 
     # Write templates to files
@@ -599,11 +883,15 @@ def create_templates():
         'check_out.html': check_out_template,
         'employees.html': employees_template,
         'add_employee.html': add_employee_template,
-        'reports.html': reports_template
+        'reports.html': reports_template,
+        'live.html': live_template
     }
     
     for filename, content in templates.items():
-        with open(f'templates/{filename}', 'w') as f:
+        path = os.path.join(directory, filename)
+        if not overwrite and os.path.exists(path):
+            continue
+        with open(path, 'w') as f:
             f.write(content)
 
 if __name__ == '__main__':
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Attendance Database Benchmarks
+Compares the database engines against the previous row-at-a-time code paths
+
+Usage:
+    python benchmark_attendance.py import --files 20 --rows 50000 --workers 4
+    python benchmark_attendance.py range --days 730 --per-day 500
+    python benchmark_attendance.py checkin --events 2000
+    python benchmark_attendance.py merge --kiosks 24 --days 365
+    python benchmark_attendance.py analytics --rows 10000000
+    python benchmark_attendance.py register --sightings 20000
+"""
+
+import io
+import os
+import csv
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+from collections import defaultdict
+from datetime import datetime, timedelta
+from attendance_database import AttendanceDatabase, REGISTER_TIME_FORMAT
+from attendance_merge import AttendanceMerger
+from register_log import RegisterLog
+from attendance_analytics import ANALYTICS, AttendanceColumns, load_columns, monthly_hours
+
+NAMES = [f"EMPLOYEE {i:04d}" for i in range(500)]
+
+def timed(label, func, *args, **kwargs):
+    """Run func once and print its wall time"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+def quietly(func, *args, **kwargs):
+    """Call func with its progress output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def write_register_logs(directory, files, rows_per_file, seed=42):
+    """Write synthetic YYYYMMDD_register_log.csv files, one day per file"""
+    rng = random.Random(seed)
+    day = datetime(2024, 1, 1)
+    paths = []
+    for _ in range(files):
+        path = os.path.join(directory, f"{day.strftime('%Y%m%d')}_register_log.csv")
+        with open(path, 'w') as f:
+            f.write('Name, Datetime')
+            seconds = sorted(rng.randrange(7 * 3600, 19 * 3600) for _ in range(rows_per_file))
+            for second in seconds:
+                stamp = (day + timedelta(seconds=second)).strftime(REGISTER_TIME_FORMAT)
+                f.write(f'\n{rng.choice(NAMES)},{stamp}')
+        paths.append(path)
+        day += timedelta(days=1)
+    return paths
+
+def legacy_import_from_csv(db, csv_file):
+    """The previous import: one SELECT and possibly one INSERT per CSV row"""
+    with open(csv_file, 'r') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            name = row[0].strip()
+            datetime_str = ','.join(row[1:]).strip()
+            if name and datetime_str and name != 'Unknown':
+                dt = datetime.strptime(datetime_str, REGISTER_TIME_FORMAT)
+                date_str = dt.strftime("%Y-%m-%d")
+                time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
+                db.cursor.execute('SELECT id FROM attendance WHERE name = ? AND date = ?',
+                                  (name, date_str))
+                if not db.cursor.fetchone():
+                    db.cursor.execute('INSERT INTO attendance (name, date, check_in_time) VALUES (?, ?, ?)',
+                                      (name, date_str, time_str))
+    db.conn.commit()
+
+def bench_import(args):
+    """Row-at-a-time import vs bulk import of register logs"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"Writing {args.files} logs x {args.rows} rows...")
+        paths = write_register_logs(temp_dir, args.files, args.rows)
+        total_rows = args.files * args.rows
+
+        legacy_db = AttendanceDatabase(os.path.join(temp_dir, "legacy.db"))
+        _, legacy_time = timed("legacy row-by-row import", lambda: [legacy_import_from_csv(legacy_db, p) for p in paths])
+
+        bulk_db = AttendanceDatabase(os.path.join(temp_dir, "bulk.db"))
+        _, bulk_time = timed("bulk import (1 worker)", bulk_db.import_csv_files, paths)
+
+        parallel_db = AttendanceDatabase(os.path.join(temp_dir, "parallel.db"))
+        _, parallel_time = timed(f"bulk import ({args.workers} workers)",
+                                 parallel_db.import_csv_files, paths, workers=args.workers)
+
+        counts = [len(db.get_attendance_report()) for db in (legacy_db, bulk_db, parallel_db)]
+        assert counts[0] == counts[1] == counts[2], counts
+
+        print(f"\n{total_rows} rows -> {counts[0]} check-ins")
+        print(f"legacy:   {total_rows / legacy_time:12,.0f} rows/s")
+        print(f"bulk:     {total_rows / bulk_time:12,.0f} rows/s ({legacy_time / bulk_time:.1f}x)")
+        print(f"parallel: {total_rows / parallel_time:12,.0f} rows/s ({legacy_time / parallel_time:.1f}x)")
+
+        for db in (legacy_db, bulk_db, parallel_db):
+            db.close()
+
+def build_attendance_db(path, days, per_day, seed=42):
+    """Fill a database with per_day check-ins/check-outs for each of days days"""
+    rng = random.Random(seed)
+    db = AttendanceDatabase(path)
+    day = datetime(2024, 1, 1)
+    rows = []
+    for _ in range(days):
+        for name in rng.sample(NAMES, min(per_day, len(NAMES))):
+            check_in = day + timedelta(seconds=rng.randrange(7 * 3600, 10 * 3600))
+            check_out = check_in + timedelta(seconds=rng.randrange(6 * 3600, 10 * 3600))
+            rows.append((name, day.strftime("%Y-%m-%d"), check_in.strftime("%Y-%m-%d %H:%M:%S"),
+                         check_out.strftime("%Y-%m-%d %H:%M:%S"),
+                         (check_out - check_in).total_seconds() / 3600))
+        day += timedelta(days=1)
+    with db.transaction() as cursor:
+        cursor.executemany('''
+            INSERT INTO attendance (name, date, check_in_time, check_out_time, total_hours)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+    db.conn.execute('ANALYZE')
+    return db, len(rows)
+
+def legacy_report(db, start_date, end_date, employee_name=None):
+    """The previous report query: TEXT date comparisons, only (name, date) indexed"""
+    query = '''
+        SELECT name, date, check_in_time, check_out_time, total_hours, status
+        FROM attendance NOT INDEXED
+        WHERE date >= ? AND date <= ?
+    '''
+    params = [start_date, end_date]
+    if employee_name:
+        query = query.replace('NOT INDEXED', 'INDEXED BY idx_attendance_name_date_unique') + " AND name = ?"
+        params.append(employee_name)
+    db.cursor.execute(query + " ORDER BY date DESC, name", params)
+    return db.cursor.fetchall()
+
+def query_plan(db, query, params):
+    """EXPLAIN QUERY PLAN as one line"""
+    db.cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+    return '; '.join(row[-1] for row in db.cursor.fetchall())
+
+def bench_range(args):
+    """Range reports on TEXT dates vs the indexed integer day_number"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"Building {args.days} days x {args.per_day} employees...")
+        db, total_rows = build_attendance_db(os.path.join(temp_dir, "range.db"), args.days, args.per_day)
+        print(f"{total_rows} attendance rows\n")
+
+        last_day = datetime(2024, 1, 1) + timedelta(days=args.days - 1)
+        start_date = (last_day - timedelta(days=args.window - 1)).strftime("%Y-%m-%d")
+        end_date = last_day.strftime("%Y-%m-%d")
+        employee = NAMES[0]
+
+        where, params = db._report_filters(start_date, end_date)
+        print("legacy plan: ", query_plan(db, "SELECT * FROM attendance NOT INDEXED WHERE date >= ? AND date <= ? "
+                                              "ORDER BY date DESC, name", [start_date, end_date]))
+        print("indexed plan:", query_plan(db, f"SELECT * FROM attendance {where} ORDER BY day_number DESC, name", params))
+        print()
+
+        for label, employee_name in ((f"{args.window}-day range", None), (f"{args.window}-day range, one employee", employee)):
+            legacy_rows, legacy_time = timed(f"legacy {label}", lambda: [legacy_report(db, start_date, end_date, employee_name)
+                                                                        for _ in range(args.repeat)])
+            indexed_rows, indexed_time = timed(f"indexed {label}", lambda: [db.get_attendance_report(start_date, end_date, employee_name)
+                                                                           for _ in range(args.repeat)])
+            assert len(legacy_rows[0]) == len(indexed_rows[0]), (len(legacy_rows[0]), len(indexed_rows[0]))
+            print(f"{len(indexed_rows[0])} rows per query, {legacy_time / indexed_time:.1f}x faster\n")
+
+        db.close()
+
+def legacy_check_in(db, name, check_in_time):
+    """The previous check-in: SELECT for an existing row, then INSERT"""
+    with db.transaction() as cursor:
+        cursor.execute('''
+            SELECT id FROM attendance
+            WHERE name = ? AND date = ? AND check_in_time IS NOT NULL
+        ''', (name, check_in_time[:10]))
+        if cursor.fetchone():
+            return False
+        cursor.execute('INSERT INTO attendance (name, date, check_in_time) VALUES (?, ?, ?)',
+                       (name, check_in_time[:10], check_in_time))
+    return True
+
+def legacy_check_out(db, name, check_out_time):
+    """The previous check-out: SELECT, strptime math in Python, then UPDATE"""
+    with db.transaction() as cursor:
+        cursor.execute('''
+            SELECT id, check_in_time FROM attendance
+            WHERE name = ? AND date = ? AND check_in_time IS NOT NULL
+        ''', (name, check_out_time[:10]))
+        record = cursor.fetchone()
+        if not record:
+            return False
+        attendance_id, check_in_time = record
+        check_in_dt = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
+        check_out_dt = datetime.strptime(check_out_time, "%Y-%m-%d %H:%M:%S")
+        total_hours = (check_out_dt - check_in_dt).total_seconds() / 3600
+        cursor.execute('UPDATE attendance SET check_out_time = ?, total_hours = ? WHERE id = ?',
+                       (check_out_time, total_hours, attendance_id))
+    return True
+
+def latencies(func, events):
+    """Per-event latencies in milliseconds, sorted"""
+    samples = []
+    for event in events:
+        start = time.perf_counter()
+        func(*event)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+def print_latencies(label, samples):
+    """Print mean/p50/p99 of sorted millisecond samples"""
+    mean = sum(samples) / len(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<40} mean {mean:7.3f} ms  p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+    return mean
+
+def bench_checkin(args):
+    """Per-event check-in/check-out latency: SELECT-then-write vs one upsert statement"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db, _ = build_attendance_db(os.path.join(temp_dir, "checkin.db"), args.history_days, 200)
+        names = [f"VISITOR {i:05d}" for i in range(args.events)]
+        day = datetime(2024, 1, 1) + timedelta(days=args.history_days)
+        # Every name checks in twice: the second attempt must be rejected
+        check_ins = [(name, (day + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")) for name in names] * 2
+        check_outs = [(name, (day + timedelta(hours=17)).strftime("%Y-%m-%d %H:%M:%S")) for name in names]
+        legacy_day = day + timedelta(days=1)
+        legacy_check_ins = [(name, (legacy_day + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")) for name in names] * 2
+        legacy_check_outs = [(name, (legacy_day + timedelta(hours=17)).strftime("%Y-%m-%d %H:%M:%S")) for name in names]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy_in = latencies(lambda n, t: legacy_check_in(db, n, t), legacy_check_ins)
+            legacy_out = latencies(lambda n, t: legacy_check_out(db, n, t), legacy_check_outs)
+            upsert_in = latencies(lambda n, t: db.check_in_batch([(n, t)]), check_ins)
+            upsert_out = latencies(lambda n, t: db.check_out_batch([(n, t)]), check_outs)
+
+        print(f"{args.events} people, each checking in twice and out once\n")
+        legacy_mean = print_latencies("legacy check-in", legacy_in)
+        upsert_mean = print_latencies("upsert check-in", upsert_in)
+        print(f"{'':<40} {legacy_mean / upsert_mean:.1f}x")
+        legacy_mean = print_latencies("legacy check-out", legacy_out)
+        upsert_mean = print_latencies("single-statement check-out", upsert_out)
+        print(f"{'':<40} {legacy_mean / upsert_mean:.1f}x")
+
+        _, batch_time = timed(f"check_in_batch of {args.events}",
+                              db.check_in_batch, [(n, t.replace(day.strftime('%Y-%m-%d'), '2030-01-01'))
+                                                  for n, t in check_ins[:args.events]])
+        print(f"{batch_time / args.events * 1000:.3f} ms per event in one transaction")
+        db.close()
+
+def bench_merge(args):
+    """Nightly consolidation of kiosk databases: first full merge, then incremental"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        kiosk_dir = os.path.join(temp_dir, "kiosks")
+        os.makedirs(kiosk_dir)
+        print(f"Building {args.kiosks} kiosk databases x {args.days} days...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            kiosks = [build_attendance_db(os.path.join(kiosk_dir, f"kiosk{i:02d}.db"), args.days, args.per_day, seed=i)
+                      for i in range(args.kiosks)]
+        print(f"{sum(rows for _, rows in kiosks)} kiosk rows\n")
+
+        target = AttendanceDatabase(os.path.join(temp_dir, "main.db"))
+        merger = AttendanceMerger(target)
+        timed("first merge (everything)", quietly, merger.merge, [kiosk_dir])
+        print(f"{target.count_attendance()} consolidated rows")
+
+        # One more day at every kiosk, then the nightly run
+        next_day = datetime(2024, 1, 1) + timedelta(days=args.days)
+        for i, (kiosk, _) in enumerate(kiosks):
+            rng = random.Random(1000 + i)
+            events = [(name, (next_day + timedelta(seconds=rng.randrange(7 * 3600, 10 * 3600))).strftime("%Y-%m-%d %H:%M:%S"))
+                      for name in rng.sample(NAMES, args.per_day)]
+            quietly(kiosk.check_in_batch, events)
+        _, incremental_time = timed("nightly merge (one new day)", quietly, merger.merge, [kiosk_dir])
+        _, rescan_time = timed("same day with --full", quietly, merger.merge, [kiosk_dir], full=True)
+        print(f"\nincremental is {rescan_time / incremental_time:.0f}x faster than re-merging everything")
+
+        for kiosk, _ in kiosks:
+            kiosk.close()
+        target.close()
+
+def legacy_monthly_hours(db):
+    """Monthly hours the way a report loop would: one dict per row, summed in Python"""
+    totals = defaultdict(lambda: [0.0, 0])
+    for record in db.iter_attendance_report():
+        entry = totals[(record['name'], record['date'][:7])]
+        entry[0] += record['total_hours'] or 0
+        entry[1] += 1
+    return totals
+
+def synthetic_columns(rows, employees, seed=42):
+    """Attendance columns for rows check-ins spread over employees people"""
+    rng = np.random.default_rng(seed)
+    days_span = max(1, rows // employees)
+    first_day = (datetime(2024, 1, 1) - datetime(1970, 1, 1)).days
+    days = first_day + rng.integers(0, days_span, rows)
+    check_in_ts = days * 86400 + rng.integers(7 * 3600, 10 * 3600, rows)
+    hours = rng.uniform(6, 10, rows)
+    hours[rng.random(rows) < 0.05] = np.nan
+    return AttendanceColumns(NAMES[:employees] + [f"EMPLOYEE {i:04d}" for i in range(len(NAMES), employees)],
+                             rng.integers(0, employees, rows), days, check_in_ts.astype(np.float64), hours)
+
+def bench_analytics(args):
+    """Analytics: per-row Python loops vs column arrays, then the vectorized kernels at scale"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"Building {args.days} days x {args.per_day} employees...")
+        db, total_rows = build_attendance_db(os.path.join(temp_dir, "analytics.db"), args.days, args.per_day)
+        print(f"{total_rows} attendance rows\n")
+
+        legacy, legacy_time = timed("legacy monthly hours (dict loop)", legacy_monthly_hours, db)
+        columns, load_time = timed("load columns", load_columns, db)
+        result, kernel_time = timed("vectorized monthly hours", monthly_hours, columns)
+        assert len(result) == len(legacy), (len(result), len(legacy))
+        print(f"{len(result)} employee-months, {legacy_time / (load_time + kernel_time):.1f}x faster including the load\n")
+        db.close()
+
+    print(f"Generating {args.rows} synthetic rows for {args.employees} employees...")
+    columns = synthetic_columns(args.rows, args.employees)
+    for kind, func in ANALYTICS.items():
+        timed(f"{kind} over {args.rows} rows", func, columns)
+
+def legacy_register_info(directory, name, now):
+    """The previous register_info: reopen today's log and read all of it for every sighting"""
+    file_name = os.path.join(directory, f'{now.strftime("%Y%m%d")}_register_log.csv')
+    try:
+        with open(file_name, 'x') as f:
+            f.writelines('Name, Datetime')
+    except FileExistsError:
+        pass
+
+    with open(file_name, 'r+') as f:
+        name_list = [line.split(',')[0] for line in f.readlines()]
+        if (name not in name_list) or (name in name_list):
+            f.writelines(f'\n{name},{now.strftime("%Y/%d/%m, %H:%M:%S")}')
+
+def bench_register(args):
+    """Per-sighting register log cost: reread the file vs an open buffered append handle"""
+    rng = random.Random(42)
+    start = datetime(2025, 7, 4, 8, 0, 0)
+    # One sighting per recognized face per frame at 10 frames per second
+    sightings = [(rng.choice(NAMES[:args.people]), start + timedelta(seconds=i / 10)) for i in range(args.sightings)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy_dir = os.path.join(temp_dir, "legacy")
+        os.makedirs(legacy_dir)
+        checkpoints = {args.sightings // 10, args.sightings - 1}
+        legacy_start = time.perf_counter()
+        for i, (name, now) in enumerate(sightings):
+            legacy_register_info(legacy_dir, name, now)
+            if i in checkpoints:
+                began = time.perf_counter()
+                legacy_register_info(legacy_dir, name, now)
+                print(f"legacy sighting #{i + 1:<8} {(time.perf_counter() - began) * 1e6:10.1f} us")
+        legacy_time = time.perf_counter() - legacy_start
+        print(f"{'legacy register_info':<40} {legacy_time:8.3f}s")
+
+        for cooldown in (0.0, 60.0):
+            log = RegisterLog(os.path.join(temp_dir, f"log{cooldown:g}"), cooldown=cooldown)
+            os.makedirs(log.directory)
+            _, log_time = timed(f"RegisterLog (cooldown {cooldown:g}s)",
+                                lambda: [log.log(name, now) for name, now in sightings])
+            log.close()
+            print(f"{log.stats['logged']} lines written, {legacy_time / log_time:.0f}x faster\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Attendance database benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    import_parser = subparsers.add_parser('import', help='CSV import: row-by-row vs bulk')
+    import_parser.add_argument('--files', type=int, default=20, help='Number of daily log files')
+    import_parser.add_argument('--rows', type=int, default=20000, help='Rows per log file')
+    import_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parser processes')
+    import_parser.set_defaults(func=bench_import)
+
+    range_parser = subparsers.add_parser('range', help='Range reports: TEXT dates vs indexed day numbers')
+    range_parser.add_argument('--days', type=int, default=730, help='Days of attendance history')
+    range_parser.add_argument('--per-day', type=int, default=500, help='Check-ins per day')
+    range_parser.add_argument('--window', type=int, default=7, help='Report range in days')
+    range_parser.add_argument('--repeat', type=int, default=20, help='Queries per measurement')
+    range_parser.set_defaults(func=bench_range)
+
+    checkin_parser = subparsers.add_parser('checkin', help='Check-in/check-out latency: SELECT-then-write vs upsert')
+    checkin_parser.add_argument('--events', type=int, default=2000, help='People checking in and out')
+    checkin_parser.add_argument('--history-days', type=int, default=365, help='Days of existing attendance')
+    checkin_parser.set_defaults(func=bench_checkin)
+
+    merge_parser = subparsers.add_parser('merge', help='Kiosk database merge: full vs incremental')
+    merge_parser.add_argument('--kiosks', type=int, default=24, help='Number of kiosk databases')
+    merge_parser.add_argument('--days', type=int, default=365, help='Days of history per kiosk')
+    merge_parser.add_argument('--per-day', type=int, default=100, help='Check-ins per kiosk per day')
+    merge_parser.set_defaults(func=bench_merge)
+
+    analytics_parser = subparsers.add_parser('analytics', help='Analytics: Python loops vs vectorized NumPy')
+    analytics_parser.add_argument('--days', type=int, default=730, help='Days of attendance history in the database')
+    analytics_parser.add_argument('--per-day', type=int, default=500, help='Check-ins per day in the database')
+    analytics_parser.add_argument('--rows', type=int, default=1000000, help='Synthetic rows for the vectorized kernels')
+    analytics_parser.add_argument('--employees', type=int, default=5000, help='Employees in the synthetic rows')
+    analytics_parser.set_defaults(func=bench_analytics)
+
+    register_parser = subparsers.add_parser('register', help='Register log: reread per sighting vs buffered append')
+    register_parser.add_argument('--sightings', type=int, default=20000, help='Recognized faces to log')
+    register_parser.add_argument('--people', type=int, default=50, help='Distinct people seen')
+    register_parser.set_defaults(func=bench_register)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Recognition Server Benchmark
+Frames per second and p50/p99 request latency of recognition_server.py
+for several worker and micro-batch settings, driven by a local load generator
+
+Frames are dataset faces pasted onto 640x480 backgrounds and JPEG-encoded,
+and the model is trained from the same dataset, so every frame goes
+through decoding, detection, the quality gate and LBPH.
+
+Usage:
+    python benchmark_recognition.py
+    python benchmark_recognition.py --configs 1x1,4x1,4x8 --levels 1,8,32 --frames-per-request 4
+    python benchmark_recognition.py --url http://127.0.0.1:5001
+"""
+
+import os
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+import urllib.parse
+import cv2
+import numpy as np
+from werkzeug.serving import make_server
+from benchmark_web import KeepAliveHandler
+from benchmark_serve import percentile
+import recognition_server
+
+def train_model(path, dataset_dir=recognition_server.DATASET_DIR, samples=100):
+    """Train an LBPH model on up to samples dataset images; returns them as grey crops"""
+    faces, ids = [], []
+    for filename in sorted(os.listdir(dataset_dir)):
+        if filename.startswith('User.') and filename.endswith('.jpg') and len(faces) < samples:
+            faces.append(cv2.imread(os.path.join(dataset_dir, filename), cv2.IMREAD_GRAYSCALE))
+            ids.append(int(filename.split('.')[1]))
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(faces, np.array(ids))
+    recognizer.write(path)
+    return faces
+
+def build_frames(faces, count=32, seed=42):
+    """JPEG frames with one face each at a random place on a noisy background"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        face = cv2.cvtColor(faces[i % len(faces)], cv2.COLOR_GRAY2BGR)
+        canvas = rng.integers(90, 160, size=(480, 640, 3), dtype=np.uint8)
+        y = int(rng.integers(0, 480 - face.shape[0]))
+        x = int(rng.integers(0, 640 - face.shape[1]))
+        canvas[y:y + face.shape[0], x:x + face.shape[1]] = face
+        frames.append(cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return frames
+
+def encode_request(frames):
+    """(body, content type) posting frames: a JPEG body for one, multipart for several"""
+    if len(frames) == 1:
+        return frames[0], 'image/jpeg'
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, frame in enumerate(frames):
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="frames"; filename="{i}.jpg"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + frame + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def client_loop(host, port, requests, deadline, latencies, counts):
+    """Post requests round-robin until deadline, recording each one's latency"""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    samples = []
+    frames = faces = errors = 0
+    while time.perf_counter() < deadline:
+        for body, content_type, frame_count in requests:
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/api/recognize', body=body, headers={'Content-Type': content_type})
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                continue
+            if response.status != 200:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+            frames += frame_count
+            faces += data.count(b'"box"')
+            if time.perf_counter() >= deadline:
+                break
+    conn.close()
+    latencies.extend(samples)
+    counts.append((frames, faces, errors))
+
+def run_level(host, port, requests, clients, seconds):
+    """Run clients for seconds; returns (frames per second, p50 ms, p99 ms, faces per frame, errors)"""
+    latencies = []
+    counts = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(host, port, requests, deadline, latencies, counts))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    frames = sum(count[0] for count in counts)
+    faces = sum(count[1] for count in counts)
+    latencies.sort()
+    return (frames / elapsed, percentile(latencies, 0.50) * 1000, percentile(latencies, 0.99) * 1000,
+            faces / frames if frames else 0.0, sum(count[2] for count in counts))
+
+def sweep(label, host, port, requests, levels, seconds):
+    """Print one line per concurrency level"""
+    print(label)
+    print(f"  {'clients':>7} {'frames/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'faces':>6} {'errors':>7}")
+    for clients in levels:
+        rate, p50, p99, faces, errors = run_level(host, port, requests, clients, seconds)
+        print(f"  {clients:>7} {rate:>9.1f} {p50:>9.2f} {p99:>9.2f} {faces:>6.2f} {errors:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput and latency of the recognition server')
+    parser.add_argument('--url', help='Load a server that is already running instead')
+    parser.add_argument('--configs', default='1x1,4x1,4x8',
+                        help='Comma-separated WORKERSxMAX_BATCH pool settings to compare')
+    parser.add_argument('--levels', default='1,4,16', help='Comma-separated numbers of concurrent clients')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each level')
+    parser.add_argument('--frames-per-request', type=int, default=1,
+                        help='Frames per request (more than 1 posts multipart batches)')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='Micro-batch fill wait')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    per_request = args.frames_per_request
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "trainer.yml")
+        frames = build_frames(train_model(model_path))
+        requests = [encode_request(frames[i:i + per_request]) + (len(frames[i:i + per_request]),)
+                    for i in range(0, len(frames) - per_request + 1, per_request)]
+        print(f"{len(frames)} frames of 640x480, {per_request} per request\n")
+
+        if args.url:
+            url = urllib.parse.urlsplit(args.url)
+            sweep(args.url, url.hostname, url.port or 80, requests, levels, args.seconds)
+            return
+
+        cv2.setNumThreads(1)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        for config in args.configs.split(','):
+            workers, max_batch = (int(value) for value in config.split('x'))
+            pool = recognition_server.RecognitionPool(model_path=model_path, workers=workers,
+                                                      max_batch=max_batch, max_wait=args.max_wait_ms / 1000)
+            pool.start()
+            recognition_server.pool = pool
+            server = make_server('127.0.0.1', 0, recognition_server.app, threaded=True,
+                                 request_handler=KeepAliveHandler)
+            server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+            server_thread.start()
+            try:
+                sweep(f"{workers} workers, batches of up to {max_batch}", '127.0.0.1', server.server_port,
+                      requests, levels, args.seconds)
+                print(f"  average batch {pool.get_stats()['average_batch']} frames\n")
+            finally:
+                server.shutdown()
+                pool.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Attendance Serving Benchmark
+p50/p99 latency and throughput of serve_attendance.py at increasing concurrency
+
+Each server runs as its own process on a copy of a synthetic database, and
+the clients (threads with keep-alive connections) poll the same pages as a
+room full of dashboards.
+
+Usage:
+    python benchmark_serve.py                          # every server that is installed
+    python benchmark_serve.py --servers dev,gunicorn --workers 4 --threads 8
+    python benchmark_serve.py --servers gunicorn,asgi           # WSGI workers against attendance_asgi.py
+    python benchmark_serve.py --url http://127.0.0.1:5000 --levels 1,8,32,128
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.parse
+import importlib.util
+from benchmark_attendance import quietly
+from benchmark_web import PATHS, build_web_db
+
+SERVE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve_attendance.py')
+ASGI_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attendance_asgi.py')
+SERVER_MODULES = {'dev': 'flask', 'waitress': 'waitress', 'gunicorn': 'gunicorn', 'asgi': 'uvicorn'}
+
+def free_port() -> int:
+    """A port nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(host, port, timeout=30.0):
+    """Wait until the server answers /status"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('GET', '/status')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def start_server(server, db_path, args):
+    """Start serve_attendance.py (or attendance_asgi.py) with server on a free port; returns (process, port)"""
+    port = free_port()
+    if server == 'asgi':
+        command = [sys.executable, ASGI_SCRIPT, '--host', '127.0.0.1', '--port', str(port),
+                   '--db', db_path, '--workers', str(args.workers), '--db-threads', str(args.threads)]
+    else:
+        command = [sys.executable, SERVE_SCRIPT, '--server', server, '--host', '127.0.0.1',
+                   '--port', str(port), '--db', db_path, '--workers', str(args.workers),
+                   '--threads', str(args.threads)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_until_ready('127.0.0.1', port):
+        process.terminate()
+        process.wait()
+        raise RuntimeError(f"{server} did not start")
+    return process, port
+
+def client_loop(host, port, deadline, latencies, errors):
+    """Request PATHS round-robin until deadline, recording each request's latency"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    samples = []
+    failed = 0
+    while time.perf_counter() < deadline:
+        for path in PATHS:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            samples.append(time.perf_counter() - start)
+    conn.close()
+    latencies.extend(samples)
+    errors.append(failed)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_level(host, port, clients, seconds):
+    """Run clients for seconds; returns (requests per second, p50 ms, p99 ms, errors)"""
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(host, port, deadline, latencies, errors))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return (len(latencies) / elapsed, percentile(latencies, 0.50) * 1000,
+            percentile(latencies, 0.99) * 1000, sum(errors))
+
+def sweep(label, host, port, levels, seconds):
+    """Print one line per concurrency level"""
+    print(f"{label}")
+    print(f"  {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for clients in levels:
+        rate, p50, p99, errors = run_level(host, port, clients, seconds)
+        print(f"  {clients:>7} {rate:>9.0f} {p50:>9.2f} {p99:>9.2f} {errors:>7}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency of the attendance web server at increasing concurrency')
+    parser.add_argument('--url', help='Benchmark a server that is already running instead')
+    parser.add_argument('--servers', default='dev,waitress,gunicorn,asgi',
+                        help='Servers to start (asgi is attendance_asgi.py on uvicorn); skipped if not installed')
+    parser.add_argument('--levels', default='1,4,16,64', help='Comma-separated numbers of concurrent clients')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each level')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes (gunicorn)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per worker')
+    parser.add_argument('--days', type=int, default=365, help='Days of attendance history')
+    parser.add_argument('--per-day', type=int, default=300, help='Check-ins per day of history')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    print(f"Clients poll {', '.join(PATHS)}\n")
+
+    if args.url:
+        url = urllib.parse.urlsplit(args.url)
+        sweep(args.url, url.hostname, url.port or 80, levels, args.seconds)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.db")
+        db = build_web_db(template_path, args.days, args.per_day)
+        quietly(db.close)
+
+        for server in args.servers.split(','):
+            if importlib.util.find_spec(SERVER_MODULES[server]) is None:
+                print(f"{server}: not installed, skipped (pip install {SERVER_MODULES[server]})\n")
+                continue
+
+            # Every server starts from the same data
+            db_path = os.path.join(temp_dir, f"{server}.db")
+            shutil.copyfile(template_path, db_path)
+            process, port = start_server(server, db_path, args)
+            try:
+                if server == 'dev':
+                    label = "dev (Flask development server, thread per request)"
+                elif server == 'gunicorn':
+                    label = f"gunicorn ({args.workers} workers x {args.threads} threads)"
+                elif server == 'asgi':
+                    label = f"asgi (uvicorn, {args.workers} workers x {args.threads} database threads)"
+                else:
+                    label = f"waitress ({args.threads} threads)"
+                sweep(label, '127.0.0.1', port, levels, args.seconds)
+            finally:
+                process.terminate()
+                process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Attendance Web Server Load Test
+Sustained requests per second on the polled pages, with and without the response cache,
+and outage replay throughput of the single-event and batch check-in endpoints
+
+Usage:
+    python benchmark_web.py --clients 8 --seconds 5
+    python benchmark_web.py --write-interval 1.0
+    python benchmark_web.py --replay 2000 --batch-size 200
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+from datetime import datetime
+from werkzeug.serving import make_server, WSGIRequestHandler
+from benchmark_attendance import NAMES, build_attendance_db, quietly
+import attendance_web_server as web
+
+PATHS = ['/dashboard', '/api/summary', '/api/employees', '/status']
+
+class KeepAliveHandler(WSGIRequestHandler):
+    """Let clients reuse their connection, as a polling browser does"""
+    protocol_version = "HTTP/1.1"
+
+def build_web_db(path, days, per_day):
+    """Attendance history plus employees and 200 check-ins today, as a live server would have"""
+    print(f"Building {days} days x {per_day} check-ins...")
+    db, rows = quietly(build_attendance_db, path, days, per_day)
+    with db.transaction() as cursor:
+        cursor.executemany('INSERT INTO employees (name) VALUES (?)', [(name,) for name in NAMES])
+    today = datetime.now().strftime("%Y-%m-%d")
+    quietly(db.check_in_batch, [(name, f"{today} 08:{i % 60:02d}:00") for i, name in enumerate(NAMES[:200])])
+    print(f"{rows} attendance rows, {len(NAMES)} employees\n")
+    return db
+
+def client_loop(port, deadline, use_etag, counts):
+    """Request PATHS round-robin until deadline, optionally revalidating with ETags"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    etags = {}
+    done = 0
+    not_modified = 0
+    while time.perf_counter() < deadline:
+        for path in PATHS:
+            headers = {'If-None-Match': etags[path]} if use_etag and path in etags else {}
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 304:
+                not_modified += 1
+            elif response.status != 200:
+                raise RuntimeError(f"{path} returned {response.status}")
+            if response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+            done += 1
+    conn.close()
+    counts.append((done, not_modified))
+
+def writer_loop(db, stop, interval):
+    """Check someone in every interval seconds, invalidating the cache"""
+    i = 0
+    while not stop.wait(interval):
+        quietly(db.check_in, f"WALK IN {i:05d}")
+        i += 1
+
+def post_json(conn, path, body):
+    """POST body as JSON and return the decoded response"""
+    conn.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} returned {response.status}: {data[:200]}")
+    return json.loads(data)
+
+def replay_events(prefix, count):
+    """A morning's check-ins and the evening's check-outs for count people, with idempotency keys"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    check_ins, check_outs = [], []
+    for i in range(count):
+        name = f"{prefix} {i:05d}"
+        check_ins.append({'name': name, 'time': f"{today} 08:{i // 60 % 60:02d}:{i % 60:02d}",
+                          'idempotency_key': f"{name} in"})
+        check_outs.append({'name': name, 'time': f"{today} 17:{i // 60 % 60:02d}:{i % 60:02d}",
+                           'idempotency_key': f"{name} out"})
+    return check_ins, check_outs
+
+def replay_single(port, check_ins, check_outs):
+    """Replay through /api/check_in and /api/check_out, one request and commit per event"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    applied = 0
+    for path, events in (('/api/check_in', check_ins), ('/api/check_out', check_outs)):
+        for event in events:
+            applied += post_json(conn, path, {'name': event['name']})['success']
+    conn.close()
+    return applied
+
+def replay_batches(port, check_ins, check_outs, batch_size):
+    """Replay through the batch endpoints, batch_size events per request and transaction"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    applied = duplicates = 0
+    for path, events in (('/api/check_in/batch', check_ins), ('/api/check_out/batch', check_outs)):
+        for i in range(0, len(events), batch_size):
+            result = post_json(conn, path, {'events': events[i:i + batch_size]})
+            applied += result['applied']
+            duplicates += result['duplicates']
+    conn.close()
+    return applied, duplicates
+
+def run_replay(port, count, batch_size):
+    """Compare outage replay throughput of the single-event and batch endpoints"""
+    print(f"Replaying {count} check-ins and {count} check-outs\n")
+    results = []
+
+    check_ins, check_outs = replay_events("SINGLE", count)
+    start = time.perf_counter()
+    applied = quietly(replay_single, port, check_ins, check_outs)
+    single = time.perf_counter() - start
+    results.append(("single-event endpoints", single, applied, 0))
+
+    check_ins, check_outs = replay_events("BATCH", count)
+    start = time.perf_counter()
+    applied, duplicates = quietly(replay_batches, port, check_ins, check_outs, batch_size)
+    results.append((f"batch endpoints ({batch_size} per request)", time.perf_counter() - start, applied, duplicates))
+
+    # A client retrying after a timeout sends the same keys again
+    start = time.perf_counter()
+    applied, duplicates = quietly(replay_batches, port, check_ins, check_outs, batch_size)
+    results.append(("batch replayed again (all duplicates)", time.perf_counter() - start, applied, duplicates))
+
+    for label, elapsed, applied, duplicates in results:
+        print(f"{label:<40} {2 * count / elapsed:8.0f} events/s  "
+              f"({elapsed:.2f}s, {applied} applied, {duplicates} duplicates)")
+    print(f"\nbatch is {single / results[1][1]:.1f}x the single-event rate")
+
+def run_load(label, port, clients, seconds, use_etag=False):
+    """Run clients for seconds and print the sustained request rate"""
+    counts = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop, args=(port, deadline, use_etag, counts))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    requests = sum(done for done, _ in counts)
+    not_modified = sum(n for _, n in counts)
+    print(f"{label:<40} {requests / elapsed:8.0f} req/s  ({requests} requests, {not_modified} x 304)")
+    return requests / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the attendance web server')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent polling clients')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+    parser.add_argument('--days', type=int, default=365, help='Days of attendance history')
+    parser.add_argument('--per-day', type=int, default=300, help='Check-ins per day of history')
+    parser.add_argument('--write-interval', type=float, default=0.0,
+                        help='Also check someone in every N seconds during the cached runs')
+    parser.add_argument('--replay', type=int, default=0, metavar='PEOPLE',
+                        help='Instead, replay check-ins and check-outs for this many people')
+    parser.add_argument('--batch-size', type=int, default=200, help='Events per batch request with --replay')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = build_web_db(os.path.join(temp_dir, "attendance.db"), args.days, args.per_day)
+
+        web.db = db
+        cache = web.get_response_cache()
+        quietly(web.get_snapshot)
+
+        server = make_server('127.0.0.1', 0, web.app, threaded=True, request_handler=KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+
+        try:
+            if args.replay:
+                run_replay(port, args.replay, args.batch_size)
+                return
+
+            print(f"{args.clients} clients polling {', '.join(PATHS)}\n")
+            cache.enabled = False
+            uncached = run_load("uncached", port, args.clients, args.seconds)
+
+            cache.enabled = True
+            stop = threading.Event()
+            if args.write_interval:
+                threading.Thread(target=writer_loop, args=(db, stop, args.write_interval), daemon=True).start()
+            cached = run_load("cached", port, args.clients, args.seconds)
+            revalidated = run_load("cached + If-None-Match", port, args.clients, args.seconds, use_etag=True)
+            stop.set()
+
+            print(f"\ncached is {cached / uncached:.1f}x, revalidation {revalidated / uncached:.1f}x the uncached rate")
+            print(f"cache: {cache.get_stats()}")
+        finally:
+            server.shutdown()
+            web.get_snapshot().stop()
+            quietly(db.close)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+'''
+Bulk Enrollment
+Enroll employees from a folder tree or zip of labelled photos
+(e.g. face_database/Elon Musk.jpg or photos/Elon Musk/1.jpg)
+'''
+
+import os
+import re
+import json
+import time
+import zipfile
+import argparse
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from attendance_database import AttendanceDatabase
+from face_quality import FaceQualityGate
+
+# Fix locale issues
+os.environ['LC_ALL'] = 'C'
+os.environ['LANG'] = 'C'
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+FACE_SIZE = 200             # Normalized crop size written to the dataset
+MAX_DETECT_SIDE = 800       # HR photos are downscaled for detection only
+STATE_FILENAME = 'enrollment_state.json'
+PROGRESS_FILENAME = 'enrollment_progress.jsonl'
+
+# Per-process detector state, created by init_worker()
+_worker = {}
+
+def label_from_path(relative_path: str) -> str:
+    """Derive the person name from a photo path
+
+    Photos inside a sub-folder are labelled with the top-level folder name,
+    loose photos with the file name minus any trailing counter
+    ("Elon Musk2.jpg" -> "Elon Musk").
+    """
+    parts = relative_path.replace('\\', '/').split('/')
+    if len(parts) > 1:
+        return parts[0].strip()
+    stem = os.path.splitext(parts[0])[0]
+    return re.sub(r'[\s_-]*\d+$', '', stem).strip() or stem.strip()
+
+def collect_photos(source: str) -> List[Tuple[str, str]]:
+    """List (key, label) pairs for every photo in a folder tree or zip file"""
+    photos = []
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                photos.append((info.filename, label_from_path(info.filename)))
+    else:
+        for root, _, files in os.walk(source):
+            for filename in files:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    relative_path = os.path.relpath(os.path.join(root, filename), source)
+                    photos.append((relative_path, label_from_path(relative_path)))
+    photos.sort()
+    return photos
+
+def init_worker(source: str, cascade_path: str):
+    """Load the detector and quality gate once per worker process"""
+    _worker['source'] = source
+    _worker['detector'] = cv2.CascadeClassifier(cascade_path)
+    _worker['quality_gate'] = FaceQualityGate()
+    _worker['zip'] = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+
+def read_photo(key: str) -> Optional[np.ndarray]:
+    """Read a photo as grayscale from the worker's folder or zip"""
+    if _worker['zip'] is not None:
+        data = np.frombuffer(_worker['zip'].read(key), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+    return cv2.imread(os.path.join(_worker['source'], key), cv2.IMREAD_GRAYSCALE)
+
+def process_photo(task: Tuple[str, str]) -> Tuple[str, str, Optional[np.ndarray], str]:
+    """Detect, crop and normalize the largest face in one photo
+
+    Returns (key, label, face, status) where face is None unless status is 'ok'.
+    """
+    key, label = task
+    try:
+        gray = read_photo(key)
+        if gray is None:
+            return key, label, None, 'unreadable'
+
+        # Detect on a downscaled copy, crop from the full resolution image
+        scale = min(1.0, MAX_DETECT_SIDE / max(gray.shape[:2]))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        faces = _worker['detector'].detectMultiScale(
+            small,
+            scaleFactor = 1.1,
+            minNeighbors = 5,
+            minSize = (30, 30),
+        )
+        if len(faces) == 0:
+            return key, label, None, 'no_face'
+
+        x, y, w, h = (np.array(max(faces, key=lambda f: f[2] * f[3])) / scale).astype(int)
+        face = gray[y:y+h, x:x+w]
+
+        reason = _worker['quality_gate'].check_crop(face)
+        if reason is not None:
+            return key, label, None, reason
+
+        face = cv2.resize(face, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_AREA)
+        return key, label, face, 'ok'
+
+    except Exception as e:
+        return key, label, None, f'error: {e}'
+
+class BulkEnrollment:
+    def __init__(self, source: str, dataset_path: str = 'dataset', trainer_path: str = 'trainer/trainer.yml',
+                 db_path: str = 'attendance.db', cascade_path: str = 'haarcascade_frontalface_default.xml',
+                 workers: Optional[int] = None, checkpoint_every: int = 500, train: bool = True):
+        """Initialize the enrollment job and load its resume state
+
+        The state file is rewritten at each checkpoint. In between, every
+        photo's outcome is appended to a progress journal right after its
+        image is written, so a run killed between checkpoints resumes without
+        processing any photo twice; faces that were written but not yet
+        trained are read back from the dataset and trained at the next
+        checkpoint. A checkpoint is taken every checkpoint_every enrolled
+        faces; without train, faces are only written to the dataset and never
+        kept in memory.
+        """
+        self.source = source
+        self.dataset_path = dataset_path
+        self.trainer_path = trainer_path
+        self.db_path = db_path
+        self.cascade_path = cascade_path
+        self.workers = workers or os.cpu_count()
+        self.checkpoint_every = checkpoint_every
+        self.train = train
+
+        self.state_path = os.path.join(dataset_path, STATE_FILENAME)
+        self.progress_path = os.path.join(dataset_path, PROGRESS_FILENAME)
+        self.state = {}
+        self.name_to_id = {}
+        self.next_image_number = {}
+        self.pending_faces = []
+        self.pending_ids = []
+        self.unsaved_faces = 0  # Enrolled since the last checkpoint
+        self.recovered_names = []
+        self.progress = None
+        self.stats = {'photos': 0, 'enrolled': 0, 'skipped': 0, 'rejected': {}}
+
+        os.makedirs(self.dataset_path, exist_ok=True)
+        os.makedirs(os.path.dirname(self.trainer_path) or '.', exist_ok=True)
+        self.load_state()
+        self.scan_dataset()
+
+    def state_key(self, key: str) -> str:
+        """Key a photo by source so several sources can share one dataset"""
+        return f"{os.path.abspath(self.source)}::{key}"
+
+    def load_state(self):
+        """Load the set of photos handled by previous runs, including any not yet checkpointed"""
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r') as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                print(f"Error loading enrollment state: {e}")
+                self.state = {}
+
+        if not os.path.exists(self.progress_path):
+            return
+        recovered = 0
+        with open(self.progress_path, 'r') as f:
+            for line in f:
+                try:
+                    key, entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                if key in self.state:
+                    continue
+                self.state[key] = entry
+                if entry['status'] != 'enrolled':
+                    continue
+                if self.train:
+                    face = cv2.imread(os.path.join(self.dataset_path, entry['image']), cv2.IMREAD_GRAYSCALE)
+                    if face is None:
+                        continue
+                    self.pending_faces.append(face)
+                    self.pending_ids.append(entry['user_id'])
+                self.recovered_names.append(entry['name'])
+                self.unsaved_faces += 1
+                recovered += 1
+        if recovered:
+            print(f"Recovered {recovered} faces enrolled after the last checkpoint")
+
+    def save_state(self):
+        """Atomically write the resume state, then empty the progress journal it now covers"""
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.state_path)
+
+        if self.progress is not None:
+            self.progress.truncate(0)
+        elif os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+    def record(self, key: str, entry: Dict):
+        """Mark a photo as handled, in memory and in the progress journal"""
+        self.state[self.state_key(key)] = entry
+        if self.progress is not None:
+            self.progress.write(json.dumps([self.state_key(key), entry]) + '\n')
+            self.progress.flush()
+
+    def scan_dataset(self):
+        """Build the name -> user ID map and next image numbers from the dataset"""
+        for filename in os.listdir(self.dataset_path):
+            try:
+                if filename.startswith('name_') and filename.endswith('.txt'):
+                    user_id = int(filename[5:-4])
+                    with open(os.path.join(self.dataset_path, filename), 'r') as f:
+                        self.name_to_id[f.read().strip().lower()] = user_id
+                    self.next_image_number.setdefault(user_id, 1)
+                elif filename.startswith('User.') and filename.endswith('.jpg'):
+                    _, user_id, number, _ = filename.split('.')
+                    user_id, number = int(user_id), int(number)
+                    self.next_image_number[user_id] = max(self.next_image_number.get(user_id, 1), number + 1)
+            except ValueError:
+                continue
+
+    def get_user_id(self, name: str) -> int:
+        """Get the dataset user ID for a name, registering a new one if needed"""
+        user_id = self.name_to_id.get(name.lower())
+        if user_id is not None:
+            return user_id
+
+        user_id = max(self.next_image_number.keys(), default=0) + 1
+        with open(os.path.join(self.dataset_path, f"name_{user_id}.txt"), 'w') as f:
+            f.write(name)
+        self.name_to_id[name.lower()] = user_id
+        self.next_image_number[user_id] = 1
+        return user_id
+
+    def store_face(self, key: str, name: str, face: np.ndarray):
+        """Write a normalized face into the dataset and queue it for training if enabled"""
+        user_id = self.get_user_id(name)
+        number = self.next_image_number[user_id]
+        image = f"User.{user_id}.{number}.jpg"
+        cv2.imwrite(os.path.join(self.dataset_path, image), face)
+        self.next_image_number[user_id] = number + 1
+
+        if self.train:
+            self.pending_faces.append(face)
+            self.pending_ids.append(user_id)
+        self.unsaved_faces += 1
+        self.record(key, {'name': name, 'status': 'enrolled', 'user_id': user_id, 'image': image})
+
+    def add_employees(self, names: List[str]):
+        """Add enrolled names to the employee table"""
+        db = AttendanceDatabase(self.db_path)
+        try:
+            existing = {emp['name'].lower() for emp in db.get_employees()}
+            for name in sorted(set(names)):
+                if name.lower() not in existing:
+                    db.add_employee(name)
+        finally:
+            db.close()
+
+    def update_model(self):
+        """Incrementally train the LBPH model with the pending faces"""
+        if not self.train or not self.pending_faces:
+            return
+
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        if os.path.exists(self.trainer_path):
+            recognizer.read(self.trainer_path)
+            recognizer.update(self.pending_faces, np.array(self.pending_ids))
+        else:
+            recognizer.train(self.pending_faces, np.array(self.pending_ids))
+        recognizer.write(self.trainer_path)
+
+        print(f"Model updated with {len(self.pending_faces)} faces")
+        self.pending_faces = []
+        self.pending_ids = []
+
+    def checkpoint(self, names: List[str]):
+        """Persist model, employees and resume state together"""
+        self.update_model()
+        self.add_employees(names)
+        self.save_state()
+        self.unsaved_faces = 0
+
+    def run(self) -> Dict:
+        """Run the enrollment and return throughput statistics"""
+        photos = collect_photos(self.source)
+        tasks = [(key, label) for key, label in photos if self.state_key(key) not in self.state]
+        self.stats['skipped'] = len(photos) - len(tasks)
+        print(f"Found {len(photos)} photos, {len(tasks)} to process ({self.stats['skipped']} already done)")
+
+        start_time = time.time()
+        new_names = self.recovered_names
+        self.recovered_names = []
+        self.progress = open(self.progress_path, 'a')
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(self.source, self.cascade_path)) as executor:
+                for key, label, face, status in executor.map(process_photo, tasks, chunksize=8):
+                    self.stats['photos'] += 1
+                    if face is not None:
+                        self.store_face(key, label, face)
+                        new_names.append(label)
+                        self.stats['enrolled'] += 1
+                    else:
+                        self.record(key, {'name': label, 'status': status})
+                        self.stats['rejected'][status] = self.stats['rejected'].get(status, 0) + 1
+
+                    if self.unsaved_faces >= self.checkpoint_every:
+                        self.checkpoint(new_names)
+                        new_names = []
+
+                    if self.stats['photos'] % 100 == 0:
+                        elapsed = time.time() - start_time
+                        print(f"Processed {self.stats['photos']}/{len(tasks)} photos "
+                              f"({self.stats['photos'] / elapsed:.1f} photos/s)")
+        finally:
+            # Whatever finished is kept, so an interrupted run resumes from here
+            self.checkpoint(new_names)
+            self.progress.close()
+            self.progress = None
+            if os.path.getsize(self.progress_path) == 0:
+                os.remove(self.progress_path)
+
+        elapsed = time.time() - start_time
+        self.stats['seconds'] = round(elapsed, 2)
+        self.stats['photos_per_second'] = round(self.stats['photos'] / elapsed, 1) if elapsed > 0 else 0
+        return self.stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk enroll employees from labelled photos')
+    parser.add_argument('source', help='Folder tree or zip file of labelled photos')
+    parser.add_argument('--dataset', default='dataset', help='Dataset directory')
+    parser.add_argument('--trainer', default='trainer/trainer.yml', help='LBPH model file')
+    parser.add_argument('--db', default='attendance.db', help='Attendance database file')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--checkpoint-every', type=int, default=500, help='Faces per training checkpoint')
+    parser.add_argument('--no-train', action='store_true', help='Only write the dataset, skip training')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Error: Source not found: {args.source}")
+        return
+
+    enrollment = BulkEnrollment(args.source, args.dataset, args.trainer, args.db,
+                                workers=args.workers, checkpoint_every=args.checkpoint_every,
+                                train=not args.no_train)
+    try:
+        stats = enrollment.run()
+    except KeyboardInterrupt:
+        print("\nEnrollment interrupted. Run again to resume.")
+        return
+
+    print("\n=== Enrollment Summary ===")
+    print(f"Photos processed: {stats['photos']} ({stats['skipped']} skipped from previous runs)")
+    print(f"Faces enrolled: {stats['enrolled']}")
+    for status, count in stats['rejected'].items():
+        print(f"Rejected ({status}): {count}")
+    print(f"Time: {stats['seconds']}s ({stats['photos_per_second']} photos/s)")
+
+if __name__ == "__main__":
+    main()
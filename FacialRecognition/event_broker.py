@@ -0,0 +1,190 @@
+'''
+Event Broker
+In-process publish/subscribe for Server-Sent Events with bounded per-client buffers
+'''
+
+import json
+import uuid
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, Optional
+
+HEARTBEAT = ": heartbeat\n\n"
+
+def format_event(event_id: str, event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+class Subscription:
+    """One client's queue of pending messages"""
+
+    def __init__(self, broker: 'EventBroker', buffer_size: int):
+        self.broker = broker
+        self._queue = deque(maxlen=buffer_size)
+        self._ready = threading.Condition()
+        self._overflowed = False
+        self.closed = False
+        self.dropped = 0
+        # Called after every put and on close, for consumers that cannot block (asyncio)
+        self.listener: Optional[Callable[[], None]] = None
+
+    def put(self, message: str):
+        """Queue a message, dropping the oldest one if the buffer is full"""
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                self._overflowed = True
+            self._queue.append(message)
+            self._ready.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Next message, or None if nothing arrived within timeout
+
+        After messages were dropped a resync event comes first, telling the
+        client to reload the summary rather than trust what it has pieced together.
+        """
+        with self._ready:
+            if not self._queue and not self.closed:
+                self._ready.wait(timeout)
+            return self._take()
+
+    def get_nowait(self) -> Optional[str]:
+        """Next message, or None if there is none"""
+        with self._ready:
+            return self._take()
+
+    def _take(self) -> Optional[str]:
+        """Next message; caller holds the condition"""
+        if self._overflowed:
+            self._overflowed = False
+            return format_event(self.broker.event_id(), 'resync', {'dropped': self.dropped})
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+    def close(self):
+        """Wake the stream so it ends"""
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def stream(self, heartbeat: float = None) -> Iterator[str]:
+        """Messages as they are published, with a comment line every heartbeat seconds of quiet
+
+        Heartbeats keep proxies from timing out an idle connection and make
+        a dead client fail its next write, which ends the generator and
+        unsubscribes it.
+        """
+        if heartbeat is None:
+            heartbeat = self.broker.heartbeat
+        try:
+            yield f"retry: {self.broker.retry_ms}\n\n"
+            while not self.closed:
+                message = self.get(heartbeat)
+                yield HEARTBEAT if message is None else message
+        finally:
+            self.broker.unsubscribe(self)
+
+class EventBroker:
+    def __init__(self, buffer_size: int = 100, history_size: int = 256,
+                 max_subscribers: int = 1000, heartbeat: float = 15.0, retry_ms: int = 3000):
+        """Initialize the broker
+
+        publish() formats a message once and appends it to every
+        subscriber's buffer, so a viewer costs one deque append per event and
+        nothing else. Each buffer holds at most buffer_size messages; a client
+        too slow to keep up loses the oldest ones and is sent a resync event.
+        The last history_size messages are kept so a reconnecting client
+        (Last-Event-ID) gets what it missed. Ids carry a random per-broker
+        prefix, so an id from another worker process or from before a restart
+        is recognised and answered with a resync. Messages published with
+        retain=True are also sent to every new subscriber, the latest one per
+        event name.
+        """
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)  # (event_id, message)
+        self._retained = {}  # event -> message
+        self.instance = uuid.uuid4().hex[:8]
+        self.last_id = 0
+
+        self.stats = {'published': 0, 'delivered': 0, 'subscribed': 0, 'rejected': 0}
+
+    def event_id(self, number: int = None) -> str:
+        """SSE id of event number (default the latest)"""
+        return f"{self.instance}-{self.last_id if number is None else number}"
+
+    def publish(self, event: str, data: Any, retain: bool = False) -> int:
+        """Send an event to every subscriber; returns its number"""
+        with self._lock:
+            self.last_id += 1
+            message = format_event(self.event_id(self.last_id), event, data)
+            self._history.append((self.last_id, message))
+            if retain:
+                self._retained[event] = message
+            # Delivered under the lock so every client sees events in id order
+            for subscription in self._subscribers:
+                subscription.put(message)
+            self.stats['published'] += 1
+            self.stats['delivered'] += len(self._subscribers)
+            return self.last_id
+
+    def subscribe(self, last_event_id: str = None) -> Optional[Subscription]:
+        """Register a client, or None if max_subscribers are already connected
+
+        With last_event_id the client is sent the events it missed, or a
+        resync event if they are no longer in the history or the id is not
+        one of this broker's. Otherwise it starts with the retained events.
+        """
+        subscription = Subscription(self, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.stats['rejected'] += 1
+                return None
+
+            if not last_event_id:
+                backlog = list(self._retained.values())
+            else:
+                instance, _, number = last_event_id.rpartition('-')
+                number = int(number) if instance == self.instance and number.isdigit() else -1
+                oldest = self._history[0][0] if self._history else self.last_id + 1
+                if number > self.last_id or number < oldest - 1:
+                    backlog = [format_event(self.event_id(), 'resync', {'dropped': None})]
+                    backlog.extend(self._retained.values())
+                else:
+                    backlog = [message for event_id, message in self._history if event_id > number]
+            for message in backlog:
+                subscription.put(message)
+
+            self._subscribers.add(subscription)
+            self.stats['subscribed'] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a client"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self):
+        """End every open stream"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+    def get_stats(self) -> Dict:
+        """Get publish counters and the number of connected clients"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['subscribers'] = len(self._subscribers)
+            stats['dropped'] = sum(subscription.dropped for subscription in self._subscribers)
+        return stats
@@ -0,0 +1,154 @@
+'''
+Face Quality Gate
+Rejects blurred, tiny, badly exposed or occluded face crops before
+recognition or dataset capture
+'''
+
+import os
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+# Eye cascade shipped with the FaceDetection examples, with a local fallback
+EYE_CASCADE_PATHS = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '..', 'FaceDetection', 'Cascades', 'haarcascade_eye.xml'),
+    'haarcascade_eye.xml',
+]
+
+# Crops are scored at a fixed size so thresholds do not depend on distance
+NORMALIZED_SIZE = 128
+
+class FaceQualityGate:
+    """Scores face crops and counts rejections per reason"""
+
+    REJECT_REASONS = ('too_small', 'too_dark', 'too_bright', 'low_contrast', 'blurry', 'no_eyes')
+
+    def __init__(self, min_size: int = 60, min_sharpness: float = 80.0,
+                 min_brightness: float = 40.0, max_brightness: float = 215.0,
+                 min_contrast: float = 18.0, require_eyes: bool = True,
+                 eye_cascade_path: Optional[str] = None):
+        """Initialize the gate thresholds and load the eye cascade"""
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.require_eyes = require_eyes
+        self.eye_cascade = None
+
+        self.accepted = 0
+        self.rejections = {reason: 0 for reason in self.REJECT_REASONS}
+
+        if self.require_eyes:
+            self.load_eye_cascade(eye_cascade_path)
+
+    def load_eye_cascade(self, eye_cascade_path: Optional[str] = None):
+        """Load the eye cascade, disabling the eye check if it is missing"""
+        candidates = [eye_cascade_path] if eye_cascade_path else EYE_CASCADE_PATHS
+        for path in candidates:
+            if os.path.exists(path):
+                cascade = cv2.CascadeClassifier(path)
+                if not cascade.empty():
+                    self.eye_cascade = cascade
+                    return
+
+        print("Warning: Could not load eye cascade file. Eye presence check disabled.")
+        self.require_eyes = False
+
+    def normalize(self, face_img: np.ndarray) -> np.ndarray:
+        """Resize a grayscale crop to the fixed scoring size"""
+        return cv2.resize(face_img, (NORMALIZED_SIZE, NORMALIZED_SIZE),
+                          interpolation=cv2.INTER_AREA)
+
+    def count_eyes(self, normalized: np.ndarray) -> int:
+        """Count eyes in the upper part of a normalized crop"""
+        upper_face = normalized[:int(NORMALIZED_SIZE * 0.6)]
+        min_eye = NORMALIZED_SIZE // 10
+        eyes = self.eye_cascade.detectMultiScale(
+            upper_face,
+            scaleFactor = 1.1,
+            minNeighbors = 3,
+            minSize = (min_eye, min_eye),
+        )
+        return len(eyes)
+
+    def check_crop(self, face_img: np.ndarray) -> Optional[str]:
+        """Return the rejection reason for a crop, or None if it passes
+
+        Checks run cheapest first so most bad crops never reach the eye cascade.
+        """
+        if min(face_img.shape[:2]) < self.min_size:
+            return 'too_small'
+
+        normalized = self.normalize(face_img)
+        mean, stddev = cv2.meanStdDev(normalized)
+        if mean[0][0] < self.min_brightness:
+            return 'too_dark'
+        if mean[0][0] > self.max_brightness:
+            return 'too_bright'
+        if stddev[0][0] < self.min_contrast:
+            return 'low_contrast'
+
+        if cv2.Laplacian(normalized, cv2.CV_64F).var() < self.min_sharpness:
+            return 'blurry'
+
+        if self.require_eyes and self.eye_cascade is not None:
+            if self.count_eyes(normalized) == 0:
+                return 'no_eyes'
+
+        return None
+
+    def evaluate(self, gray: np.ndarray, faces: Sequence) -> List[Optional[str]]:
+        """Check every detected box in a frame
+
+        Returns one entry per box: None for accepted faces, otherwise the
+        rejection reason. Only the size check is vectorized, over all boxes
+        at once; boxes that pass it are cropped and go through check_crop
+        one at a time.
+        """
+        boxes = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        if len(boxes) == 0:
+            return []
+
+        too_small = np.minimum(boxes[:, 2], boxes[:, 3]) < self.min_size
+        reasons = []
+        for (x, y, w, h), small in zip(boxes, too_small):
+            reason = 'too_small' if small else self.check_crop(gray[y:y+h, x:x+w])
+            self.record(reason)
+            reasons.append(reason)
+        return reasons
+
+    def filter_faces(self, gray: np.ndarray, faces: Sequence) -> List:
+        """Return only the boxes that pass the quality gate"""
+        reasons = self.evaluate(gray, faces)
+        return [face for face, reason in zip(faces, reasons) if reason is None]
+
+    def record(self, reason: Optional[str]):
+        """Update the accept/reject counters"""
+        if reason is None:
+            self.accepted += 1
+        else:
+            self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+    def get_stats(self) -> Dict:
+        """Get accept/reject counters"""
+        rejected = sum(self.rejections.values())
+        return {
+            'accepted': self.accepted,
+            'rejected': rejected,
+            'rejections': dict(self.rejections)
+        }
+
+    def reset_stats(self):
+        """Reset the accept/reject counters"""
+        self.accepted = 0
+        self.rejections = {reason: 0 for reason in self.REJECT_REASONS}
+
+    def print_stats(self):
+        """Print accept/reject counters"""
+        stats = self.get_stats()
+        print(f"Face quality: {stats['accepted']} accepted, {stats['rejected']} rejected")
+        for reason, count in stats['rejections'].items():
+            if count:
+                print(f"  {reason}: {count}")
@@ -7,13 +7,18 @@ import cv2
 import numpy as np
 import os
 import threading
-import time
 import subprocess
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from PIL import Image, ImageTk
 from datetime import datetime
 from attendance_database import AttendanceDatabase
+from attendance_queue import AttendanceEventQueue
+from recognition_events import RecognitionEventLog
+from presence_cache import PresenceCache
+from ttl_cache import TTLCache
+from face_quality import FaceQualityGate
+from mjpeg_stream import FrameBroadcaster, MJPEGServer
 
 # Fix Qt platform plugin issues
 os.environ['QT_QPA_PLATFORM'] = 'xcb'
@@ -28,6 +33,9 @@ os.environ['LANG'] = 'C'
 os.environ['DISPLAY'] = ':0'
 os.environ['QT_QPA_PLATFORM'] = 'xcb'
 
+# Port for the annotated camera stream (http://<kiosk>:8090/stream.mjpg); 0 disables it
+STREAM_PORT = int(os.environ.get('ATTENDANCE_STREAM_PORT', '8090'))
+
 class FaceRecognitionAttendanceUI:
     def __init__(self, root):
         self.root = root
@@ -48,11 +56,19 @@ class FaceRecognitionAttendanceUI:
         self.capture_count = 0
         self.max_captures = 30
         
+        # Quality gate shared by recognition and capture
+        self.quality_gate = FaceQualityGate()
+        
         # Attendance tracking
         self.attendance_db = None
-        self.checked_in_today = set()  # Track who has been checked in today
-        self.last_recognition_time = {}  # Track last recognition time per person
-        self.recognition_cooldown = 5  # Seconds between recognitions for same person
+        self.attendance_queue = None  # Write-behind queue so check-ins never block the video loop
+        self.event_log = None  # Raw sightings, compacted into presence intervals
+        self.presence = None  # Who has checked in today, kept current across processes
+        self.recent_recognitions = TTLCache(ttl=5, max_entries=1024)  # Seconds between recognitions for same person
+        
+        # Annotated frames for remote viewers
+        self.live_stream = None
+        self.stream_server = None
         
         # Create directories if they don't exist
         self.create_directories()
@@ -60,6 +76,7 @@ class FaceRecognitionAttendanceUI:
         # Initialize components
         self.initialize_face_recognition()
         self.initialize_attendance_database()
+        self.start_live_stream()
         
         # Load existing names from dataset
         self.update_names_list({})
@@ -72,9 +89,6 @@ class FaceRecognitionAttendanceUI:
         
         # Start video loop
         self.update_video()
-        
-        # Start attendance monitoring thread
-        self.start_attendance_monitoring()
     
     def create_directories(self):
         """Create necessary directories"""
@@ -119,37 +133,60 @@ class FaceRecognitionAttendanceUI:
             messagebox.showerror("Error", f"Failed to initialize face recognition: {e}")
     
     def initialize_attendance_database(self):
-        """Initialize attendance database"""
+        """Initialize attendance database
+
+        The database, queue, event log and presence cache are set up together;
+        if any of them fails, attendance is turned off as a whole so the rest
+        of the UI only has to check attendance_db.
+        """
         try:
             self.attendance_db = AttendanceDatabase()
             print("Attendance database initialized")
             
-            # Load today's checked-in people
-            self.load_today_attendance()
+            self.attendance_queue = AttendanceEventQueue(self.attendance_db,
+                                                         on_result=self.on_attendance_written)
+            self.attendance_queue.start()
+            
+            # Check-ins are written by the queue alone; the log only builds presence intervals
+            self.event_log = RecognitionEventLog(self.attendance_db, source='attendance_ui',
+                                                 sightings_check_in=False)
+            self.event_log.start()
+            
+            # Load today's checked-in people and follow check-ins from other processes
+            self.presence = PresenceCache(self.attendance_db)
+            self.presence.start()
+            print(f"Loaded {self.presence.count()} people already checked in today")
             
         except Exception as e:
             print(f"Error initializing attendance database: {e}")
+            self.stop_attendance()
     
-    def load_today_attendance(self):
-        """Load today's attendance records to track who has been checked in"""
-        if self.attendance_db is None:
+    def stop_attendance(self):
+        """Stop whatever attendance components were started and turn attendance off"""
+        for component in (self.attendance_queue, self.event_log, self.presence):
+            if component is not None:
+                try:
+                    component.stop()
+                except Exception as e:
+                    print(f"Error stopping attendance component: {e}")
+        if self.attendance_db is not None:
+            self.attendance_db.close()
+        self.attendance_db = None
+        self.attendance_queue = None
+        self.event_log = None
+        self.presence = None
+    
+    def start_live_stream(self):
+        """Serve annotated frames as MJPEG so the camera can be watched remotely"""
+        if STREAM_PORT == 0:
             return
-        
-        try:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            records = self.attendance_db.get_attendance_report(
-                start_date=current_date,
-                end_date=current_date
-            )
-            
-            for record in records:
-                if record['check_in_time']:
-                    self.checked_in_today.add(record['name'])
-            
-            print(f"Loaded {len(self.checked_in_today)} people already checked in today")
-            
-        except Exception as e:
-            print(f"Error loading today's attendance: {e}")
+        self.live_stream = FrameBroadcaster()
+        self.stream_server = MJPEGServer(self.live_stream, port=STREAM_PORT)
+        if self.stream_server.start():
+            print(f"Camera stream at http://0.0.0.0:{self.stream_server.port}/stream.mjpg")
+        else:
+            self.live_stream = None
+            self.stream_server = None
     
     def create_ui(self):
         """Create the user interface"""
@@ -256,8 +293,20 @@ class FaceRecognitionAttendanceUI:
                 # Only use frontal face detection
                 faces = list(frontal_faces)
                 
+                # Reject low-quality crops before predict/capture
+                quality_reasons = self.quality_gate.evaluate(gray, faces)
+                rejected_count = 0
+                
                 # Process faces
-                for (x, y, w, h) in faces:
+                for (x, y, w, h), quality_reason in zip(faces, quality_reasons):
+                    if quality_reason is not None:
+                        # Mark low-quality faces and skip recognition/capture
+                        rejected_count += 1
+                        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
+                        cv2.putText(frame, quality_reason, (x+5, y-5), 
+                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 1)
+                        continue
+                    
                     # Draw rectangle around face
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
                     
@@ -284,7 +333,8 @@ class FaceRecognitionAttendanceUI:
                             self.recognition_label.config(text=f"Recognition: {name} ({confidence_text})")
                             
                             # Handle attendance for recognized faces
-                            if name != "Unknown":
+                            if name != "Unknown" and self.attendance_db is not None:
+                                self.event_log.record(name, confidence=round(100 - confidence, 1))
                                 self.handle_attendance(name)
                             
                         except Exception as e:
@@ -294,6 +344,10 @@ class FaceRecognitionAttendanceUI:
                     if self.is_capturing and self.capture_count < self.max_captures:
                         self.capture_face(gray[y:y+h, x:x+w])
                 
+                # Share the annotated frame with remote viewers; encoding happens on their threads
+                if self.live_stream is not None:
+                    self.live_stream.publish(frame)
+                
                 # Dynamically resize to fit window while maintaining aspect ratio
                 win_w = self.root.winfo_width()
                 win_h = self.root.winfo_height()
@@ -326,7 +380,10 @@ class FaceRecognitionAttendanceUI:
                 
                 # Update status
                 if len(faces) > 0:
-                    self.status_label.config(text=f"Status: {len(faces)} face(s) detected")
+                    status_text = f"Status: {len(faces)} face(s) detected"
+                    if rejected_count > 0:
+                        status_text += f" ({rejected_count} low quality)"
+                    self.status_label.config(text=status_text)
                 else:
                     self.status_label.config(text="Status: No faces detected")
                     self.recognition_label.config(text="Recognition: No face detected")
@@ -342,38 +399,37 @@ class FaceRecognitionAttendanceUI:
         if self.attendance_db is None:
             return
         
-        current_time = time.time()
-        
         # Check if this person was recently recognized (avoid spam)
-        if name in self.last_recognition_time:
-            if current_time - self.last_recognition_time[name] < self.recognition_cooldown:
-                return
-        
-        self.last_recognition_time[name] = current_time
+        if not self.recent_recognitions.allow(name):
+            return
         
         # Check if already checked in today
-        if name in self.checked_in_today:
+        if self.presence.is_checked_in(name):
             # Already checked in today
             self.attendance_label.config(text=f"Attendance: {name} already checked in today")
             return
         
-        # First time seeing this person today - check them in
+        # First time seeing this person today - queue the check-in; the
+        # database write happens on the queue's writer thread
         try:
-            if self.attendance_db.check_in(name):
-                self.checked_in_today.add(name)
-                self.attendance_label.config(text=f"Attendance: ✅ {name} checked in!")
-                
-                # Show success message
-                self.show_attendance_notification(name, "checked in")
-                
-                print(f"✅ {name} automatically checked in at {datetime.now().strftime('%H:%M:%S')}")
-            else:
-                self.attendance_label.config(text=f"Attendance: ❌ Failed to check in {name}")
+            self.attendance_queue.check_in(name)
+            self.presence.mark(name)
+            self.attendance_label.config(text=f"Attendance: ✅ {name} checked in!")
+            
+            # Show success message
+            self.show_attendance_notification(name, "checked in")
+            
+            print(f"✅ {name} automatically checked in at {datetime.now().strftime('%H:%M:%S')}")
                 
         except Exception as e:
             print(f"Error checking in {name}: {e}")
             self.attendance_label.config(text=f"Attendance: Error checking in {name}")
     
+    def on_attendance_written(self, name, checked_in):
+        """Called from the attendance queue's writer thread once a check-in is stored"""
+        if not checked_in:
+            print(f"{name} was already checked in today")
+    
     def show_attendance_notification(self, name, action):
         """Show attendance notification"""
         # Create a temporary notification window
@@ -404,25 +460,6 @@ class FaceRecognitionAttendanceUI:
         # Auto-close after 3 seconds
         notification.after(3000, notification.destroy)
     
-    def start_attendance_monitoring(self):
-        """Start attendance monitoring thread"""
-        def monitor_attendance():
-            while True:
-                try:
-                    # Reload today's attendance every hour
-                    current_hour = datetime.now().hour
-                    if current_hour == 0:  # Midnight - new day
-                        self.checked_in_today.clear()
-                        self.load_today_attendance()
-                    
-                    time.sleep(3600)  # Check every hour
-                except Exception as e:
-                    print(f"Attendance monitoring error: {e}")
-                    time.sleep(60)  # Wait a minute before retrying
-        
-        monitor_thread = threading.Thread(target=monitor_attendance, daemon=True)
-        monitor_thread.start()
-    
     def show_attendance_summary(self):
         """Show attendance summary"""
         if self.attendance_db is None:
@@ -441,7 +478,7 @@ Absent: {summary['absent_employees']}
 Attendance Rate: {summary['attendance_rate']:.1f}%
 Average Hours: {summary['average_hours']}
 
-Checked in today: {len(self.checked_in_today)} people"""
+Checked in today: {self.presence.count()} people"""
             
             messagebox.showinfo("Attendance Summary", summary_text)
             
@@ -459,7 +496,7 @@ Checked in today: {len(self.checked_in_today)} people"""
             name = name.strip()
             try:
                 if self.attendance_db.check_in(name):
-                    self.checked_in_today.add(name)
+                    self.presence.mark(name)
                     messagebox.showinfo("Success", f"{name} checked in successfully!")
                     self.attendance_label.config(text=f"Attendance: ✅ {name} manually checked in!")
                 else:
@@ -735,8 +772,11 @@ Checked in today: {len(self.checked_in_today)} people"""
         """Handle application closing"""
         if self.camera is not None:
             self.camera.release()
-        if self.attendance_db is not None:
-            self.attendance_db.close()
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        self.quality_gate.print_stats()
+        self.recent_recognitions.print_stats("Recognition cooldown")
+        self.stop_attendance()
         self.root.destroy()
 
 def main():
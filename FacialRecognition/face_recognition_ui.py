@@ -12,6 +12,7 @@ import subprocess
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from PIL import Image, ImageTk
+from face_quality import FaceQualityGate
 
 # Fix Qt platform plugin issues
 os.environ['QT_QPA_PLATFORM'] = 'xcb'
@@ -46,6 +47,9 @@ class FaceRecognitionUI:
         self.capture_count = 0
         self.max_captures = 30
         
+        # Quality gate shared by recognition and capture
+        self.quality_gate = FaceQualityGate()
+        
         # Create directories if they don't exist
         self.create_directories()
         
@@ -188,8 +192,20 @@ class FaceRecognitionUI:
                 # Only use frontal face detection
                 faces = list(frontal_faces)
                 
+                # Reject low-quality crops before predict/capture
+                quality_reasons = self.quality_gate.evaluate(gray, faces)
+                rejected_count = 0
+                
                 # Process faces
-                for (x, y, w, h) in faces:
+                for (x, y, w, h), quality_reason in zip(faces, quality_reasons):
+                    if quality_reason is not None:
+                        # Mark low-quality faces and skip recognition/capture
+                        rejected_count += 1
+                        cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
+                        cv2.putText(frame, quality_reason, (x+5, y-5), 
+                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 1)
+                        continue
+                    
                     # Draw rectangle around face
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
                     
@@ -254,7 +270,10 @@ class FaceRecognitionUI:
                 
                 # Update status
                 if len(faces) > 0:
-                    self.status_label.config(text=f"Status: {len(faces)} face(s) detected")
+                    status_text = f"Status: {len(faces)} face(s) detected"
+                    if rejected_count > 0:
+                        status_text += f" ({rejected_count} low quality)"
+                    self.status_label.config(text=status_text)
                 else:
                     self.status_label.config(text="Status: No faces detected")
                     self.recognition_label.config(text="Recognition: No face detected")
@@ -612,6 +631,7 @@ class FaceRecognitionUI:
         """Handle application closing"""
         if self.camera is not None:
             self.camera.release()
+        self.quality_gate.print_stats()
         self.root.destroy()
 
 def main():
@@ -9,6 +9,8 @@ import os
 import time
 import threading
 import argparse
+from face_quality import FaceQualityGate
+from ttl_cache import TTLCache
 
 # Fix locale issues
 os.environ['LC_ALL'] = 'C'
@@ -26,6 +28,12 @@ class HeadlessFaceRecognition:
         self.capture_count = 0
         self.max_captures = 30
         
+        # Quality gate shared by recognition and capture
+        self.quality_gate = FaceQualityGate()
+        
+        # Report each person at most once every 5 seconds instead of every frame
+        self.recent_detections = TTLCache(ttl=5, max_entries=1024)
+        
         # Create directories if they don't exist
         self.create_directories()
         
@@ -119,7 +127,7 @@ class HeadlessFaceRecognition:
                     minSize=(30, 30)
                 )
                 
-                for (x, y, w, h) in faces:
+                for (x, y, w, h) in self.quality_gate.filter_faces(gray, faces):
                     # Save face image
                     filename = f"dataset/User.{user_id}.{self.capture_count + 1}.jpg"
                     cv2.imwrite(filename, gray[y:y+h, x:x+w])
@@ -135,6 +143,7 @@ class HeadlessFaceRecognition:
             
             self.is_capturing = False
             print(f"Capture complete! Captured {self.capture_count} faces for User {user_id}")
+            self.quality_gate.print_stats()
             return True
             
         except KeyboardInterrupt:
@@ -253,7 +262,7 @@ class HeadlessFaceRecognition:
                     minSize=(30, 30)
                 )
                 
-                for (x, y, w, h) in faces:
+                for (x, y, w, h) in self.quality_gate.filter_faces(gray, faces):
                     try:
                         face_roi = gray[y:y+h, x:x+w]
                         id, confidence = self.recognizer.predict(face_roi)
@@ -265,7 +274,8 @@ class HeadlessFaceRecognition:
                             name = "Unknown"
                             confidence_text = f"{round(100 - confidence)}%"
                         
-                        print(f"Detected: {name} (confidence: {confidence_text})")
+                        if self.recent_detections.allow(name):
+                            print(f"Detected: {name} (confidence: {confidence_text})")
                         
                     except Exception as e:
                         print(f"Recognition error: {e}")
@@ -276,6 +286,9 @@ class HeadlessFaceRecognition:
             print("\nRecognition stopped by user")
         except Exception as e:
             print(f"Error during recognition: {e}")
+        
+        self.quality_gate.print_stats()
+        self.recent_detections.print_stats("Detection cooldown")
     
     def cleanup(self):
         """Clean up resources"""
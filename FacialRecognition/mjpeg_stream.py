@@ -0,0 +1,291 @@
+'''
+MJPEG Stream
+Serves the kiosk's annotated camera frames to remote viewers as Motion JPEG
+'''
+
+import json
+import time
+import select
+import socket
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+import cv2
+
+# (name, JPEG quality, scale), best first; slow viewers move down the list
+QUALITY_TIERS = [('high', 85, 1.0), ('medium', 65, 0.75), ('low', 45, 0.5)]
+TIER_NAMES = [name for name, _, _ in QUALITY_TIERS]
+MIN_FPS = 1.0
+BOUNDARY = b'frame'
+
+class Viewer:
+    """One client's frame rate, quality tier and position in the stream"""
+
+    def __init__(self, fps: float, tier: int):
+        self.requested_fps = fps
+        self.requested_tier = tier
+        self.fps = fps
+        self.tier = tier
+        self.seq = 0
+        self.next_due = 0.0
+        self.frames = 0
+        self.downgrades = 0
+        self._fast = 0
+
+    def adapt(self, write_seconds: float, upgrade_after: int = 30):
+        """Adjust quality and frame rate to how long the last frame took to send
+
+        A write slower than the frame interval means the client or its
+        network cannot keep up: the viewer drops to the next lower quality
+        tier, then halves its frame rate. After upgrade_after quick writes in
+        a row it steps back towards what it asked for.
+        """
+        interval = 1.0 / self.fps
+        if write_seconds > interval:
+            self._fast = 0
+            self.downgrades += 1
+            if self.tier < len(QUALITY_TIERS) - 1:
+                self.tier += 1
+            else:
+                self.fps = max(MIN_FPS, self.fps / 2)
+        elif write_seconds < interval / 4:
+            self._fast += 1
+            if self._fast >= upgrade_after:
+                self._fast = 0
+                if self.fps < self.requested_fps:
+                    self.fps = min(self.requested_fps, self.fps * 2)
+                elif self.tier > self.requested_tier:
+                    self.tier -= 1
+
+class FrameBroadcaster:
+    def __init__(self, max_fps: float = 15.0, max_viewers: int = 20, keepalive: float = 5.0):
+        """Initialize the broadcaster
+
+        publish() only stores a reference to the frame, so the recognition
+        loop pays the same whether nobody or max_viewers are watching.
+        Frames are JPEG-encoded on the viewers' threads, at most once per
+        frame and quality tier, and only when a viewer asks for them; every
+        viewer on that tier is sent the same bytes. A viewer is sent the
+        newest frame each time it is due, never a backlog, at no more than
+        max_fps frames per second. When no frame arrives for keepalive
+        seconds, each stream checks that its client is still there and
+        resends the last frame, so viewers that went away while the kiosk
+        was idle give up their max_viewers slot.
+        """
+        self.max_fps = max_fps
+        self.max_viewers = max_viewers
+        self.keepalive = keepalive
+
+        self._ready = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._viewers = set()
+        self._closed = False
+        self._encoded = [None] * len(QUALITY_TIERS)  # tier -> (seq, jpeg)
+        self._encode_locks = [threading.Lock() for _ in QUALITY_TIERS]
+
+        self.stats = {'published': 0, 'encoded': 0, 'served': 0, 'rejected': 0}
+
+    def publish(self, frame):
+        """Make frame (a BGR image the caller no longer modifies) the latest one"""
+        with self._ready:
+            self._frame = frame
+            self._seq += 1
+            self.stats['published'] += 1
+            self._ready.notify_all()
+
+    def has_viewers(self) -> bool:
+        """Whether anyone is watching"""
+        return bool(self._viewers)
+
+    def add_viewer(self, fps: float = None, tier: str = 'medium') -> Optional[Viewer]:
+        """Register a viewer, or None if max_viewers are already watching"""
+        fps = min(self.max_fps, fps or self.max_fps)
+        viewer = Viewer(max(MIN_FPS, fps), TIER_NAMES.index(tier) if tier in TIER_NAMES else 1)
+        with self._ready:
+            if len(self._viewers) >= self.max_viewers:
+                self.stats['rejected'] += 1
+                return None
+            self._viewers.add(viewer)
+        return viewer
+
+    def remove_viewer(self, viewer: Viewer):
+        """Unregister a viewer"""
+        with self._ready:
+            self._viewers.discard(viewer)
+
+    def jpeg(self, tier: int) -> Optional[Tuple[int, bytes]]:
+        """(seq, JPEG bytes) of the latest frame at tier, encoding it if no viewer has yet"""
+        with self._encode_locks[tier]:
+            with self._ready:
+                frame, seq = self._frame, self._seq
+            if frame is None:
+                return None
+            cached = self._encoded[tier]
+            if cached is not None and cached[0] == seq:
+                return cached
+
+            _, quality, scale = QUALITY_TIERS[tier]
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                return cached
+            self._encoded[tier] = (seq, buffer.tobytes())
+            self.stats['encoded'] += 1
+            return self._encoded[tier]
+
+    def next_jpeg(self, viewer: Viewer, timeout: float = 5.0) -> Optional[bytes]:
+        """The next frame for viewer once it is due, or None if none arrived within timeout"""
+        delay = viewer.next_due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        with self._ready:
+            if self._seq <= viewer.seq and not self._closed:
+                self._ready.wait(timeout)
+            if self._seq <= viewer.seq or self._closed:
+                return None
+        encoded = self.jpeg(viewer.tier)
+        if encoded is None:
+            return None
+        viewer.seq = encoded[0]
+        viewer.next_due = time.monotonic() + 1.0 / viewer.fps
+        viewer.frames += 1
+        self.stats['served'] += 1
+        return encoded[1]
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        """End every open stream"""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+
+    def get_stats(self) -> Dict:
+        """Get frame counters and each viewer's current rate and quality"""
+        with self._ready:
+            viewers = [{'fps': round(viewer.fps, 1), 'quality': TIER_NAMES[viewer.tier],
+                        'frames': viewer.frames, 'downgrades': viewer.downgrades}
+                       for viewer in self._viewers]
+        return {**self.stats, 'viewers': viewers}
+
+class MJPEGRequestHandler(BaseHTTPRequestHandler):
+    """/stream.mjpg?fps=&quality=, /snapshot.jpg and /stats"""
+
+    # A write blocked this long means the client stopped reading
+    timeout = 30
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        broadcaster = self.server.broadcaster
+        if url.path == '/stream.mjpg':
+            try:
+                fps = float(query.get('fps', [0])[0]) or None
+            except ValueError:
+                fps = None
+            self.send_stream(broadcaster, fps, query.get('quality', ['medium'])[0])
+        elif url.path == '/snapshot.jpg':
+            encoded = broadcaster.jpeg(0)
+            if encoded is None:
+                self.send_body(503, 'text/plain', b'No frame yet\n')
+            else:
+                self.send_body(200, 'image/jpeg', encoded[1])
+        elif url.path == '/stats':
+            self.send_body(200, 'application/json', json.dumps(broadcaster.get_stats()).encode())
+        elif url.path == '/':
+            self.send_body(200, 'text/html; charset=utf-8',
+                           b'<!DOCTYPE html><title>Kiosk camera</title>'
+                           b'<img src="/stream.mjpg" style="max-width:100%">')
+        else:
+            self.send_body(404, 'text/plain', b'Not found\n')
+
+    def client_gone(self) -> bool:
+        """Whether the client has closed its end of the connection"""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def send_stream(self, broadcaster: FrameBroadcaster, fps: Optional[float], quality: str):
+        """Send frames as multipart/x-mixed-replace until the client goes away"""
+        viewer = broadcaster.add_viewer(fps, quality)
+        if viewer is None:
+            self.send_body(503, 'text/plain', b'Too many viewers\n')
+            return
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            part = None
+            while not broadcaster.closed:
+                jpeg = broadcaster.next_jpeg(viewer, timeout=broadcaster.keepalive)
+                if jpeg is None:
+                    # No new frame: make sure someone is still watching, and
+                    # repeat the last frame so a half-open connection fails its write
+                    if self.client_gone():
+                        break
+                    if part is not None and not broadcaster.closed:
+                        self.wfile.write(part)
+                    continue
+                start = time.monotonic()
+                part = b''.join([b'--', BOUNDARY, b'\r\nContent-Type: image/jpeg\r\nContent-Length: ',
+                                 str(len(jpeg)).encode(), b'\r\n\r\n', jpeg, b'\r\n'])
+                self.wfile.write(part)
+                viewer.adapt(time.monotonic() - start)
+        except OSError:
+            # Broken pipe, reset, or a write that timed out
+            pass
+        finally:
+            broadcaster.remove_viewer(viewer)
+            self.close_connection = True
+
+class MJPEGServer:
+    def __init__(self, broadcaster: FrameBroadcaster, host: str = '0.0.0.0', port: int = 8090):
+        """Initialize the server; each viewer is served on a thread of its own"""
+        self.broadcaster = broadcaster
+        self.host = host
+        self.port = port
+        self._server = None
+        self._server_thread = None
+
+    def start(self) -> bool:
+        """Start listening; returns False if the port could not be opened"""
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), MJPEGRequestHandler)
+        except OSError as e:
+            print(f"Error starting camera stream on port {self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._server.broadcaster = self.broadcaster
+        self.port = self._server.server_address[1]
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+        return True
+
+    def stop(self):
+        """End open streams and stop listening"""
+        self.broadcaster.close()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._server_thread.join()
@@ -0,0 +1,122 @@
+'''
+Presence Cache
+In-memory "checked in today" set kept in step with the attendance database
+'''
+
+import time
+import threading
+from datetime import datetime, timedelta
+from attendance_database import AttendanceDatabase
+
+def next_midnight(now: datetime) -> float:
+    """Timestamp of the first moment of the day after now"""
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return tomorrow.timestamp()
+
+class PresenceCache:
+    def __init__(self, db: AttendanceDatabase, poll_interval: float = 0.5):
+        """Initialize the cache
+
+        Lookups are a set membership test with no database access. A watcher
+        thread polls db.data_generation() every poll_interval seconds and
+        reloads today's check-ins when any process has committed a change, so
+        check-ins made through the web server or another kiosk show up within
+        one interval. The day rolls over on the first lookup after midnight.
+        """
+        self.db = db
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._names = frozenset()
+        self._pending = set()  # marked here but not seen in the database yet
+        self._day = None
+        self._midnight = 0.0
+        self._generation = None
+        self._watcher_thread = None
+        self._stop = threading.Event()
+
+        self.stats = {'lookups': 0, 'reloads': 0, 'rollovers': 0}
+        self.roll_over()
+
+    def roll_over(self, now: datetime = None):
+        """Start a new, empty day unless it has already been started"""
+        if now is None:
+            now = datetime.now()
+        with self._lock:
+            if self._day == now.strftime("%Y-%m-%d"):
+                return
+            self._day = now.strftime("%Y-%m-%d")
+            self._midnight = next_midnight(now)
+            self._names = frozenset()
+            self._pending = set()
+            # Force a reload for the new day on the next poll
+            self._generation = None
+        self.stats['rollovers'] += 1
+
+    def check_day(self):
+        """Roll over if midnight has passed"""
+        if time.time() >= self._midnight:
+            self.roll_over()
+
+    def is_checked_in(self, name: str) -> bool:
+        """Whether name has checked in today"""
+        self.check_day()
+        self.stats['lookups'] += 1
+        return name in self._names
+
+    def mark(self, name: str):
+        """Record a check-in made by this process before it reaches the database
+
+        Kept across reloads until the database has the row, so a queued
+        check-in is never forgotten by a reload that raced it.
+        """
+        self.check_day()
+        with self._lock:
+            self._pending.add(name)
+            self._names = self._names | {name}
+
+    def count(self) -> int:
+        """Number of people checked in today"""
+        self.check_day()
+        return len(self._names)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload today's check-ins if the database changed; returns True if it reloaded"""
+        self.check_day()
+        generation = self.db.data_generation()
+        if not force and generation == self._generation:
+            return False
+
+        day = self._day
+        names = set(self.db.get_checked_in_names(day))
+        with self._lock:
+            if day != self._day:
+                # Rolled over while loading; the next poll loads the new day
+                return False
+            self._pending -= names
+            self._names = frozenset(names | self._pending)
+            self._generation = generation
+        self.stats['reloads'] += 1
+        return True
+
+    def watcher_loop(self):
+        """Poll for database changes"""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Presence cache refresh error: {e}")
+
+    def start(self):
+        """Load today's check-ins and start watching for changes"""
+        self.refresh(force=True)
+        self._stop.clear()
+        self._watcher_thread = threading.Thread(target=self.watcher_loop, daemon=True)
+        self._watcher_thread.start()
+
+    def stop(self):
+        """Stop watching for changes"""
+        self._stop.set()
+        if self._watcher_thread is not None:
+            self._watcher_thread.join()
+            self._watcher_thread = None
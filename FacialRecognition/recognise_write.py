@@ -2,7 +2,8 @@ import cv2
 import numpy as np
 import face_recognition
 import os
-from datetime import datetime, date
+import atexit
+from register_log import RegisterLog
 
 path = "face_database"
 images = []
@@ -35,33 +36,20 @@ def find_encodings(images):
     return encodings_list
 
 
+# 当天打卡文件保持追加打开，缓冲写入，同一人60秒内只登记一次
+register_log = RegisterLog(cooldown=60.0, flush_interval=5.0)
+atexit.register(register_log.close)
+atexit.register(register_log.recent.print_stats, "Register cooldown")
+
+
 def register_info(name):
     """
     将识别到的人脸信息记录在文档中
     :param name:
     :return:
     """
-    today = date.today()
-    today_str = today.strftime("%Y%m%d")
-    file_name = f'{today_str}_register_log.csv'
-    # 创建当前打卡文件
-    try:
-        with open(file_name, 'x') as f:
-            f.writelines('Name, Datetime')
-    except FileExistsError:
-        pass
-
-    with open(file_name, 'r+') as f:
-        my_data_list = f.readlines()
-        name_list = []
-        for line in my_data_list:
-            entry = line.split(',')
-            name_list.append(entry[0])
-        # 可以设置只登记在数据库人员or陌生人也登记
-        if (name not in name_list) or (name in name_list):
-            now = datetime.now()
-            datetime_str = now.strftime("%Y/%d/%m, %H:%M:%S")
-            f.writelines(f'\n{name},{datetime_str}')
+    # 可以设置只登记在数据库人员or陌生人也登记
+    register_log.log(name)
 
 
 # 调用find_encodings() 函数，得到编码list
@@ -104,5 +92,7 @@ while True:
         cv2.putText(frame, name, (x1+6, y2-6), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255),2)
 
 
+    # 无人经过时也按时把缓冲的登记写入文件
+    register_log.flush_if_due()
     cv2.imshow('Webcam', frame)
     cv2.waitKey(1)
@@ -0,0 +1,119 @@
+'''
+Recognition Event Log
+Buffered append-only log of recognition sightings with background compaction
+'''
+
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from attendance_database import AttendanceDatabase
+from ttl_cache import TTLCache
+
+class RecognitionEventLog:
+    def __init__(self, db: AttendanceDatabase, source: str = None, flush_interval: float = 1.0,
+                 compact_interval: float = 30.0, min_interval: float = 1.0,
+                 gap_seconds: int = 300, retain_days: int = 90, sightings_check_out: bool = False,
+                 sightings_check_in: bool = True):
+        """Initialize the event log
+
+        record() only appends to an in-memory buffer; a background thread
+        writes the buffer in one transaction every flush_interval seconds and
+        compacts the log into attendance rows and presence intervals every
+        compact_interval seconds. Sightings of the same person closer than
+        min_interval seconds are dropped, so a face held in front of the
+        camera logs about one event per second rather than one per frame.
+        Compaction only sets check-outs from the last sighting with
+        sightings_check_out; by default check-outs stay explicit.
+        Sightings still buffered when the process dies are lost; check-ins
+        that must not be lost go through AttendanceEventQueue. Processes that
+        do so pass sightings_check_in=False, leaving the queue as the only
+        writer of their check-ins and the log to build presence intervals.
+        """
+        self.db = db
+        self.source = source
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.min_interval = min_interval
+        self.gap_seconds = gap_seconds
+        self.retain_days = retain_days
+        self.sightings_check_out = sightings_check_out
+        self.sightings_check_in = sightings_check_in
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._recent = TTLCache(ttl=min_interval, max_entries=4096)
+        self._last_compaction = 0.0
+        self._worker_thread = None
+        self._stop = threading.Event()
+
+        self.stats = {'recorded': 0, 'dropped': 0, 'written': 0, 'flushes': 0,
+                      'retries': 0, 'compactions': 0}
+
+    def record(self, name: str, confidence: float = None, seen_at: str = None) -> bool:
+        """Buffer one sighting; returns False if it was within min_interval of the last"""
+        if not self._recent.allow(name):
+            with self._lock:
+                self.stats['dropped'] += 1
+            return False
+
+        with self._lock:
+            if seen_at is None:
+                seen_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._buffer.append((name, seen_at, confidence))
+            self.stats['recorded'] += 1
+        return True
+
+    def flush(self) -> bool:
+        """Write the buffered sightings in one transaction
+
+        On failure the sightings go back to the front of the buffer and are
+        retried with the next flush.
+        """
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return True
+
+        if not self.db.append_recognition_events(events, self.source):
+            with self._lock:
+                self._buffer[:0] = events
+            self.stats['retries'] += 1
+            return False
+
+        self.stats['written'] += len(events)
+        self.stats['flushes'] += 1
+        return True
+
+    def compact(self) -> Optional[Dict]:
+        """Fold everything written so far into attendance and presence intervals"""
+        result = self.db.compact_recognition_events(self.gap_seconds, self.retain_days,
+                                                    sightings_check_out=self.sightings_check_out,
+                                                    sightings_check_in=self.sightings_check_in)
+        self._last_compaction = time.monotonic()
+        if result is not None:
+            self.stats['compactions'] += 1
+        return result
+
+    def worker_loop(self):
+        """Flush the buffer periodically and compact on the slower schedule"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_compaction >= self.compact_interval:
+                self.compact()
+
+    def start(self):
+        """Start the background writer"""
+        self._last_compaction = time.monotonic()
+        self._stop.clear()
+        self._worker_thread = threading.Thread(target=self.worker_loop, daemon=True)
+        self._worker_thread.start()
+
+    def stop(self):
+        """Write what is buffered, compact once more and stop the writer"""
+        self._stop.set()
+        if self._worker_thread is not None:
+            self._worker_thread.join()
+            self._worker_thread = None
+        self.flush()
+        self.compact()
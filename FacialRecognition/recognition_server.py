@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Recognition Server
+Recognise faces in JPEG frames sent over HTTP by phones and door cameras
+
+POST /api/recognize takes one frame as an image/jpeg body, or several as
+multipart/form-data files named "frames". Add ?check_in=1 to check in the
+people recognised, as the kiosk does.
+
+Usage:
+    python recognition_server.py --port 5001 --workers 4
+    curl --data-binary @face.jpg -H 'Content-Type: image/jpeg' 'http://localhost:5001/api/recognize?check_in=1'
+    curl -F frames=@door1.jpg -F frames=@door2.jpg http://localhost:5001/api/recognize
+"""
+
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from flask import Flask, request, jsonify
+from face_quality import FaceQualityGate
+from ttl_cache import TTLCache
+from attendance_database import AttendanceDatabase
+from attendance_queue import AttendanceEventQueue
+from recognition_events import RecognitionEventLog
+from presence_cache import PresenceCache
+
+# Next to this file, so the server and its tests work from any directory
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "trainer", "trainer.yml")
+CASCADE_PATH = os.path.join(HERE, "haarcascade_frontalface_default.xml")
+DATASET_DIR = os.path.join(HERE, "dataset")
+
+# LBPH distance below which a face counts as recognised, as on the kiosk
+MAX_DISTANCE = 100
+
+# Largest number of frames accepted in one request
+MAX_FRAMES = 32
+
+def load_names(dataset_dir: str = DATASET_DIR) -> List[str]:
+    """Names indexed by LBPH label, from dataset/User.<id>.*.jpg and dataset/name_<id>.txt"""
+    names_dict = {}
+    if os.path.exists(dataset_dir):
+        for filename in os.listdir(dataset_dir):
+            if filename.startswith('User.') and filename.endswith('.jpg'):
+                try:
+                    user_id = int(filename.split('.')[1])
+                except ValueError:
+                    continue
+                if user_id in names_dict:
+                    continue
+                name_file = os.path.join(dataset_dir, f"name_{user_id}.txt")
+                if os.path.exists(name_file):
+                    with open(name_file, 'r') as f:
+                        names_dict[user_id] = f.read().strip()
+                else:
+                    names_dict[user_id] = f"User_{user_id}"
+
+    max_id = max(names_dict.keys()) if names_dict else 0
+    return ['None'] + [names_dict.get(i, f"User_{i}") for i in range(1, max_id + 1)]
+
+class FaceModels:
+    """One worker's detector, recognizer and quality gate; OpenCV models are not shared between threads"""
+
+    def __init__(self, model_path: str, cascade_path: str, dataset_dir: str):
+        self.model_path = model_path
+        self.dataset_dir = dataset_dir
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        self.quality_gate = FaceQualityGate()
+        self.recognizer = None
+        self.names = []
+        self._model_mtime = None
+
+    def refresh(self):
+        """Load the model if it is new or was retrained since it was loaded"""
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return
+        if mtime == self._model_mtime:
+            return
+        try:
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(self.model_path)
+        except Exception as e:
+            print(f"Error loading trainer: {e}")
+            return
+        self.recognizer = recognizer
+        self.names = load_names(self.dataset_dir)
+        self._model_mtime = mtime
+
+class RecognitionCheckIn:
+    def __init__(self, db: AttendanceDatabase, cooldown: float = 5.0,
+                 spool_path: str = "recognition_spool.jsonl"):
+        """Initialize check-ins for recognised faces
+
+        Works like the kiosk: every sighting goes to the recognition event
+        log, and someone not yet checked in today is queued on a write-behind
+        AttendanceEventQueue, at most once per cooldown seconds. The queue
+        has a spool of its own, so a kiosk in the same directory keeps its own.
+        The queue is the only writer of check-ins; the event log only builds
+        presence intervals.
+        """
+        self.queue = AttendanceEventQueue(db, spool_path=spool_path)
+        self.event_log = RecognitionEventLog(db, source='recognition_server', sightings_check_in=False)
+        self.presence = PresenceCache(db)
+        self.recent = TTLCache(ttl=cooldown, max_entries=1024)
+
+    def start(self):
+        self.queue.start()
+        self.event_log.start()
+        self.presence.start()
+
+    def stop(self):
+        self.queue.stop()
+        self.event_log.stop()
+        self.presence.stop()
+
+    def handle(self, name: str, confidence: float) -> str:
+        """Record a sighting and check in if due; returns what happened"""
+        self.event_log.record(name, confidence=confidence)
+        if self.presence.is_checked_in(name):
+            return 'already_checked_in'
+        if not self.recent.allow(name):
+            return 'cooldown'
+        self.queue.check_in(name)
+        self.presence.mark(name)
+        return 'checked_in'
+
+class RecognitionJob:
+    """One frame waiting for a worker"""
+
+    def __init__(self, image: bytes, check_in: bool):
+        self.image = image
+        self.check_in = check_in
+        self.result = None
+        self.cancelled = False  # set when the request gave up waiting
+        self.done = threading.Event()
+
+class RecognitionPool:
+    def __init__(self, model_path: str = MODEL_PATH, cascade_path: str = CASCADE_PATH,
+                 dataset_dir: str = DATASET_DIR, workers: int = None, max_batch: int = 8,
+                 max_wait: float = 0.002, max_queue: int = 256,
+                 attendance: Optional[RecognitionCheckIn] = None):
+        """Initialize the pool
+
+        Frames from all requests share one queue of at most max_queue frames;
+        when it is full recognize() returns None at once, so an overloaded
+        server answers 503 instead of queueing. Each of the worker threads
+        takes a micro-batch: the first waiting frame plus whatever else
+        arrives within max_wait seconds, up to max_batch frames. A batch
+        costs one wakeup and one model freshness check however many frames
+        it holds, and its check-ins reach the attendance queue together. The
+        OpenCV calls (decode, detection, LBPH) release the GIL, so workers
+        use separate cores; run with cv2.setNumThreads(1) so OpenCV's own
+        threads do not compete with them.
+        """
+        self.model_path = model_path
+        self.cascade_path = cascade_path
+        self.dataset_dir = dataset_dir
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.attendance = attendance
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker_threads = []
+        self._stop = threading.Event()
+
+        self.stats = {'frames': 0, 'batches': 0, 'faces': 0, 'recognized': 0,
+                      'decode_errors': 0, 'rejected': 0, 'cancelled': 0}
+
+    def start(self):
+        """Start the worker threads"""
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.worker_loop, name=f"recognition-{i}", daemon=True)
+            thread.start()
+            self._worker_threads.append(thread)
+
+    def stop(self):
+        """Finish the batches in progress and stop the workers"""
+        self._stop.set()
+        for thread in self._worker_threads:
+            thread.join()
+        self._worker_threads = []
+
+    def recognize(self, images: List[bytes], check_in: bool = False,
+                  timeout: float = 30.0) -> Optional[List[Dict]]:
+        """Results for each JPEG in images, or None if the queue is full
+
+        Frames still unprocessed after timeout seconds are reported as timed
+        out and cancelled: a worker that reaches them later skips them, so an
+        abandoned request never checks anyone in.
+        """
+        jobs = [RecognitionJob(image, check_in) for image in images]
+        with self._lock:
+            # All frames of a request are queued or none are
+            if self._queue.maxsize - self._queue.qsize() < len(jobs):
+                self.stats['rejected'] += 1
+                return None
+            for job in jobs:
+                self._queue.put_nowait(job)
+
+        deadline = time.monotonic() + timeout
+        results = []
+        for job in jobs:
+            if job.done.wait(max(0.0, deadline - time.monotonic())):
+                results.append(job.result)
+            else:
+                job.cancelled = True
+                results.append({'faces': [], 'error': 'Timed out'})
+        return results
+
+    def next_batch(self) -> List[RecognitionJob]:
+        """Wait for one frame, then collect what else arrives within max_wait"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def worker_loop(self):
+        """Recognise batches of frames until stopped"""
+        models = FaceModels(self.model_path, self.cascade_path, self.dataset_dir)
+        while not self._stop.is_set():
+            batch = self.next_batch()
+            if not batch:
+                continue
+            models.refresh()
+            counts = {'frames': len(batch), 'batches': 1, 'faces': 0, 'recognized': 0, 'decode_errors': 0,
+                      'cancelled': 0}
+            for job in batch:
+                if job.cancelled:
+                    counts['cancelled'] += 1
+                    continue
+                try:
+                    job.result = self.process(models, job, counts)
+                except Exception as e:
+                    print(f"Recognition error: {e}")
+                    job.result = {'faces': [], 'error': 'Recognition failed'}
+                job.done.set()
+            with self._lock:
+                for key, value in counts.items():
+                    self.stats[key] += value
+
+    def process(self, models: FaceModels, job: RecognitionJob, counts: Dict) -> Dict:
+        """Detect and recognise the faces in one frame"""
+        # Detection and LBPH only need grey, which also decodes faster
+        gray = cv2.imdecode(np.frombuffer(job.image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            counts['decode_errors'] += 1
+            return {'faces': [], 'error': 'Could not decode image'}
+
+        height, width = gray.shape
+        boxes = models.cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.15,
+            minNeighbors=4,
+            minSize=(int(0.1 * width), int(0.1 * height)),
+        )
+        boxes = list(boxes)
+        faces = []
+        for (x, y, w, h), quality_reason in zip(boxes, models.quality_gate.evaluate(gray, boxes)):
+            face = {'box': [int(x), int(y), int(w), int(h)], 'name': None, 'confidence': None,
+                    'quality': quality_reason}
+            if quality_reason is None and models.recognizer is not None:
+                label, distance = models.recognizer.predict(gray[y:y+h, x:x+w])
+                if distance < MAX_DISTANCE:
+                    face['name'] = models.names[label] if label < len(models.names) else f"User_{label}"
+                    counts['recognized'] += 1
+                else:
+                    face['name'] = "Unknown"
+                face['confidence'] = round(100 - distance)
+                if (job.check_in and not job.cancelled and self.attendance is not None
+                        and face['name'] != "Unknown"):
+                    face['attendance'] = self.attendance.handle(face['name'], round(100 - distance, 1))
+            faces.append(face)
+
+        counts['faces'] += len(faces)
+        return {'faces': faces, 'width': width, 'height': height}
+
+    def get_stats(self) -> Dict:
+        """Get frame and batch counters"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['queued'] = self._queue.qsize()
+        stats['average_batch'] = round(stats['frames'] / stats['batches'], 2) if stats['batches'] else 0
+        return stats
+
+app = Flask(__name__)
+
+# Set by main() or by a caller embedding the app
+pool = None
+
+@app.route('/api/recognize', methods=['POST'])
+def api_recognize():
+    """Recognise the faces in one frame (image/jpeg body) or several (multipart "frames")"""
+    if request.mimetype == 'multipart/form-data':
+        images = [frame.read() for frame in request.files.getlist('frames')]
+    else:
+        images = [request.get_data()]
+    images = [image for image in images if image]
+
+    if not images:
+        return jsonify({'success': False, 'message': 'Send a JPEG body or multipart "frames" files'}), 400
+    if len(images) > MAX_FRAMES:
+        return jsonify({'success': False, 'message': f'At most {MAX_FRAMES} frames per request'}), 413
+
+    check_in = request.args.get('check_in', '').lower() in ('1', 'true', 'yes')
+    results = pool.recognize(images, check_in=check_in)
+    if results is None:
+        response = jsonify({'success': False, 'message': 'Server busy, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'success': True, 'frames': results})
+
+@app.route('/status')
+def status():
+    """Pool counters"""
+    return jsonify({'recognition': pool.get_stats(), 'system_status': 'Online'})
+
+def main():
+    parser = argparse.ArgumentParser(description='Recognise faces in frames sent over HTTP')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=5001, help='Port to listen on')
+    parser.add_argument('--db', default='attendance.db', help='Attendance database for check-ins')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='Recognition worker threads')
+    parser.add_argument('--max-batch', type=int, default=8, help='Frames per micro-batch')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='Milliseconds a worker waits to fill a batch')
+    parser.add_argument('--max-queue', type=int, default=256,
+                        help='Frames waiting for a worker before requests get 503')
+    parser.add_argument('--model', default=MODEL_PATH, help='LBPH model written by training')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Warning: {args.model} not found; faces are detected but not recognised until it is trained")
+
+    db = AttendanceDatabase(args.db)
+    if not db.initialized:
+        return 1
+    attendance = RecognitionCheckIn(db)
+    attendance.start()
+
+    # The workers run in parallel already; OpenCV's own thread pool would compete with them
+    cv2.setNumThreads(1)
+
+    global pool
+    pool = RecognitionPool(model_path=args.model, workers=args.workers, max_batch=args.max_batch,
+                           max_wait=args.max_wait_ms / 1000, max_queue=args.max_queue,
+                           attendance=attendance)
+    pool.start()
+
+    print(f"Recognition server on http://{args.host}:{args.port}/api/recognize "
+          f"({args.workers} workers, batches of up to {args.max_batch})")
+    try:
+        app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+    finally:
+        pool.stop()
+        attendance.stop()
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+'''
+Register Log
+Append-only daily CSV log of recognized faces with buffered writes
+'''
+
+import os
+import time
+from datetime import datetime
+from ttl_cache import TTLCache
+from attendance_database import REGISTER_TIME_FORMAT
+
+class RegisterLog:
+    def __init__(self, directory: str = ".", cooldown: float = 60.0, flush_interval: float = 5.0,
+                 buffer_size: int = 64 * 1024):
+        """Initialize the register log
+
+        Writes the YYYYMMDD_register_log.csv files read by
+        AttendanceDatabase.import_from_csv, one "Name,YYYY/DD/MM, HH:MM:SS"
+        line per sighting (REGISTER_TIME_FORMAT). The day's file stays open in
+        append mode, so logging a sighting never reads the file. Lines are
+        buffered and flushed every flush_interval seconds, and a person is
+        logged at most once per cooldown seconds. Meant to be used from one
+        thread, whose loop calls flush_if_due() so the last lines reach disk
+        even when nobody else is seen.
+        """
+        self.directory = directory
+        self.cooldown = cooldown
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+
+        self.day = None
+        self.path = None
+        self.seen = set()  # everyone logged today
+        self._file = None
+        # Keyed on the sighting's own timestamp so logs replayed with explicit times dedup too
+        self.recent = TTLCache(ttl=cooldown, max_entries=4096, clock=time.time)
+        self._last_flush = 0.0
+
+        self.stats = {'logged': 0, 'suppressed': 0, 'flushes': 0, 'rotations': 0}
+
+    def file_name(self, day: str) -> str:
+        """Log file for a YYYYMMDD day"""
+        return os.path.join(self.directory, f'{day}_register_log.csv')
+
+    def open_day(self, day: str):
+        """Close the current file and open the one for day
+
+        The seen set is rebuilt from the file once, so a restart during the
+        day still knows who was already logged.
+        """
+        self.close()
+        self.day = day
+        self.path = self.file_name(day)
+        self.seen = set()
+        self.recent.clear()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                next(f, None)  # header
+                for line in f:
+                    name = line.split(',', 1)[0].strip()
+                    if name:
+                        self.seen.add(name)
+
+        self._file = open(self.path, 'a', buffering=self.buffer_size)
+        if self._file.tell() == 0:
+            # Same layout as before: header without newline, each record starts with one
+            self._file.write('Name, Datetime')
+        self._last_flush = time.monotonic()
+        self.stats['rotations'] += 1
+
+    def log(self, name: str, now: datetime = None) -> bool:
+        """Log one sighting; returns False if name was logged within the cooldown"""
+        if now is None:
+            now = datetime.now()
+        day = now.strftime("%Y%m%d")
+        if day != self.day:
+            self.open_day(day)
+
+        if not self.recent.allow(name, now=now.timestamp()):
+            self.stats['suppressed'] += 1
+            return False
+
+        self._file.write(f'\n{name},{now.strftime(REGISTER_TIME_FORMAT)}')
+        self.seen.add(name)
+        self.stats['logged'] += 1
+
+        self.flush_if_due()
+        return True
+
+    def flush_if_due(self) -> bool:
+        """Flush if flush_interval seconds have passed since the last flush"""
+        if self._file is None or time.monotonic() - self._last_flush < self.flush_interval:
+            return False
+        self.flush()
+        return True
+
+    def seen_today(self, name: str) -> bool:
+        """Whether name has been logged today"""
+        return self.day == datetime.now().strftime("%Y%m%d") and name in self.seen
+
+    def flush(self):
+        """Write buffered lines to disk"""
+        if self._file is not None:
+            self._file.flush()
+            self._last_flush = time.monotonic()
+            self.stats['flushes'] += 1
+
+    def close(self):
+        """Flush and close the current day's file"""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
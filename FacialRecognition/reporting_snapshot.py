@@ -0,0 +1,174 @@
+'''
+Reporting Snapshot
+Periodically publish a read-only copy of the attendance database for reports
+'''
+
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Optional
+from attendance_database import AttendanceDatabase
+
+class ReportingSnapshot:
+    def __init__(self, source_path: str = "attendance.db", snapshot_path: str = None,
+                 interval: float = 60.0, retire_after: float = 300.0):
+        """Initialize the snapshot publisher
+
+        Long report queries and CSV exports run against the snapshot instead
+        of the live database, so they never hold up kiosk check-ins. The
+        snapshot is at most about interval seconds old. Databases on replaced
+        snapshots are closed retire_after seconds after they were replaced.
+        """
+        self.source_path = source_path
+        if snapshot_path is None:
+            root, ext = os.path.splitext(source_path)
+            snapshot_path = f"{root}_report{ext or '.db'}"
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.retire_after = retire_after
+
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_version = None
+        self._retired = []  # (replaced at, database) on older snapshots
+        self._publisher_thread = None
+        self._stop = threading.Event()
+
+        self.stats = {'published': 0, 'failed': 0, 'last_publish_seconds': None, 'closed': 0}
+
+    def publish(self) -> bool:
+        """Copy the live database to the snapshot path
+
+        The backup API copies every page in one step, which holds a single
+        read transaction on the source; in WAL mode that never blocks the
+        writer. The copy is switched to rollback journaling so it opens
+        cleanly read-only, then atomically renamed over the old snapshot.
+        Readers that still have the previous file open finish on it.
+        """
+        temp_path = self.snapshot_path + '.tmp'
+        start_time = time.time()
+        try:
+            source = sqlite3.connect(self.source_path, timeout=30.0)
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+                source.close()
+
+            os.replace(temp_path, self.snapshot_path)
+            self.stats['published'] += 1
+            self.stats['last_publish_seconds'] = round(time.time() - start_time, 3)
+            return True
+
+        except Exception as e:
+            print(f"Error publishing reporting snapshot: {e}")
+            self.stats['failed'] += 1
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot was published, or None if there is none
+
+        Read from the file, so every process serving reports sees the same age.
+        """
+        try:
+            return max(0.0, time.time() - os.path.getmtime(self.snapshot_path))
+        except OSError:
+            return None
+
+    def database(self) -> Optional[AttendanceDatabase]:
+        """Read-only database on the latest snapshot, or None if there is none
+
+        A new snapshot gets a new instance. The previous one is retired and
+        only closed once it has been replaced for retire_after seconds, so
+        responses still streaming from it can finish.
+        """
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+
+        # os.replace gives every published snapshot a new inode
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if self._db is None or version != self._db_version:
+                db = AttendanceDatabase(self.snapshot_path, read_only=True)
+                if not db.initialized:
+                    return self._db
+                if self._db is not None:
+                    self._retired.append((time.monotonic(), self._db))
+                self._db = db
+                self._db_version = version
+            db = self._db
+        self.close_retired()
+        return db
+
+    def close_retired(self, max_age: float = None):
+        """Close databases replaced more than max_age (default retire_after) seconds ago"""
+        if max_age is None:
+            max_age = self.retire_after
+        cutoff = time.monotonic() - max_age
+        with self._lock:
+            expired = [db for retired_at, db in self._retired if retired_at <= cutoff]
+            self._retired = [(retired_at, db) for retired_at, db in self._retired if retired_at > cutoff]
+        for db in expired:
+            db.close()
+        self.stats['closed'] += len(expired)
+        return len(expired)
+
+    def publisher_loop(self):
+        """Publish a snapshot every interval seconds"""
+        while not self._stop.wait(self.interval):
+            self.publish()
+            self.close_retired()
+
+    def start(self):
+        """Publish a first snapshot and keep refreshing it in the background"""
+        self.publish()
+        self._stop.clear()
+        self._publisher_thread = threading.Thread(target=self.publisher_loop, daemon=True)
+        self._publisher_thread.start()
+
+    def stop(self):
+        """Stop refreshing the snapshot and close its databases"""
+        self._stop.set()
+        if self._publisher_thread is not None:
+            self._publisher_thread.join()
+            self._publisher_thread = None
+        self.close_retired(max_age=0)
+        with self._lock:
+            db, self._db, self._db_version = self._db, None, None
+        if db is not None:
+            db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish a read-only reporting copy of the attendance database')
+    parser.add_argument('--db', default='attendance.db', help='Live attendance database')
+    parser.add_argument('--snapshot', default=None, help='Snapshot file (default: <db>_report.db)')
+    parser.add_argument('--interval', type=float, default=60.0, help='Seconds between snapshots')
+    parser.add_argument('--once', action='store_true', help='Publish one snapshot and exit')
+
+    args = parser.parse_args()
+
+    snapshot = ReportingSnapshot(args.db, args.snapshot, args.interval)
+    if args.once:
+        if snapshot.publish():
+            print(f"Snapshot published: {snapshot.snapshot_path} ({snapshot.stats['last_publish_seconds']}s)")
+        return
+
+    print(f"Publishing {snapshot.snapshot_path} every {args.interval:g}s. Press Ctrl+C to stop")
+    try:
+        while True:
+            if snapshot.publish():
+                print(f"Snapshot published ({snapshot.stats['last_publish_seconds']}s)")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+'''
+Response Cache
+Query results and rendered responses kept until the attendance database changes
+'''
+
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from flask import Response, request
+from attendance_database import AttendanceDatabase
+from ttl_cache import TTLCache
+
+class ResponseCache:
+    def __init__(self, db: AttendanceDatabase, max_entries: int = 256, ttl: float = 300.0):
+        """Initialize the cache
+
+        Every entry remembers the db.data_generation() it was computed at and
+        is used only while the generation is unchanged, so any commit (a
+        check-in here, at a kiosk or through another web worker) invalidates
+        everything at once. ttl is a safety net for results that depend on
+        something other than the data, such as the time of day. Callers put
+        the date in the key of anything that depends on "today".
+        """
+        self.db = db
+        self.enabled = True
+        self._entries = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Cached result of compute() for key, recomputed after any database change
+
+        The generation is read before computing, so a write that lands while
+        computing leaves the entry stale rather than wrongly fresh.
+        """
+        if not self.enabled:
+            return compute()
+
+        generation = self.db.data_generation()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == generation:
+            self._count('hits')
+            return entry[1]
+
+        value = compute()
+        self._entries.set(key, (generation, value))
+        self._count('misses')
+        return value
+
+    def body(self, key: Hashable, build: Callable[[], str], mimetype: str = 'text/html') -> Tuple[bytes, str]:
+        """Cached body for key and its ETag
+
+        The ETag is a hash of the body, so it is the same in every worker process.
+        """
+        def render() -> Tuple[bytes, str]:
+            body = build()
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            return body, hashlib.sha1(body).hexdigest()[:20]
+
+        return self.get(('response', key, mimetype), render)
+
+    def conditional(self, key: Hashable, build: Callable[[], str], mimetype: str = 'text/html',
+                    if_none_match: Optional[str] = None) -> Tuple[int, bytes, str]:
+        """Status, body and ETag for a request with the given If-None-Match header
+
+        For servers other than Flask; returns 304 and an empty body if the
+        client's copy is current.
+        """
+        body, etag = self.body(key, build, mimetype)
+        if if_none_match and (if_none_match.strip() == '*' or
+                              f'"{etag}"' in [tag.strip().lstrip('W/') for tag in if_none_match.split(',')]):
+            self._count('not_modified')
+            return 304, b'', etag
+        return 200, body, etag
+
+    def response(self, key: Hashable, build: Callable[[], str], mimetype: str = 'text/html') -> Response:
+        """Response for the current request from a cached body, with an ETag
+
+        A request whose If-None-Match still matches gets a 304 with no body.
+        """
+        body, etag = self.body(key, build, mimetype)
+        response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        # Clients may keep the body but must revalidate before using it
+        response.headers['Cache-Control'] = 'no-cache'
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            self._count('not_modified')
+        return response
+
+    def get_stats(self) -> Dict:
+        """Get hit, miss and 304 counters"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['entries'] = len(self._entries)
+        return stats
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
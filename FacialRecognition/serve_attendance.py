@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Attendance Web Server (production)
+Serve attendance_web_server.app with several worker processes
+
+Uses gunicorn (gthread workers) where it is installed, otherwise waitress
+(one process, many threads). Each worker opens its own database connections
+after it is forked; the master process creates or migrates the database once
+and publishes the reporting snapshot for all of them.
+
+Usage:
+    python serve_attendance.py --workers 4 --threads 8
+    python serve_attendance.py --port 8000 --db /srv/attendance/attendance.db
+    kill -HUP <master pid>     # graceful reload: new workers start, old ones finish their requests
+    kill -TERM <master pid>    # graceful shutdown
+
+Set ATTENDANCE_SECRET_KEY so sessions and flash messages are signed with a
+key of your own.
+"""
+
+import os
+import sys
+import signal
+import argparse
+import subprocess
+import multiprocessing
+import attendance_web_server as web
+from attendance_database import AttendanceDatabase
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+SNAPSHOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reporting_snapshot.py')
+
+def default_workers() -> int:
+    """One worker per core, at most 8; SQLite takes one writer at a time anyway"""
+    return min(multiprocessing.cpu_count(), 8)
+
+def post_fork(server, worker):
+    """Start each gunicorn worker without the master's state"""
+    web.reset_worker_state()
+    web.publish_snapshot = False
+
+def worker_exit(server, worker):
+    """End live streams and close the worker's database connections"""
+    web.shutdown()
+
+if BaseApplication is not None:
+    class AttendanceApplication(BaseApplication):
+        """gunicorn application configured from a dict instead of a config file"""
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return web.app
+
+def start_snapshot_publisher(args) -> subprocess.Popen:
+    """Publish the reporting snapshot from one process instead of every worker"""
+    return subprocess.Popen([sys.executable, SNAPSHOT_SCRIPT, '--db', args.db,
+                             '--interval', str(args.snapshot_interval)],
+                            stdout=subprocess.DEVNULL)
+
+def serve_gunicorn(args):
+    """Run the pre-forking gunicorn server"""
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'accesslog': '-' if args.access_log else None,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+    AttendanceApplication(options).run()
+
+def serve_waitress(args):
+    """Run waitress: one process, args.threads threads"""
+    if args.workers > 1:
+        print(f"waitress runs a single process; serving with {args.threads} threads instead of "
+              f"{args.workers} workers (install gunicorn for worker processes)")
+    # In a single process the normal in-process snapshot publisher is fine
+    web.publish_snapshot = True
+    try:
+        waitress.serve(web.app, host=args.host, port=args.port, threads=args.threads,
+                       channel_timeout=args.timeout)
+    finally:
+        web.shutdown()
+
+def serve_dev(args):
+    """Run the Flask development server without the debugger or reloader (for benchmarks)"""
+    web.publish_snapshot = True
+    # SIGTERM ends the server like Ctrl+C, so shutdown() still runs
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        web.app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        web.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the attendance web interface with several workers')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+    parser.add_argument('--db', default='attendance.db', help='Attendance database')
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help='Worker processes (gunicorn only)')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress', 'dev'], default='auto',
+                        help='WSGI server; auto prefers gunicorn, then waitress')
+    parser.add_argument('--timeout', type=int, default=30, help='Seconds before a stuck worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds workers get to finish requests on reload or shutdown')
+    parser.add_argument('--keepalive', type=int, default=5, help='Seconds to keep idle connections open')
+    parser.add_argument('--max-requests', type=int, default=10000,
+                        help='Recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--snapshot-interval', type=float, default=60.0,
+                        help='Seconds between reporting snapshots')
+    parser.add_argument('--write-templates', action='store_true',
+                        help='Overwrite existing templates with the built-in ones')
+    parser.add_argument('--access-log', action='store_true', help='Log every request to stdout')
+
+    args = parser.parse_args()
+
+    available = {'gunicorn': BaseApplication is not None, 'waitress': waitress is not None, 'dev': True}
+    server = args.server
+    if server == 'auto':
+        server = next((name for name in ('gunicorn', 'waitress') if available[name]), None)
+    if server is None or not available[server]:
+        print("No production WSGI server available. Install one with:")
+        print("  pip install gunicorn    (Linux/macOS, worker processes)")
+        print("  pip install waitress    (any platform, threads only)")
+        return 1
+
+    web.db_path = args.db
+    web.app.secret_key = os.environ.get('ATTENDANCE_SECRET_KEY', web.app.secret_key)
+    if 'ATTENDANCE_SECRET_KEY' not in os.environ:
+        print("Warning: ATTENDANCE_SECRET_KEY is not set; using the built-in session key")
+
+    # Only missing templates are written, so edited ones are kept
+    template_dir = os.path.join(web.app.root_path, 'templates')
+    os.makedirs(template_dir, exist_ok=True)
+    web.create_templates(overwrite=args.write_templates, directory=template_dir)
+
+    # Create or migrate the database once, before any worker opens it
+    db = AttendanceDatabase(args.db)
+    if not db.initialized:
+        return 1
+    db.close()
+
+    print(f"Serving attendance on http://{args.host}:{args.port} with {server} "
+          f"({args.workers if server == 'gunicorn' else 1} x {args.threads} threads)")
+
+    if server == 'gunicorn':
+        publisher = start_snapshot_publisher(args)
+        try:
+            serve_gunicorn(args)
+        finally:
+            publisher.terminate()
+            publisher.wait()
+    elif server == 'waitress':
+        serve_waitress(args)
+    else:
+        serve_dev(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized attendance analytics
+"""
+
+import os
+import tempfile
+from attendance_database import AttendanceDatabase
+from attendance_analytics import run_analytics
+
+def test_attendance_rate_covers_the_requested_range():
+    """Days before the first and after the last check-in in the range count as zero"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        for name in ("HERMAN YEH", "ANNA LEE"):
+            db.add_employee(name)
+        assert db.check_in_batch([("HERMAN YEH", "2025-07-02 08:00:00"), ("ANNA LEE", "2025-07-02 09:00:00"),
+                                  ("HERMAN YEH", "2025-07-03 08:00:00")]) == [True, True, True]
+
+        days = run_analytics(db, 'attendance-rate', "2025-07-01", "2025-07-05", window=2)
+        assert [(d['date'], d['present'], d['rate']) for d in days] == [
+            ("2025-07-01", 0, 0.0), ("2025-07-02", 2, 100.0), ("2025-07-03", 1, 50.0),
+            ("2025-07-04", 0, 0.0), ("2025-07-05", 0, 0.0)]
+        assert [d['rolling_rate'] for d in days] == [0.0, 50.0, 75.0, 25.0, 0.0]
+
+        # A range without check-ins is all zeros, no range is the days with data
+        empty = run_analytics(db, 'attendance-rate', "2025-08-01", "2025-08-03")
+        assert [(d['date'], d['present']) for d in empty] == [
+            ("2025-08-01", 0), ("2025-08-02", 0), ("2025-08-03", 0)]
+        assert [d['date'] for d in run_analytics(db, 'attendance-rate')] == ["2025-07-02", "2025-07-03"]
+        assert run_analytics(db, 'attendance-rate', "2025-07-05", "2025-07-01") == []
+        db.close()
+
+if __name__ == "__main__":
+    test_attendance_rate_covers_the_requested_range()
+    print("✓ Attendance rate covers the requested range")
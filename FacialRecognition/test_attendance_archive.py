@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for archiving closed months into per-month partition databases
+"""
+
+import os
+import tempfile
+from datetime import date
+from attendance_database import AttendanceDatabase
+from attendance_merge import AttendanceMerger
+
+def report_rows(db, *args, **kwargs):
+    """(name, date, check_in_time, check_out_time, total_hours) of a report, in report order"""
+    return [(r['name'], r['date'], r['check_in_time'], r['check_out_time'], r['total_hours'])
+            for r in db.get_attendance_report(*args, **kwargs)]
+
+def test_archived_months_are_read_back_transparently():
+    """Reports and summaries are the same before and after closed months move to their own files"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        today = date.today().isoformat()
+        assert db.check_in_batch([
+            ("HERMAN YEH", "2025-06-30 08:00:00"), ("ANNA LEE", "2025-06-30 09:00:00"),
+            ("HERMAN YEH", "2025-07-01 08:30:00"), ("ANNA LEE", "2025-07-31 08:45:00"),
+            ("HERMAN YEH", f"{today} 08:00:00"),
+        ]) == [True] * 5
+        assert db.check_out_batch([("HERMAN YEH", "2025-06-30 17:00:00"),
+                                   ("ANNA LEE", "2025-07-31 17:45:00")]) == [True, True]
+        before = report_rows(db)
+        july = report_rows(db, "2025-07-01", "2025-07-31")
+        june_summary = db.get_daily_summary("2025-06-30")
+
+        assert db.archive_months(keep_months=1, archive_dir="archive") == 4
+        partitions = db.get_archive_partitions()
+        assert [(p['month'], p['path'], p['row_count']) for p in partitions] == [
+            ("2025-06", os.path.join("archive", "attendance_2025_06.db"), 2),
+            ("2025-07", os.path.join("archive", "attendance_2025_07.db"), 2)]
+        assert all(os.path.exists(os.path.join(temp_dir, p['path'])) for p in partitions)
+        db.cursor.execute('SELECT date FROM attendance')
+        assert db.cursor.fetchall() == [(today,)]
+
+        # Reports span the live table and the partitions in the same order as before
+        assert report_rows(db) == before
+        assert report_rows(db, "2025-07-01", "2025-07-31") == july
+        assert report_rows(db, employee_name="ANNA LEE") == [row for row in before if row[0] == "ANNA LEE"]
+        assert db.count_attendance() == 5
+        assert db.get_daily_summary("2025-06-30") == june_summary
+
+        # Archiving again finds nothing left to move
+        assert db.archive_months(keep_months=1, archive_dir="archive") == 0
+        db.close()
+
+def test_reimporting_an_archived_month_adds_nothing():
+    """Late writes for an archived month are dropped instead of counted twice"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        path = os.path.join(temp_dir, "20250715_register_log.csv")
+        with open(path, 'w') as f:
+            f.write('Name, Datetime\nHERMAN YEH,2025/15/07, 08:00:00\nANNA LEE,2025/15/07, 09:00:00')
+        assert db.import_csv_files([path]) == 2
+        assert db.archive_months(keep_months=1, archive_dir="archive") == 2
+
+        # The same log again, plus someone new on the archived day
+        with open(path, 'w') as f:
+            f.write('Name, Datetime\nHERMAN YEH,2025/15/07, 07:00:00\nANNA LEE,2025/15/07, 09:00:00'
+                    '\nNEW PERSON,2025/15/07, 10:00:00')
+        assert db.import_csv_files([path]) == 0
+
+        # Kiosk merges and batch check-ins cannot reopen the month either
+        kiosk = AttendanceDatabase(os.path.join(temp_dir, "kiosk.db"))
+        assert kiosk.check_in_batch([("HERMAN YEH", "2025-07-15 06:00:00")]) == [True]
+        kiosk.close()
+        assert AttendanceMerger(db).merge_source(os.path.join(temp_dir, "kiosk.db"))['rows_merged'] == 0
+        assert db.check_in_batch([("HERMAN YEH", "2025-07-15 06:00:00")]) == [False]
+        results = db.record_attendance_batch('check_in', [{'name': 'HERMAN YEH', 'time': '2025-07-15 06:00:00'}])
+        assert results[0]['success'] is False and 'archived' in results[0]['message']
+
+        db.cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = '2025-07-15'")
+        assert db.cursor.fetchone()[0] == 0
+        records = db.get_attendance_report(start_date="2025-07-15", end_date="2025-07-15")
+        assert sorted((r['name'], r['check_in_time']) for r in records) == [
+            ("ANNA LEE", "2025-07-15 09:00:00"), ("HERMAN YEH", "2025-07-15 08:00:00")]
+        assert db.get_daily_summary("2025-07-15")['present_employees'] == 2
+
+        # The current month stays open
+        today = date.today().isoformat()
+        assert db.check_in_batch([("HERMAN YEH", f"{today} 08:00:00")]) == [True]
+        db.close()
+
+if __name__ == "__main__":
+    test_archived_months_are_read_back_transparently()
+    print("✓ Archived months are read back transparently")
+    test_reimporting_an_archived_month_adds_nothing()
+    print("✓ Re-importing an archived month adds nothing")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the async (ASGI) front end of the attendance API
+"""
+
+import os
+import asyncio
+import tempfile
+import threading
+import time
+import attendance_web_server as web
+from attendance_asgi import AttendanceAPI
+
+def test_asgi_serves_idle_viewers_without_threads():
+    """Thousands of idle /api/events viewers cost no threads; JSON matches the Flask app"""
+    async def call(api, method, path, body=b'', headers=()):
+        """One request through the ASGI app; returns (status, headers, body)"""
+        messages = [{'type': 'http.request', 'body': body}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else await asyncio.Future()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+                 'headers': [(b'content-type', b'application/json'), *headers]}
+        await api(scope, receive, send)
+        return sent[0]['status'], dict(sent[0]['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+    async def viewer(api, received, disconnect):
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            received.append(message.get('body', b''))
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/events', 'query_string': b'', 'headers': []}
+        await api(scope, receive, send)
+
+    async def scenario(api, flask_client):
+        viewers = 2000
+        threads_before = threading.active_count()
+        disconnect = asyncio.Event()
+        streams = [[] for _ in range(viewers)]
+        tasks = [asyncio.ensure_future(viewer(api, received, disconnect)) for received in streams]
+        while api.stats['open_streams'] < viewers:
+            await asyncio.sleep(0.01)
+        assert threading.active_count() - threads_before < 40
+
+        status, _, body = await call(api, 'POST', '/api/check_in', b'{"name": "Async User"}')
+        assert status == 200 and b'"success":true' in body
+        # A repeat check-in is refused the same way by both
+        _, _, body = await call(api, 'POST', '/api/check_in', b'{"name": "Async User"}')
+        assert body == flask_client.post('/api/check_in', json={'name': 'Async User'}).data
+
+        deadline = time.time() + 10
+        while time.time() < deadline and not all(b'Async User' in b''.join(s) for s in streams):
+            await asyncio.sleep(0.05)
+        assert all(b'event: check_in' in b''.join(s) for s in streams)
+
+        # Cached endpoints answer with the Flask app's bytes and honour ETags
+        status, headers, body = await call(api, 'GET', '/api/summary')
+        assert status == 200 and body == flask_client.get('/api/summary').data
+        status, _, _ = await call(api, 'GET', '/api/summary', headers=[(b'if-none-match', headers[b'etag'])])
+        assert status == 304
+
+        # Everything else is served by the Flask app
+        status, _, body = await call(api, 'GET', '/api/attendance')
+        assert status == 200 and body == flask_client.get('/api/attendance').data
+
+        status, _, body = await call(api, 'POST', '/api/check_out/batch', b'{"events": []}')
+        response = flask_client.post('/api/check_out/batch', json={'events': []})
+        assert (status, body) == (response.status_code, response.data)
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        assert api.stats['open_streams'] == 0
+        assert web.attendance_feed.broker.get_stats()['subscribers'] == 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        web.reset_worker_state()
+        web.db_path = os.path.join(temp_dir, "attendance.db")
+        web.publish_snapshot = False
+        api = AttendanceAPI(db_threads=4, heartbeat=0.5)
+        try:
+            asyncio.run(scenario(api, web.app.test_client()))
+        finally:
+            api.close()
+
+if __name__ == "__main__":
+    test_asgi_serves_idle_viewers_without_threads()
+    print("✓ ASGI serves idle viewers without threads")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for batch check-ins and check-outs with idempotency keys
+"""
+
+import os
+import tempfile
+import threading
+from attendance_database import AttendanceDatabase
+
+def test_concurrent_batch_replays_apply_once():
+    """The same batch replayed by several clients at once applies each event exactly once"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "attendance.db")
+        check_ins = [{'name': f"Person {i}", 'time': f"2025-07-04 08:{i:02d}:00", 'idempotency_key': f"in-{i}"}
+                     for i in range(50)]
+        check_ins.append({'name': "", 'idempotency_key': "bad"})
+        AttendanceDatabase(path).close()
+
+        results = []
+        def client():
+            db = AttendanceDatabase(path, timeout=10.0)
+            results.append(db.record_attendance_batch('check_in', check_ins))
+            db.close()
+
+        clients = [threading.Thread(target=client) for _ in range(4)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+
+        assert len(results) == 4 and None not in results
+        applied = sum(1 for batch in results for r in batch if r['success'] and not r.get('duplicate'))
+        duplicates = sum(1 for batch in results for r in batch if r.get('duplicate'))
+        assert applied == 50 and duplicates == 150
+        assert all(batch[-1] == {'name': '', 'time': batch[-1]['time'], 'idempotency_key': 'bad',
+                                 'success': False, 'message': 'Name is required'} for batch in results)
+
+        db = AttendanceDatabase(path)
+        # A key already used keeps its original result even if the event differs
+        retry = db.record_attendance_batch('check_in', [{'name': "Person 0", 'time': "2025-07-04 07:00:00",
+                                                         'idempotency_key': "in-0"}])
+        assert retry[0]['success'] and retry[0]['duplicate']
+        check_outs = db.record_attendance_batch('check_out', [
+            {'name': "Person 1", 'time': "2025-07-04 17:01:00"},
+            {'name': "Nobody", 'time': "2025-07-04 17:00:00"},
+            {'name': "Person 2", 'time': "17:00"}])
+        assert [r['success'] for r in check_outs] == [True, False, False]
+
+        records = {r['name']: r for r in db.get_attendance_report("2025-07-04", "2025-07-04")}
+        assert len(records) == 50
+        assert records["Person 0"]['check_in_time'] == "2025-07-04 08:00:00"
+        assert records["Person 1"]['total_hours'] == 9.0
+        db.close()
+
+if __name__ == "__main__":
+    test_concurrent_batch_replays_apply_once()
+    print("✓ Concurrent batch replays apply once")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Tests for AttendanceDatabase schema migrations, trigger-maintained tables and streamed reports
+"""
+
+import io
+import csv
+import os
+import sqlite3
+import tempfile
+from attendance_database import AttendanceDatabase, MIGRATIONS
+
+# The schema attendance.db had before the migration runner (user_version 0)
+BASELINE_SCHEMA = [
+    '''
+    CREATE TABLE attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        check_in_time TEXT,
+        check_out_time TEXT,
+        total_hours REAL,
+        status TEXT DEFAULT 'present',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        employee_id TEXT UNIQUE,
+        department TEXT,
+        position TEXT,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX idx_attendance_name_date ON attendance(name, date)',
+]
+
+def test_baseline_database_upgrades_and_merges_duplicates():
+    """A baseline attendance.db with duplicate (name, date) rows migrates to the latest schema"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "attendance.db")
+        conn = sqlite3.connect(path)
+        for statement in BASELINE_SCHEMA:
+            conn.execute(statement)
+        conn.executemany('''
+            INSERT INTO attendance (name, date, check_in_time, check_out_time, total_hours)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            # Three rows for one day: a re-check-in after lunch and a stray one without check-out
+            ("HERMAN YEH", "2025-07-04", "2025-07-04 08:10:00", "2025-07-04 12:00:00", 3.83),
+            ("HERMAN YEH", "2025-07-04", "2025-07-04 07:55:00", None, None),
+            ("HERMAN YEH", "2025-07-04", "2025-07-04 13:00:00", "2025-07-04 17:30:00", 4.5),
+            ("HERMAN YEH", "2025-07-05", "2025-07-05 08:00:00", None, None),
+            ("ANNA LEE", "2025-07-04", "2025-07-04 09:00:00", "2025-07-04 17:00:00", 8.0),
+        ])
+        conn.execute("INSERT INTO employees (name) VALUES ('HERMAN YEH'), ('ANNA LEE')")
+        conn.commit()
+        conn.close()
+
+        db = AttendanceDatabase(path)
+        assert db.initialized
+        db.cursor.execute('PRAGMA user_version')
+        assert db.cursor.fetchone()[0] == MIGRATIONS[-1][0]
+
+        db.cursor.execute('''
+            SELECT id, name, date, check_in_time, check_out_time, total_hours, day_number, check_in_ts
+            FROM attendance ORDER BY name, date
+        ''')
+        rows = db.cursor.fetchall()
+        assert [row[1:5] for row in rows] == [
+            ("ANNA LEE", "2025-07-04", "2025-07-04 09:00:00", "2025-07-04 17:00:00"),
+            ("HERMAN YEH", "2025-07-04", "2025-07-04 07:55:00", "2025-07-04 17:30:00"),
+            ("HERMAN YEH", "2025-07-05", "2025-07-05 08:00:00", None),
+        ], rows
+        # The oldest row of the group is the one kept, with hours from the merged times
+        assert rows[1][0] == 1
+        assert abs(rows[1][5] - (9 + 35 / 60)) < 1e-9
+        assert rows[0][5] == 8.0 and rows[2][5] is None
+        assert all(row[6] is not None and row[7] is not None for row in rows)
+
+        # (name, date) is now unique
+        db.cursor.execute("PRAGMA index_list(attendance)")
+        unique = {row[1] for row in db.cursor.fetchall() if row[2]}
+        assert 'idx_attendance_name_date_unique' in unique
+        try:
+            db.cursor.execute("INSERT INTO attendance (name, date) VALUES ('ANNA LEE', '2025-07-04')")
+            assert False, "duplicate (name, date) was inserted"
+        except sqlite3.IntegrityError:
+            pass
+        assert db.check_in_batch([("HERMAN YEH", "2025-07-04 06:00:00")]) == [False]
+
+        # Summaries are built from the merged rows
+        assert db.get_daily_summary("2025-07-04")['present_employees'] == 2
+        db.close()
+
+        # Opening it again runs no migration and changes nothing
+        db = AttendanceDatabase(path)
+        assert len(db.get_attendance_report()) == 3
+        db.close()
+
+def summary_tables(db):
+    """daily_summary rows that count anything, and employee_stats, rounded for comparison"""
+    db.cursor.execute('''
+        SELECT date, present_employees, ROUND(hours_total, 9), hours_count FROM daily_summary
+        WHERE present_employees != 0 OR hours_count != 0 ORDER BY date
+    ''')
+    days = db.cursor.fetchall()
+    db.cursor.execute('SELECT active_employees FROM employee_stats')
+    return days, db.cursor.fetchall()
+
+def test_summary_triggers_match_a_rebuild():
+    """After check-ins, check-outs, upserts, edits and deletes the triggers agree with a rebuild"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        for name in ("HERMAN YEH", "ANNA LEE", "BILL GATES", "ELON MUSK"):
+            db.add_employee(name)
+
+        assert db.check_in_batch([
+            ("HERMAN YEH", "2025-07-04 08:00:00"), ("ANNA LEE", "2025-07-04 09:00:00"),
+            ("BILL GATES", "2025-07-04 10:00:00"), ("HERMAN YEH", "2025-07-05 08:30:00"),
+            ("ANNA LEE", "2025-07-05 08:45:00"),
+        ]) == [True] * 5
+        # A second check-in is a no-op, a second check-out moves the first one later
+        assert db.check_in_batch([("HERMAN YEH", "2025-07-04 07:00:00")]) == [False]
+        assert db.check_out_batch([
+            ("HERMAN YEH", "2025-07-04 12:00:00"), ("HERMAN YEH", "2025-07-04 17:00:00"),
+            ("ANNA LEE", "2025-07-04 17:30:00"), ("HERMAN YEH", "2025-07-05 16:00:00"),
+        ]) == [True] * 4
+
+        # An import only adds days that are missing; compaction upserts earlier check-ins and check-outs
+        log_path = os.path.join(temp_dir, "20250704_register_log.csv")
+        with open(log_path, 'w') as f:
+            f.write('Name, Datetime\nANNA LEE,2025/04/07, 08:15:00\nELON MUSK,2025/04/07, 11:00:00')
+        assert db.import_csv_files([log_path]) == 1
+        db.append_recognition_events([
+            ("ANNA LEE", "2025-07-04 08:15:00", None), ("BILL GATES", "2025-07-04 18:00:00", None),
+            ("BILL GATES", "2025-07-06 09:00:00", None), ("BILL GATES", "2025-07-06 17:00:00", None),
+        ])
+        stats = db.compact_recognition_events(sightings_check_out=True)
+        assert (stats['check_ins'], stats['check_outs']) == (2, 2), stats
+
+        # Direct edits and deletes
+        with db.transaction() as cursor:
+            cursor.execute("UPDATE attendance SET date = '2025-07-06' WHERE name = 'ANNA LEE' AND date = '2025-07-05'")
+            cursor.execute("UPDATE attendance SET name = 'ELON MUSK' WHERE name = 'BILL GATES' AND date = '2025-07-06'")
+            cursor.execute('''
+                UPDATE attendance SET total_hours = NULL, check_out_time = NULL
+                WHERE name = 'ANNA LEE' AND date = '2025-07-04'
+            ''')
+            cursor.execute("DELETE FROM attendance WHERE name = 'HERMAN YEH' AND date = '2025-07-05'")
+            cursor.execute("DELETE FROM attendance WHERE name = 'BILL GATES'")
+            cursor.execute("UPDATE employees SET is_active = 0 WHERE name = 'BILL GATES'")
+            cursor.execute("DELETE FROM employees WHERE name = 'ELON MUSK'")
+
+        maintained = summary_tables(db)
+        assert maintained[0] and maintained[1] == [(2,)], maintained
+        assert db.rebuild_daily_summary()
+        assert summary_tables(db) == maintained, (maintained, summary_tables(db))
+        db.close()
+
+def fill_days(db, people=5, days=5):
+    """Check everyone in on each of the first days of July 2025, and out on even days"""
+    check_ins = [(f"Person {p}", f"2025-07-{d:02d} 08:{p:02d}:00") for d in range(1, days + 1) for p in range(people)]
+    check_outs = [(f"Person {p}", f"2025-07-{d:02d} 17:00:00") for d in range(2, days + 1, 2) for p in range(people)]
+    assert db.check_in_batch(check_ins) == [True] * len(check_ins)
+    assert db.check_out_batch(check_outs) == [True] * len(check_outs)
+
+def test_streamed_csv_matches_the_report():
+    """The CSV export comes out one chunk per batch and holds exactly the report rows"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        fill_days(db)
+        records = db.get_attendance_report()
+        assert len(records) == 25
+
+        chunks = list(db.iter_attendance_csv(batch_size=4))
+        assert len(chunks) == 25 // 4 + 1
+        rows = list(csv.reader(io.StringIO(''.join(chunks))))
+        assert rows[0] == ['Name', 'Date', 'Check In Time', 'Check Out Time', 'Total Hours', 'Status']
+        assert rows[1:] == [[r['name'], r['date'], r['check_in_time'], r['check_out_time'] or '',
+                             str(r['total_hours'] or ''), r['status']] for r in records]
+
+        # Filters and batch size do not change what is streamed
+        assert list(db.iter_attendance_report("2025-07-02", "2025-07-03", batch_size=3)) == \
+            db.get_attendance_report("2025-07-02", "2025-07-03")
+        db.close()
+
+def test_error_mid_stream_is_raised():
+    """A database error part-way through stops the stream with the error instead of a short result"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        fill_days(db)
+        query_report = db._query_report
+
+        def failing_query(*args, **kwargs):
+            for i, row in enumerate(query_report(*args, **kwargs)):
+                if i == 10:
+                    raise sqlite3.OperationalError('disk I/O error')
+                yield row
+
+        db._query_report = failing_query
+        chunks = []
+        try:
+            for chunk in db.iter_attendance_csv(batch_size=4):
+                chunks.append(chunk)
+            assert False, "the export ended without the error"
+        except sqlite3.OperationalError:
+            pass
+        assert len(chunks) == 2
+        # List helpers keep returning an empty result on error
+        assert db.get_attendance_report() == []
+        assert not db.export_to_csv(os.path.join(temp_dir, "export.csv"))
+        db.close()
+
+if __name__ == "__main__":
+    test_baseline_database_upgrades_and_merges_duplicates()
+    print("✓ Baseline database upgrades and merges duplicates")
+    test_summary_triggers_match_a_rebuild()
+    print("✓ Summary triggers match a rebuild")
+    test_streamed_csv_matches_the_report()
+    print("✓ Streamed CSV matches the report")
+    test_error_mid_stream_is_raised()
+    print("✓ Error mid-stream is raised")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for AttendanceFeed and the live update EventBroker
+"""
+
+import os
+import tempfile
+import time
+from attendance_database import AttendanceDatabase
+from event_broker import EventBroker, HEARTBEAT
+from attendance_feed import AttendanceFeed
+
+def test_attendance_feed_publishes_each_write_once():
+    """Local and other-process writes reach live viewers once; slow viewers are told to resync"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "attendance.db")
+        web_db = AttendanceDatabase(path)
+        kiosk_db = AttendanceDatabase(path)
+        broker = EventBroker(buffer_size=4, heartbeat=0.05)
+        feed = AttendanceFeed(web_db, broker, poll_interval=0.01)
+        feed.start()
+
+        viewer = broker.subscribe()
+        stream = viewer.stream()
+        assert next(stream).startswith("retry:")
+        assert "event: summary" in next(stream)
+        assert next(stream) == HEARTBEAT
+
+        # Seen by the write listener and again by the watcher, published once
+        web_db.check_in("Web User")
+        kiosk_db.check_in("Kiosk User")
+        kiosk_db.check_out("Kiosk User")
+
+        received = []
+        deadline = time.time() + 5
+        while time.time() < deadline and sum("event: check_" in m for m in received) < 3:
+            received.append(next(stream))
+        events = [m for m in received if "event: check_" in m]
+        assert len(events) == 3, received
+        assert "Web User" in events[0]
+        assert "check_in" in events[1] and "Kiosk User" in events[1]
+        assert "check_out" in events[2] and "Kiosk User" in events[2]
+        assert feed.stats['local'] == 1 and feed.stats['remote'] == 2
+
+        # A viewer that stops reading keeps only the newest events
+        slow = broker.subscribe()
+        for i in range(10):
+            broker.publish("check_in", {"name": f"Burst {i}"})
+        assert "event: resync" in slow.get(0)
+        assert slow.dropped > 0
+
+        stream.close()
+        assert viewer not in broker._subscribers
+        feed.stop()
+        web_db.close()
+        kiosk_db.close()
+
+if __name__ == "__main__":
+    test_attendance_feed_publishes_each_write_once()
+    print("✓ Attendance feed publishes each write once")
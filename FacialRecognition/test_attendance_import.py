@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for importing register logs and exports into AttendanceDatabase
+"""
+
+import os
+import tempfile
+from attendance_database import AttendanceDatabase
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def write_log(path, lines):
+    """Write a register log: header without newline, each record starts with one"""
+    with open(path, 'w') as f:
+        f.write('Name, Datetime')
+        for line in lines:
+            f.write(f'\n{line}')
+
+def test_register_log_dates_are_day_before_month():
+    """Register logs hold YYYY/DD/MM, so a day above 12 imports as that day"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        path = os.path.join(temp_dir, "20250715_register_log.csv")
+        write_log(path, [
+            "HERMAN YEH,2025/15/07, 08:01:02",
+            "HERMAN YEH,2025/15/07, 07:59:00",
+            "ANNA LEE,2025/15/07, 09:00:00",
+            "BAD DAY,2025/40/07, 09:00:00",
+            "BAD MONTH,2025/15/13, 09:00:00",
+            "BAD CLOCK,2025/15/07, 25:00:00",
+        ])
+        assert db.import_csv_files([path]) == 2
+
+        records = {r['name']: r for r in db.get_attendance_report()}
+        assert set(records) == {"HERMAN YEH", "ANNA LEE"}
+        assert records["HERMAN YEH"]['date'] == "2025-07-15"
+        assert records["HERMAN YEH"]['check_in_time'] == "2025-07-15 07:59:00"
+        assert db.get_daily_summary("2025-07-15")['present_employees'] == 2
+
+        db.cursor.execute('SELECT COUNT(*) FROM attendance WHERE day_number IS NULL')
+        assert db.cursor.fetchone()[0] == 0
+        db.close()
+
+def test_sample_register_log_imports_its_own_day():
+    """The shipped 20250705 log ("2025/05/07") belongs to 5 July"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        assert db.import_from_csv(os.path.join(HERE, "20250705_register_log.csv"))
+        dates = {r['date'] for r in db.get_attendance_report()}
+        assert dates == {"2025-07-05"}, dates
+        db.close()
+
+if __name__ == "__main__":
+    test_register_log_dates_are_day_before_month()
+    print("✓ Register log dates are day before month")
+    test_sample_register_log_imports_its_own_day()
+    print("✓ Sample register log imports its own day")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for merging kiosk databases with AttendanceMerger
+"""
+
+import os
+import tempfile
+from attendance_database import AttendanceDatabase
+from attendance_merge import AttendanceMerger
+
+def make_kiosk(path, check_ins, check_outs=()):
+    """A kiosk database with the given (name, time) check-ins and check-outs"""
+    kiosk = AttendanceDatabase(path)
+    assert kiosk.check_in_batch(list(check_ins)) == [True] * len(check_ins)
+    if check_outs:
+        assert kiosk.check_out_batch(list(check_outs)) == [True] * len(check_outs)
+    return kiosk
+
+def merged_rows(db):
+    """(name, date) -> (check_in_time, check_out_time, total_hours) of the target"""
+    db.cursor.execute('SELECT name, date, check_in_time, check_out_time, total_hours FROM attendance')
+    return {(row[0], row[1]): row[2:] for row in db.cursor.fetchall()}
+
+def test_incremental_merge_reconciles_kiosks():
+    """Second runs read only changed rows; days keep the earliest check-in and latest check-out"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        east_path = os.path.join(temp_dir, "east.db")
+        west_path = os.path.join(temp_dir, "west.db")
+        east = make_kiosk(east_path,
+                          [("HERMAN YEH", "2025-07-04 08:00:00"), ("ANNA LEE", "2025-07-04 09:00:00")],
+                          [("HERMAN YEH", "2025-07-04 12:00:00")])
+        west = make_kiosk(west_path,
+                          [("HERMAN YEH", "2025-07-04 08:30:00"), ("ANNA LEE", "2025-07-04 08:45:00")],
+                          [("HERMAN YEH", "2025-07-04 17:00:00")])
+
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        merger = AttendanceMerger(db)
+        first = merger.merge([east_path, west_path])
+        assert [(r['incremental'], r['rows_scanned']) for r in first] == [(True, 2), (True, 2)]
+        assert [r['rows_merged'] for r in first] == [2, 2]
+        rows = merged_rows(db)
+        assert rows[("HERMAN YEH", "2025-07-04")] == ("2025-07-04 08:00:00", "2025-07-04 17:00:00", 9.0)
+        assert rows[("ANNA LEE", "2025-07-04")] == ("2025-07-04 08:45:00", None, None)
+
+        # Nothing changed on the kiosks: nothing is read or written
+        again = merger.merge([east_path, west_path])
+        assert [(r['rows_scanned'], r['rows_merged']) for r in again] == [(0, 0), (0, 0)]
+
+        # One check-out and one new check-in on east: only those two rows are read
+        assert east.check_out_batch([("ANNA LEE", "2025-07-04 18:00:00")]) == [True]
+        assert east.check_in_batch([("BILL GATES", "2025-07-05 10:00:00")]) == [True]
+        # A later check-in on west loses to the merged earlier one
+        assert west.check_in_batch([("BILL GATES", "2025-07-05 10:30:00")]) == [True]
+        third = merger.merge([east_path, west_path])
+        assert [(r['rows_scanned'], r['rows_merged']) for r in third] == [(2, 2), (1, 0)], third
+        rows = merged_rows(db)
+        assert rows[("ANNA LEE", "2025-07-04")] == ("2025-07-04 08:45:00", "2025-07-04 18:00:00", 9.25)
+        assert rows[("BILL GATES", "2025-07-05")] == ("2025-07-05 10:00:00", None, None)
+        assert len(rows) == 3
+
+        # Re-merging everything from scratch changes nothing either
+        full = merger.merge([east_path, west_path], full=True)
+        assert [(r['incremental'], r['rows_merged']) for r in full] == [(False, 0), (False, 0)]
+        assert merged_rows(db) == rows
+
+        east.close()
+        west.close()
+        db.close()
+
+if __name__ == "__main__":
+    test_incremental_merge_reconciles_kiosks()
+    print("✓ Incremental merge reconciles kiosks")
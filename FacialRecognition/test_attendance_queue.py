@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for AttendanceEventQueue: events that cannot be written must not block the rest
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+import time
+from attendance_database import AttendanceDatabase
+from attendance_queue import AttendanceEventQueue
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_bad_event_is_dead_lettered_without_blocking_the_batch():
+    """An event that fails on its own goes to the dead-letter file; the others commit"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        results = []
+        events = AttendanceEventQueue(db, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                                      on_result=lambda name, ok: results.append((name, ok)))
+        events.start()
+        events.check_in("HERMAN YEH", "2025-07-04 08:00:00")
+        events.check_in(None, "2025-07-04 08:01:00")  # violates NOT NULL on every retry
+        events.check_in("ANNA LEE", "2025-07-04 08:02:00")
+        assert wait_for(lambda: events.pending() == 0)
+        events.stop()
+
+        assert sorted(r['name'] for r in db.get_attendance_report()) == ["ANNA LEE", "HERMAN YEH"]
+        dead = read_lines(events.dead_letter_path)
+        assert [(e['name'], e['time']) for e in dead] == [(None, "2025-07-04 08:01:00")]
+        assert 'NOT NULL' in dead[0]['error']
+        assert events.stats['dead_lettered'] == 1 and events.stats['retries'] == 0
+        assert (None, False) in results and ("ANNA LEE", True) in results
+        assert os.path.getsize(events.spool_path) == 0
+        db.close()
+
+def test_locked_database_retries_are_capped():
+    """A batch locked out past max_retries is dead-lettered instead of retried forever"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"), timeout=0.05)
+        locker = sqlite3.connect(db.db_path)
+        locker.execute('BEGIN IMMEDIATE')
+
+        events = AttendanceEventQueue(db, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                                      retry_delay=0.01, max_retries=3)
+        events.start()
+        events.check_in("HERMAN YEH", "2025-07-04 08:00:00")
+        assert wait_for(lambda: events.pending() == 0)
+
+        # Once the lock is gone new events go straight through
+        locker.rollback()
+        locker.close()
+        events.check_in("ANNA LEE", "2025-07-04 08:02:00")
+        assert wait_for(lambda: events.pending() == 0)
+        events.stop()
+
+        assert events.stats['retries'] == 4
+        dead = read_lines(events.dead_letter_path)
+        assert [e['name'] for e in dead] == ["HERMAN YEH"] and 'locked' in dead[0]['error']
+        assert [r['name'] for r in db.get_attendance_report()] == ["ANNA LEE"]
+        db.close()
+
+if __name__ == "__main__":
+    test_bad_event_is_dead_lettered_without_blocking_the_batch()
+    print("✓ Bad event is dead-lettered without blocking the batch")
+    test_locked_database_retries_are_capped()
+    print("✓ Locked database retries are capped")
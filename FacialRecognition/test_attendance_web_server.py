@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the attendance web server's JSON API
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+import attendance_web
+import attendance_web_server as web
+from attendance_database import AttendanceDatabase, encode_cursor
+from reporting_snapshot import ReportingSnapshot
+
+def make_client(temp_dir):
+    """A test client on a fresh database, reading reports from the live database"""
+    web.reset_worker_state()
+    web.db_path = os.path.join(temp_dir, "attendance.db")
+    web.publish_snapshot = False
+    return web.app.test_client()
+
+def test_attendance_api_rejects_bad_dates_and_cursors():
+    """Bad filters answer 400 with a message instead of an empty 200"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = make_client(temp_dir)
+        try:
+            for i in range(3):
+                web.get_db().check_in(f"Employee {i}", f"2025-07-0{i + 1} 08:00:00")
+
+            page = client.get('/api/attendance?limit=2')
+            assert page.status_code == 200 and len(page.get_json()['records']) == 2
+            next_page = client.get(f"/api/attendance?cursor={page.get_json()['next_cursor']}&limit=2")
+            assert next_page.status_code == 200 and len(next_page.get_json()['records']) == 1
+
+            for query in ('start_date=2025-13-01', 'end_date=yesterday', 'start_date=2025-02-30&limit=5',
+                          'cursor=not-a-cursor', f"cursor={encode_cursor([1, 2])}",
+                          f"cursor={encode_cursor([{'day': 1}, 'x', 3])}"):
+                response = client.get(f'/api/attendance?{query}')
+                body = response.get_json()
+                assert response.status_code == 400, (query, response.status_code)
+                assert body['success'] is False and body['message'], query
+
+            response = client.get('/api/analytics/arrivals?start_date=2025-7-1')
+            assert response.status_code == 400
+
+            # The report page and CSV export reject them too, rather than showing everything
+            response = client.get('/reports?start_date=2025-13-01')
+            assert response.status_code == 302 and response.headers['Location'].endswith('/reports')
+            page = client.get('/reports?start_date=2025-13-01', follow_redirects=True)
+            assert b'start_date must be a date as YYYY-MM-DD' in page.data
+            response = client.get('/reports/export.csv?end_date=2025-02-30')
+            assert response.status_code == 400 and response.get_json()['success'] is False
+            assert client.get('/reports/export.csv?start_date=2025-07-01').data.count(b'\n') == 4
+        finally:
+            web.shutdown()
+
+def test_both_web_apps_answer_the_api_alike():
+    """attendance_web.py and attendance_web_server.py share their API handling"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = make_client(temp_dir)
+        attendance_web.db = AttendanceDatabase(os.path.join(temp_dir, "simple.db"))
+        attendance_web.snapshot = ReportingSnapshot(attendance_web.db.db_path)  # not published: reads the live database
+        simple = attendance_web.app.test_client()
+        try:
+            requests = [
+                ('/api/check_in', {'name': 'Shared User'}),
+                ('/api/check_in', {'name': 'Shared User'}),
+                ('/api/check_in', {'name': 42}),
+                ('/api/check_in', ['not', 'an', 'object']),
+                ('/api/check_in/batch', {'events': [{'name': 'Batch User', 'time': '2025-07-04 08:00:00'}]}),
+                ('/api/check_out/batch', {'events': 'not a list'}),
+                ('/api/check_out/batch', [{'name': 'Batch User', 'time': '2025-07-04 17:00:00',
+                                           'idempotency_key': 'k1'}] * 2),
+            ]
+            for path, body in requests:
+                expected = client.post(path, json=body)
+                actual = simple.post(path, json=body)
+                assert (actual.status_code, actual.get_json()) == (expected.status_code, expected.get_json()), path
+
+            query = '/reports/export.csv?employee=Batch User'
+            assert simple.get(query).data == client.get(query).data
+
+            for query in ('limit=1', 'format=ndjson', 'columns=name,date&sort=oldest',
+                          'start_date=2025-13-01', 'limit=0'):
+                expected = client.get(f'/api/attendance?{query}')
+                actual = simple.get(f'/api/attendance?{query}')
+                assert (actual.status_code, actual.data) == (expected.status_code, expected.data), query
+            assert simple.get('/reports/export.csv?start_date=bad').status_code == 400
+        finally:
+            attendance_web.db.close()
+            attendance_web.db = None
+            attendance_web.snapshot = None
+            web.shutdown()
+
+def test_streamed_responses_hold_the_whole_report():
+    """JSON, NDJSON and CSV streams carry every record, and a failing stream is not passed off as complete"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = make_client(temp_dir)
+        try:
+            db = web.get_db()
+            events = [(f"Employee {i}", f"2025-07-{1 + i % 5:02d} 08:{i:02d}:00") for i in range(30)]
+            assert db.check_in_batch(events) == [True] * 30
+            records = db.get_attendance_report()
+
+            assert json.loads(client.get('/api/attendance').data) == records
+            lines = client.get('/api/attendance?format=ndjson').data.decode().splitlines()
+            assert [json.loads(line) for line in lines] == records
+            assert client.get('/reports/export.csv').data.decode() == ''.join(db.iter_attendance_csv())
+
+            query_report = db._query_report
+
+            def failing_query(*args, **kwargs):
+                for i, row in enumerate(query_report(*args, **kwargs)):
+                    if i == 5:
+                        raise sqlite3.OperationalError('disk I/O error')
+                    yield row
+
+            db._query_report = failing_query
+            for path in ('/api/attendance', '/api/attendance?format=ndjson', '/reports/export.csv'):
+                try:
+                    client.get(path).data
+                    assert False, f"{path} ended as if complete"
+                except sqlite3.OperationalError:
+                    pass
+        finally:
+            web.shutdown()
+
+if __name__ == "__main__":
+    test_attendance_api_rejects_bad_dates_and_cursors()
+    print("✓ Attendance API rejects bad dates and cursors")
+    test_both_web_apps_answer_the_api_alike()
+    print("✓ Both web apps answer the API alike")
+    test_streamed_responses_hold_the_whole_report()
+    print("✓ Streamed responses hold the whole report")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for resuming an interrupted bulk enrollment
+"""
+
+import os
+import tempfile
+import cv2
+from bulk_enrollment import BulkEnrollment, PROGRESS_FILENAME
+from benchmark_recognition import train_model, build_frames
+from recognition_server import CASCADE_PATH
+
+def make_photos(source, people=2, photos_each=3):
+    """Folders of photos, one face pasted on a background in each"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        faces = train_model(os.path.join(temp_dir, "trainer.yml"), samples=people * photos_each)
+    frames = build_frames(faces, count=people * photos_each)
+    for i, frame in enumerate(frames):
+        folder = os.path.join(source, f"Person {i % people}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"{i}.jpg"), 'wb') as f:
+            f.write(frame)
+
+def dataset_images(dataset):
+    return sorted(name for name in os.listdir(dataset) if name.startswith('User.'))
+
+def test_resume_after_crash_between_checkpoints():
+    """Faces written before a crash are not written again and still get trained"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "photos")
+        dataset = os.path.join(temp_dir, "dataset")
+        trainer = os.path.join(temp_dir, "trainer", "trainer.yml")
+        make_photos(source)
+
+        def enrollment():
+            return BulkEnrollment(source, dataset, trainer, os.path.join(temp_dir, "attendance.db"),
+                                  cascade_path=CASCADE_PATH, workers=1, checkpoint_every=1000)
+
+        # Killed before any checkpoint: images and the journal are on disk, the state file is not
+        crashed = enrollment()
+        crashed.checkpoint = lambda names: None
+        first = crashed.run()
+        written = dataset_images(dataset)
+        assert first['enrolled'] > 0 and len(written) == first['enrolled'], first
+        assert not os.path.exists(crashed.state_path) and not os.path.exists(trainer)
+        assert os.path.exists(os.path.join(dataset, PROGRESS_FILENAME))
+
+        resumed = enrollment()
+        second = resumed.run()
+        assert second['photos'] == 0 and second['skipped'] == 6, second
+        assert dataset_images(dataset) == written
+        assert len(resumed.state) == 6
+        assert not os.path.exists(os.path.join(dataset, PROGRESS_FILENAME))
+
+        # The recovered faces were trained at the resumed run's checkpoint
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(trainer)
+        assert len(recognizer.getHistograms()) == len(written)
+
+def test_no_train_checkpoints_once_per_interval():
+    """Without training, faces are not kept and the state is saved every checkpoint_every faces"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "photos")
+        dataset = os.path.join(temp_dir, "dataset")
+        trainer = os.path.join(temp_dir, "trainer", "trainer.yml")
+        make_photos(source, people=2, photos_each=4)
+
+        enrollment = BulkEnrollment(source, dataset, trainer, os.path.join(temp_dir, "attendance.db"),
+                                    cascade_path=CASCADE_PATH, workers=1, checkpoint_every=2, train=False)
+        saves = []
+        save_state = enrollment.save_state
+        enrollment.save_state = lambda: (saves.append(len(enrollment.state)), save_state())
+        stats = enrollment.run()
+
+        assert stats['enrolled'] >= 4, stats
+        # One save per two faces, plus the final one
+        assert len(saves) == stats['enrolled'] // 2 + 1, saves
+        assert enrollment.pending_faces == [] and enrollment.unsaved_faces == 0
+        assert len(dataset_images(dataset)) == stats['enrolled']
+        assert not os.path.exists(trainer)
+
+if __name__ == "__main__":
+    test_resume_after_crash_between_checkpoints()
+    print("✓ Resume after crash between checkpoints")
+    test_no_train_checkpoints_once_per_interval()
+    print("✓ No-train run checkpoints once per interval")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for AttendanceDatabase
+Checks that readers never block writers and that threads can share one instance
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from attendance_database import AttendanceDatabase
+
+def test_readers_do_not_block_writers():
+    """A long-running read transaction must not delay check-ins"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"), timeout=2.0)
+        db.check_in("Reader Seed", "2025-07-04 08:00:00")
+
+        # Hold a read snapshot open on a separate connection
+        reader = sqlite3.connect(db.db_path)
+        reader.execute('BEGIN')
+        reader.execute('SELECT COUNT(*) FROM attendance').fetchone()
+
+        start = time.time()
+        assert db.check_in("Writer During Read")
+        elapsed = time.time() - start
+
+        # The reader still sees its snapshot while the write is visible to others
+        assert reader.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] == 1
+        reader.rollback()
+        reader.close()
+        assert len(db.get_attendance_report()) == 2
+        assert elapsed < 1.0, f"Writer waited {elapsed:.2f}s behind a reader"
+
+        db.close()
+
+def test_concurrent_readers_and_writers():
+    """Writer, reader and report threads share one instance without errors"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        errors = []
+        writes_per_thread = 50
+        stop_reading = threading.Event()
+        max_write_latency = [0.0]
+
+        def writer(thread_id):
+            for i in range(writes_per_thread):
+                start = time.time()
+                if not db.check_in(f"Employee {thread_id}-{i}"):
+                    errors.append(f"check-in failed for Employee {thread_id}-{i}")
+                max_write_latency[0] = max(max_write_latency[0], time.time() - start)
+
+        def reader():
+            while not stop_reading.is_set():
+                try:
+                    db.get_attendance_report()
+                    db.get_daily_summary()
+                except Exception as e:
+                    errors.append(str(e))
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop_reading.set()
+        for thread in readers:
+            thread.join()
+
+        assert not errors, errors[:5]
+        assert len(db.get_attendance_report()) == 4 * writes_per_thread
+        print(f"Max check-in latency under read load: {max_write_latency[0] * 1000:.1f} ms")
+
+        db.close()
+
+def test_concurrent_check_ins_create_no_duplicates():
+    """Kiosk and web processes checking in the same people race without duplicates"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "attendance.db")
+        names = [f"Employee {i}" for i in range(50)]
+        # Separate instances, as the kiosk and the web server each open their own
+        instances = [AttendanceDatabase(db_path) for _ in range(4)]
+        barrier = threading.Barrier(len(instances))
+        results = {"check_in": [], "check_out": []}
+        errors = []
+
+        def client(db):
+            try:
+                barrier.wait()
+                for name in names:
+                    results["check_in"].append((name, db.check_in(name)))
+                barrier.wait()
+                for name in names:
+                    results["check_out"].append((name, db.check_out(name)))
+            except Exception as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=client, args=(db,)) for db in instances]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, errors[:5]
+        for name in names:
+            # Exactly one client wins each check-in; every check-out finds the row
+            assert sum(ok for n, ok in results["check_in"] if n == name) == 1, name
+            assert all(ok for n, ok in results["check_out"] if n == name), name
+
+        conn = sqlite3.connect(db_path)
+        duplicates = conn.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM attendance GROUP BY name, date HAVING COUNT(*) > 1)'
+        ).fetchone()[0]
+        rows = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+        conn.close()
+        assert duplicates == 0
+        assert rows == len(names)
+
+        for db in instances:
+            db.close()
+
+if __name__ == "__main__":
+    test_readers_do_not_block_writers()
+    print("✓ Readers do not block writers")
+    test_concurrent_readers_and_writers()
+    print("✓ Concurrent readers and writers")
+    test_concurrent_check_ins_create_no_duplicates()
+    print("✓ Concurrent check-ins create no duplicates")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Threshold tests for FaceQualityGate on synthetic crops
+"""
+
+import cv2
+import numpy as np
+from face_quality import FaceQualityGate
+
+def checkerboard(size=128, low=60, high=190, square=8):
+    """A sharp crop: squares of low and high grey"""
+    cells = (np.indices((size, size)) // square).sum(axis=0) % 2
+    return np.where(cells == 1, high, low).astype(np.uint8)
+
+def gradient(size=128):
+    """A crop with full contrast and no edges at all"""
+    return np.tile(np.linspace(0, 255, size), (size, 1)).astype(np.uint8)
+
+def make_gate(**thresholds):
+    return FaceQualityGate(require_eyes=False, **thresholds)
+
+def test_size_threshold():
+    """Crops narrower than min_size are rejected, at min_size they pass"""
+    gate = make_gate(min_size=60)
+    assert gate.check_crop(checkerboard(size=59)) == 'too_small'
+    assert gate.check_crop(checkerboard(size=60)) is None
+    assert gate.check_crop(checkerboard()[:59]) == 'too_small'
+
+def test_brightness_thresholds():
+    """Mean brightness below min_brightness or above max_brightness is rejected"""
+    gate = make_gate(min_brightness=40.0, max_brightness=215.0)
+    assert gate.check_crop(checkerboard(low=0, high=60)) == 'too_dark'         # mean 30
+    assert gate.check_crop(checkerboard(low=20, high=80)) is None              # mean 50
+    assert gate.check_crop(checkerboard(low=180, high=240)) is None            # mean 210
+    assert gate.check_crop(checkerboard(low=200, high=255)) == 'too_bright'    # mean 227.5
+    assert gate.check_crop(checkerboard(low=120, high=140)) == 'low_contrast'  # stddev 10
+
+def test_blur_threshold():
+    """Crops without edges are blurry, and the cut-off follows min_sharpness"""
+    assert make_gate().check_crop(gradient()) == 'blurry'
+    assert make_gate().check_crop(checkerboard()) is None
+
+    # A softened board passes a lenient gate and fails a strict one
+    soft = cv2.GaussianBlur(checkerboard(), (0, 0), 2.0)
+    sharpness = cv2.Laplacian(soft, cv2.CV_64F).var()
+    assert make_gate(min_sharpness=sharpness * 0.9).check_crop(soft) is None
+    assert make_gate(min_sharpness=sharpness * 1.1).check_crop(soft) == 'blurry'
+
+def test_evaluate_matches_check_crop():
+    """evaluate() gives each box the reason check_crop() gives its crop, and counts them"""
+    frame = np.zeros((200, 400), dtype=np.uint8)
+    frame[0:128, 0:128] = checkerboard()
+    frame[0:128, 200:328] = gradient()
+    boxes = [(0, 0, 128, 128), (200, 0, 128, 128), (0, 150, 40, 40)]
+    gate = make_gate()
+    assert gate.evaluate(frame, boxes) == [None, 'blurry', 'too_small']
+    assert gate.filter_faces(frame, boxes) == [boxes[0]]
+    assert gate.get_stats()['rejections']['blurry'] == 2
+    assert gate.evaluate(frame, []) == []
+
+if __name__ == "__main__":
+    test_size_threshold()
+    print("✓ Size threshold")
+    test_brightness_thresholds()
+    print("✓ Brightness thresholds")
+    test_blur_threshold()
+    print("✓ Blur threshold")
+    test_evaluate_matches_check_crop()
+    print("✓ Evaluate matches check_crop")
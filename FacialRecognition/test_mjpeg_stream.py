@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the kiosk's MJPEG camera stream
+"""
+
+import socket
+import threading
+import time
+import numpy as np
+from mjpeg_stream import FrameBroadcaster, MJPEGServer, Viewer, QUALITY_TIERS
+
+def test_camera_stream_encodes_each_frame_once():
+    """Viewers share one encode per frame and tier; publishing costs the kiosk the same for any audience"""
+    broadcaster = FrameBroadcaster(max_fps=30)
+    server = MJPEGServer(broadcaster, host='127.0.0.1', port=0)
+    assert server.start()
+
+    def watch(quality, frames, stop):
+        sock = socket.create_connection(('127.0.0.1', server.port))
+        sock.sendall(f"GET /stream.mjpg?quality={quality}&fps=30 HTTP/1.1\r\nHost: kiosk\r\n\r\n".encode())
+        received = []
+        while not stop.is_set():
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received.append(chunk)
+        sock.close()
+        frames.append((quality, b''.join(received).count(b'Content-Type: image/jpeg')))
+
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    stop = threading.Event()
+    frames = []
+    viewers = [threading.Thread(target=watch, args=(quality, frames, stop))
+               for quality in ['medium'] * 6 + ['low'] * 2]
+    for viewer in viewers:
+        viewer.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and len(broadcaster.get_stats()['viewers']) < len(viewers):
+        time.sleep(0.01)
+
+    slowest = 0.0
+    for i in range(60):
+        frame = frame.copy()
+        frame[:, :, 1] = i
+        start = time.perf_counter()
+        broadcaster.publish(frame)
+        slowest = max(slowest, time.perf_counter() - start)
+        time.sleep(1 / 30)
+
+    stats = broadcaster.get_stats()
+    stop.set()
+    server.stop()
+    for viewer in viewers:
+        viewer.join()
+
+    assert all(count > 0 for _, count in frames), frames
+    # Two tiers in use: at most two encodes per published frame, however many viewers
+    assert stats['encoded'] <= 2 * stats['published'], stats
+    assert stats['served'] > stats['encoded'], stats
+    assert slowest < 0.01
+
+    # A viewer that cannot keep up loses quality first, then frame rate, and recovers later
+    viewer = Viewer(fps=10, tier=0)
+    for _ in QUALITY_TIERS:
+        viewer.adapt(0.5)
+    assert viewer.tier == len(QUALITY_TIERS) - 1 and viewer.fps == 5
+    for _ in range(30 * 4):
+        viewer.adapt(0.001)
+    assert viewer.fps == 10 and viewer.tier == 0
+
+def test_idle_stream_frees_slots_of_departed_viewers():
+    """With no new frames, live viewers get keep-alives and closed ones lose their slot"""
+    broadcaster = FrameBroadcaster(max_viewers=1, keepalive=0.1)
+    server = MJPEGServer(broadcaster, host='127.0.0.1', port=0)
+    assert server.start()
+    broadcaster.publish(np.zeros((120, 160, 3), dtype=np.uint8))
+
+    def open_stream():
+        sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+        sock.sendall(b"GET /stream.mjpg HTTP/1.1\r\nHost: kiosk\r\n\r\n")
+        return sock
+
+    def read_parts(sock, parts):
+        received = b''
+        while received.count(b'Content-Type: image/jpeg') < parts:
+            received += sock.recv(65536)
+        return received
+
+    try:
+        # The kiosk publishes nothing more, yet the viewer keeps getting the last frame
+        first = open_stream()
+        read_parts(first, 3)
+        assert broadcaster.stats['published'] == 1
+        rejected = open_stream()
+        assert rejected.recv(1024).startswith(b'HTTP/1.0 503')
+        rejected.close()
+
+        # Once it disconnects its slot frees up for the next viewer
+        first.close()
+        deadline = time.time() + 5
+        while broadcaster.has_viewers() and time.time() < deadline:
+            time.sleep(0.02)
+        assert not broadcaster.has_viewers()
+        second = open_stream()
+        read_parts(second, 1)
+        second.close()
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    test_camera_stream_encodes_each_frame_once()
+    print("✓ Camera stream encodes each frame once")
+    test_idle_stream_frees_slots_of_departed_viewers()
+    print("✓ Idle stream frees slots of departed viewers")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for PresenceCache reloads and day rollover
+"""
+
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from attendance_database import AttendanceDatabase
+from presence_cache import PresenceCache
+
+def test_presence_cache_follows_other_connections():
+    """Check-ins written through another instance (as the web server would) reach the cache"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "attendance.db")
+        kiosk_db = AttendanceDatabase(path)
+        web_db = AttendanceDatabase(path)
+        kiosk_db.check_in("Early Bird")
+
+        presence = PresenceCache(kiosk_db, poll_interval=0.01)
+        presence.start()
+        assert presence.is_checked_in("Early Bird")
+        assert not presence.is_checked_in("Web User")
+
+        # A queued kiosk check-in survives reloads until it is written
+        presence.mark("Queued User")
+        web_db.check_in("Web User")
+        deadline = time.time() + 5
+        while not presence.is_checked_in("Web User") and time.time() < deadline:
+            time.sleep(0.01)
+        assert presence.is_checked_in("Web User")
+        assert presence.is_checked_in("Queued User")
+        assert presence.count() == 3
+
+        # Midnight starts an empty day before any reload
+        presence.stop()
+        presence._midnight = 0.0
+        presence._day = "2000-01-01"
+        assert not presence.is_checked_in("Early Bird")
+        assert presence.refresh()
+        assert presence.count() == 2
+
+        kiosk_db.close()
+        web_db.close()
+
+def test_day_rolls_over_once_and_loads_the_new_day():
+    """roll_over() empties the cache once per day; the next reload loads only that day"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        # Days ahead of today, so the lookups' own midnight check leaves them alone
+        first = date.today() + timedelta(days=1)
+        second = first + timedelta(days=1)
+        assert db.check_in_batch([("HERMAN YEH", f"{first} 08:00:00"), ("ANNA LEE", f"{second} 08:00:00")]) == [True, True]
+
+        presence = PresenceCache(db)
+        rollovers = presence.stats['rollovers']
+        presence.roll_over(datetime.combine(first, datetime.min.time()))
+        assert presence.refresh()
+        assert presence.is_checked_in("HERMAN YEH") and not presence.is_checked_in("ANNA LEE")
+        presence.mark("Queued User")
+
+        # Later the same day nothing is dropped
+        presence.roll_over(datetime.combine(first, datetime.max.time()))
+        assert presence.is_checked_in("Queued User") and presence.count() == 2
+        assert not presence.refresh()
+
+        # The next day starts empty, including marks that never reached the database
+        presence.roll_over(datetime.combine(second, datetime.min.time()))
+        assert presence.count() == 0
+        assert presence.refresh()
+        assert presence.is_checked_in("ANNA LEE") and not presence.is_checked_in("Queued User")
+        assert presence.stats['rollovers'] == rollovers + 2
+        db.close()
+
+if __name__ == "__main__":
+    test_presence_cache_follows_other_connections()
+    print("✓ Presence cache follows other connections")
+    test_day_rolls_over_once_and_loads_the_new_day()
+    print("✓ Day rolls over once and loads the new day")
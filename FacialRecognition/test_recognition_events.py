@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for RecognitionEventLog and compacting sightings into attendance
+"""
+
+import os
+import tempfile
+import threading
+from attendance_database import AttendanceDatabase
+from recognition_events import RecognitionEventLog
+
+def test_recognition_events_compact_while_recording():
+    """Sightings from several threads compact into one row and stable intervals per person"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"), timeout=5.0)
+        log = RecognitionEventLog(db, flush_interval=0.01, compact_interval=0.05, min_interval=0,
+                                  sightings_check_out=True)
+        log.start()
+
+        def camera(camera_id):
+            # Each camera sees everyone every minute from 08:00, with a break at 12:00-13:00
+            for minute in range(8 * 60, 17 * 60, 1):
+                if 12 * 60 <= minute < 13 * 60:
+                    continue
+                for person in range(camera_id, 20, 4):
+                    log.record(f"Person {person}", seen_at=f"2025-07-04 {minute // 60:02d}:{minute % 60:02d}:00")
+
+        cameras = [threading.Thread(target=camera, args=(i,)) for i in range(4)]
+        for thread in cameras:
+            thread.start()
+        # A kiosk check-in for the same people races the compactor; whichever writes first wins
+        kiosk_won = db.check_in_batch([("Person 0", "2025-07-04 07:45:00")]) == [True]
+        for thread in cameras:
+            thread.join()
+        log.stop()
+
+        assert log.stats['written'] == log.stats['recorded'] == 20 * 8 * 60
+        records = {r['name']: r for r in db.get_attendance_report("2025-07-04", "2025-07-04")}
+        assert len(records) == 20
+        assert records["Person 0"]['check_in_time'] == ("2025-07-04 07:45:00" if kiosk_won else "2025-07-04 08:00:00")
+        assert records["Person 1"]['check_in_time'] == "2025-07-04 08:00:00"
+        assert records["Person 1"]['check_out_time'] == "2025-07-04 16:59:00"
+        assert abs(records["Person 1"]['total_hours'] - (8 + 59 / 60)) < 1e-9
+
+        intervals = db.get_presence_intervals("Person 1", "2025-07-04")
+        assert [(i['start_time'][11:], i['end_time'][11:]) for i in intervals] == [
+            ("08:00:00", "11:59:00"), ("13:00:00", "16:59:00")]
+        assert sum(i['sightings'] for i in intervals) == 8 * 60
+
+        db.close()
+
+def test_sightings_do_not_check_out_by_default():
+    """Being seen after checking in leaves the person checked in"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        assert db.check_in_batch([("HERMAN YEH", "2025-07-04 08:00:00")]) == [True]
+        log = RecognitionEventLog(db, min_interval=0)
+        for seen_at in ("2025-07-04 07:50:00", "2025-07-04 09:00:00", "2025-07-04 10:30:00"):
+            log.record("HERMAN YEH", seen_at=seen_at)
+        log.record("ANNA LEE", seen_at="2025-07-04 09:15:00")
+        log.record("ANNA LEE", seen_at="2025-07-04 11:00:00")
+        log.flush()
+        stats = log.compact()
+        assert stats['check_ins'] == 2 and stats['check_outs'] == 0
+
+        records = {r['name']: r for r in db.get_attendance_report("2025-07-04", "2025-07-04")}
+        assert records["HERMAN YEH"]['check_in_time'] == "2025-07-04 07:50:00"
+        assert records["ANNA LEE"]['check_in_time'] == "2025-07-04 09:15:00"
+        assert all(r['check_out_time'] is None and r['total_hours'] is None for r in records.values())
+        # An explicit check-out is still accepted
+        assert db.check_out_batch([("HERMAN YEH", "2025-07-04 17:00:00")]) == [True]
+
+        # Sites without a check-out step opt in
+        db.append_recognition_events([("ANNA LEE", "2025-07-04 16:00:00", None)])
+        assert db.compact_recognition_events(sightings_check_out=True)['check_outs'] == 1
+        records = {r['name']: r for r in db.get_attendance_report("2025-07-04", "2025-07-04")}
+        assert records["ANNA LEE"]['check_out_time'] == "2025-07-04 16:00:00"
+        assert records["HERMAN YEH"]['check_out_time'] == "2025-07-04 17:00:00"
+        db.close()
+
+if __name__ == "__main__":
+    test_recognition_events_compact_while_recording()
+    print("✓ Recognition events compact while recording")
+    test_sightings_do_not_check_out_by_default()
+    print("✓ Sightings do not check out by default")
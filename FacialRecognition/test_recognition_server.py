@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the recognition server's worker pool
+"""
+
+import os
+import tempfile
+import threading
+import time
+from attendance_database import AttendanceDatabase
+import recognition_server
+from recognition_server import RecognitionPool, RecognitionCheckIn
+from benchmark_recognition import train_model, build_frames
+
+def test_recognition_pool_batches_concurrent_frames():
+    """Concurrent requests share micro-batches; recognised faces check in once"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "trainer.yml")
+        frames = build_frames(train_model(model_path, samples=20), count=8)
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        attendance = RecognitionCheckIn(db, spool_path=os.path.join(temp_dir, "spool.jsonl"))
+        attendance.start()
+        pool = RecognitionPool(model_path=model_path, workers=2, max_batch=8, max_wait=0.05,
+                               attendance=attendance)
+        pool.start()
+
+        results = []
+        def client(frame):
+            results.extend(pool.recognize([frame]))
+        clients = [threading.Thread(target=client, args=(frames[i % len(frames)],)) for i in range(16)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+
+        stats = pool.get_stats()
+        assert stats['frames'] == 16 and stats['batches'] < 16, stats
+        faces = [face for result in results for face in result['faces']]
+        assert faces and all(face['name'] == recognition_server.load_names()[1] for face in faces
+                             if face['quality'] is None)
+
+        # A batch request keeps its order; a bad frame fails alone
+        batch = pool.recognize([frames[0], b'not a jpeg', frames[1]], check_in=True)
+        assert batch[1] == {'faces': [], 'error': 'Could not decode image'}
+        outcomes = [face.get('attendance') for result in (batch[0], batch[2]) for face in result['faces']
+                    if face['quality'] is None]
+        assert outcomes.count('checked_in') == 1, outcomes
+
+        attendance.stop()
+        assert db.get_attendance_report(employee_name=recognition_server.load_names()[1])
+
+        # A full queue rejects the whole request instead of queueing it
+        pool.stop()
+        full = RecognitionPool(model_path=model_path, workers=1, max_queue=2)
+        assert full.recognize(frames[:3]) is None
+        assert full.get_stats()['rejected'] == 1
+        db.close()
+
+def test_timed_out_frames_are_never_processed():
+    """A frame whose request gave up waiting is skipped and checks nobody in"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "trainer.yml")
+        frames = build_frames(train_model(model_path, samples=20), count=2)
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        attendance = RecognitionCheckIn(db, spool_path=os.path.join(temp_dir, "spool.jsonl"))
+        attendance.start()
+        pool = RecognitionPool(model_path=model_path, workers=1, attendance=attendance)
+
+        # No worker is running yet, so both frames time out in the queue
+        assert pool.recognize(frames, check_in=True, timeout=0.05) == [{'faces': [], 'error': 'Timed out'}] * 2
+        pool.start()
+        deadline = time.time() + 10
+        while pool.get_stats()['cancelled'] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        pool.stop()
+        attendance.stop()
+
+        stats = pool.get_stats()
+        assert stats['cancelled'] == 2 and stats['faces'] == 0, stats
+        assert db.get_attendance_report() == []
+        db.close()
+
+def test_sightings_are_checked_in_by_the_queue_alone():
+    """Compaction builds presence intervals but leaves the queue's check-in alone"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        attendance = RecognitionCheckIn(db, spool_path=os.path.join(temp_dir, "spool.jsonl"))
+        compactions = []
+        compact = db.compact_recognition_events
+
+        def recording_compact(*args, **kwargs):
+            compactions.append(compact(*args, **kwargs))
+            return compactions[-1]
+
+        db.compact_recognition_events = recording_compact
+        attendance.start()
+
+        # A sighting earlier than the check-in would move it if compaction also wrote check-ins
+        today = time.strftime("%Y-%m-%d")
+        assert attendance.event_log.record("HERMAN YEH", seen_at=f"{today} 00:00:01")
+        assert attendance.handle("HERMAN YEH", 40.0) == 'checked_in'
+        assert attendance.handle("HERMAN YEH", 40.0) == 'already_checked_in'
+        attendance.stop()
+
+        records = db.get_attendance_report(employee_name="HERMAN YEH")
+        assert len(records) == 1 and records[0]['check_in_time'] != f"{today} 00:00:01"
+        assert compactions and all(stats['check_ins'] == 0 for stats in compactions), compactions
+        intervals = db.get_presence_intervals("HERMAN YEH", today)
+        assert intervals and intervals[0]['start_time'] == f"{today} 00:00:01"
+        db.close()
+
+if __name__ == "__main__":
+    test_recognition_pool_batches_concurrent_frames()
+    print("✓ Recognition pool batches concurrent frames")
+    test_timed_out_frames_are_never_processed()
+    print("✓ Timed-out frames are never processed")
+    test_sightings_are_checked_in_by_the_queue_alone()
+    print("✓ Sightings are checked in by the queue alone")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for RegisterLog: what it writes must import back on the right day
+"""
+
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+from attendance_database import AttendanceDatabase
+from register_log import RegisterLog
+
+def test_register_log_round_trips_through_import():
+    """Sightings logged on a day above 12 import as check-ins on that day"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log = RegisterLog(directory=temp_dir, cooldown=60.0, flush_interval=0.0)
+        start = datetime(2025, 7, 15, 8, 0, 0)
+        assert log.log("HERMAN YEH", now=start)
+        assert not log.log("HERMAN YEH", now=start + timedelta(seconds=30))  # within the cooldown
+        assert log.log("ANNA LEE", now=start + timedelta(minutes=5))
+        assert log.log("HERMAN YEH", now=start + timedelta(hours=2))
+        # A new day rotates to a new file
+        assert log.log("ANNA LEE", now=datetime(2025, 7, 16, 9, 30, 0))
+        log.close()
+
+        paths = sorted(os.path.join(temp_dir, name) for name in os.listdir(temp_dir))
+        assert [os.path.basename(path) for path in paths] == [
+            "20250715_register_log.csv", "20250716_register_log.csv"]
+
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        assert db.import_csv_files(paths) == 3
+        records = {(r['name'], r['date']): r['check_in_time'] for r in db.get_attendance_report()}
+        assert records == {
+            ("HERMAN YEH", "2025-07-15"): "2025-07-15 08:00:00",
+            ("ANNA LEE", "2025-07-15"): "2025-07-15 08:05:00",
+            ("ANNA LEE", "2025-07-16"): "2025-07-16 09:30:00",
+        }, records
+        db.close()
+
+def test_register_log_reopens_todays_file():
+    """A restart appends to the day's file and remembers who was logged"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        now = datetime.now()
+        log = RegisterLog(directory=temp_dir)
+        log.log("HERMAN YEH", now=now)
+        log.close()
+
+        log = RegisterLog(directory=temp_dir)
+        log.log("ANNA LEE", now=now)
+        assert log.seen_today("HERMAN YEH") and log.seen_today("ANNA LEE")
+        log.close()
+
+        with open(log.path) as f:
+            lines = f.read().split('\n')
+        assert lines[0] == 'Name, Datetime' and len(lines) == 3, lines
+
+def test_register_log_flushes_when_nobody_else_is_seen():
+    """The last sighting reaches disk once the flush interval passes, without another log()"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log = RegisterLog(directory=temp_dir, flush_interval=0.05)
+        log.log("HERMAN YEH")
+
+        def on_disk():
+            with open(log.path) as f:
+                return f.read()
+
+        assert not log.flush_if_due()
+        assert "HERMAN YEH" not in on_disk()
+        time.sleep(0.1)
+        # What the kiosk loop calls every frame
+        assert log.flush_if_due()
+        assert "HERMAN YEH" in on_disk()
+        assert not log.flush_if_due()
+        log.close()
+
+if __name__ == "__main__":
+    test_register_log_round_trips_through_import()
+    print("✓ Register log round trips through import")
+    test_register_log_reopens_todays_file()
+    print("✓ Register log reopens today's file")
+    test_register_log_flushes_when_nobody_else_is_seen()
+    print("✓ Register log flushes when nobody else is seen")
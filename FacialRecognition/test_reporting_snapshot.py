@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for ReportingSnapshot publishing and retiring report databases
+"""
+
+import os
+import tempfile
+import threading
+import time
+from attendance_database import AttendanceDatabase
+from reporting_snapshot import ReportingSnapshot
+
+def test_reporting_snapshot_isolates_reports():
+    """Snapshot publishing and report queries do not slow check-ins"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"), timeout=2.0)
+        assert db.check_in_batch([(f"Seed {i}", "2025-07-04 08:00:00") for i in range(2000)]) is not None
+        snapshot = ReportingSnapshot(db.db_path, interval=0.05)
+        snapshot.start()
+        errors = []
+        stop_reading = threading.Event()
+        write_latencies = []
+
+        def reporter():
+            while not stop_reading.is_set():
+                report_db = snapshot.database()
+                try:
+                    assert report_db.read_only
+                    assert report_db.count_attendance() >= 2000
+                    for _ in report_db.iter_attendance_csv():
+                        pass
+                except Exception as e:
+                    errors.append(str(e))
+
+        readers = [threading.Thread(target=reporter) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        # Keep checking people in across several snapshot publishes
+        deadline = time.time() + 10
+        while snapshot.stats['published'] < 4 and time.time() < deadline:
+            start = time.time()
+            name = f"Writer {len(write_latencies)}"
+            if not db.check_in(name):
+                errors.append(f"check-in failed for {name}")
+            write_latencies.append(time.time() - start)
+        stop_reading.set()
+        for thread in readers:
+            thread.join()
+        snapshot.stop()
+
+        assert not errors, errors[:5]
+        assert snapshot.stats['published'] >= 4
+        assert snapshot.age() is not None
+        assert max(write_latencies) < 1.0, f"Check-in waited {max(write_latencies):.2f}s"
+        # The next snapshot includes the new check-ins
+        snapshot.publish()
+        assert snapshot.database().count_attendance() == 2000 + len(write_latencies)
+
+        db.close()
+
+def test_replaced_snapshot_databases_are_closed():
+    """Databases on replaced snapshots close after the grace period, not before"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = AttendanceDatabase(os.path.join(temp_dir, "attendance.db"))
+        db.check_in("HERMAN YEH")
+        snapshot = ReportingSnapshot(db.db_path, retire_after=0.2)
+        opened = []
+        for _ in range(3):
+            assert snapshot.publish()
+            opened.append(snapshot.database())
+        assert len({id(report_db) for report_db in opened}) == 3
+
+        # Still inside the grace period: a stream on an old snapshot can finish
+        assert all(report_db.initialized for report_db in opened)
+        assert opened[0].count_attendance() == 1
+
+        time.sleep(0.3)
+        assert snapshot.database() is opened[-1]
+        assert [report_db.initialized for report_db in opened] == [False, False, True]
+        assert snapshot.stats['closed'] == 2
+        assert opened[-1].count_attendance() == 1
+
+        snapshot.stop()
+        assert not opened[-1].initialized
+        db.close()
+
+if __name__ == "__main__":
+    test_reporting_snapshot_isolates_reports()
+    print("✓ Reporting snapshot isolates reports")
+    test_replaced_snapshot_databases_are_closed()
+    print("✓ Replaced snapshot databases are closed")
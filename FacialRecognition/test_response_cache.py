@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for ResponseCache: ETags, 304s and invalidation on database writes
+"""
+
+import os
+import tempfile
+import attendance_web_server as web
+from response_cache import ResponseCache
+
+class FakeDatabase:
+    """Stands in for AttendanceDatabase.data_generation()"""
+
+    def __init__(self):
+        self.generation = 1
+
+    def data_generation(self):
+        return self.generation
+
+def test_conditional_answers_304_until_the_data_changes():
+    """A matching If-None-Match gets an empty 304; a write gives a new body and ETag"""
+    db = FakeDatabase()
+    cache = ResponseCache(db)
+    builds = []
+
+    def build():
+        builds.append(db.generation)
+        return f'{{"generation": {db.generation}}}'
+
+    status, body, etag = cache.conditional('summary', build, 'application/json')
+    assert (status, body) == (200, b'{"generation": 1}') and builds == [1]
+    assert cache.conditional('summary', build, 'application/json', f'"{etag}"') == (304, b'', etag)
+    assert cache.conditional('summary', build, 'application/json', f'W/"other", "{etag}"')[0] == 304
+    assert cache.conditional('summary', build, 'application/json', '"other"')[0] == 200
+    assert builds == [1]
+
+    db.generation = 2
+    status, body, new_etag = cache.conditional('summary', build, 'application/json', f'"{etag}"')
+    assert (status, body) == (200, b'{"generation": 2}') and new_etag != etag
+    assert builds == [1, 2]
+    assert cache.get_stats()['not_modified'] == 2
+
+def test_write_invalidates_the_cached_dashboard():
+    """The dashboard and /api/summary are served from cache until someone checks in"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        web.reset_worker_state()
+        web.db_path = os.path.join(temp_dir, "attendance.db")
+        web.publish_snapshot = False
+        client = web.app.test_client()
+        try:
+            web.get_db().check_in("HERMAN YEH")
+            first = client.get('/dashboard')
+            assert first.status_code == 200 and b'HERMAN YEH' in first.data
+            etag = first.headers['ETag']
+            cache = web.get_response_cache()
+            misses = cache.get_stats()['misses']
+
+            again = client.get('/dashboard', headers={'If-None-Match': etag})
+            assert again.status_code == 304 and again.data == b''
+            assert cache.get_stats()['misses'] == misses
+
+            summary = client.get('/api/summary')
+            assert client.get('/api/summary', headers={'If-None-Match': summary.headers['ETag']}).status_code == 304
+
+            # Any commit moves the data generation on, as a kiosk check-in would
+            web.get_db().check_in("ANNA LEE")
+            changed = client.get('/dashboard', headers={'If-None-Match': etag})
+            assert changed.status_code == 200 and b'ANNA LEE' in changed.data
+            assert changed.headers['ETag'] != etag
+            new_summary = client.get('/api/summary', headers={'If-None-Match': summary.headers['ETag']})
+            assert new_summary.status_code == 200
+            assert new_summary.get_json()['present_employees'] == summary.get_json()['present_employees'] + 1
+        finally:
+            web.shutdown()
+
+if __name__ == "__main__":
+    test_conditional_answers_304_until_the_data_changes()
+    print("✓ Conditional answers 304 until the data changes")
+    test_write_invalidates_the_cached_dashboard()
+    print("✓ Write invalidates the cached dashboard")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for TTLCache expiry, rate limiting and LRU eviction
+"""
+
+from ttl_cache import TTLCache
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def test_entries_expire_after_ttl():
+    """An entry is returned until ttl seconds have passed, then dropped"""
+    clock = FakeClock()
+    cache = TTLCache(ttl=5.0, clock=clock)
+    cache.set("HERMAN YEH", "present")
+
+    clock.advance(4.9)
+    assert cache.get("HERMAN YEH") == "present" and "HERMAN YEH" in cache
+    clock.advance(0.1)
+    assert cache.get("HERMAN YEH", "gone") == "gone"
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.expired) == (1, 1, 1)
+
+    # Setting again starts a new window
+    cache.set("HERMAN YEH", "back")
+    clock.advance(4.9)
+    assert cache.get("HERMAN YEH") == "back"
+
+def test_allow_lets_a_key_through_once_per_ttl():
+    """Suppressed calls do not extend the window"""
+    clock = FakeClock()
+    cache = TTLCache(ttl=5.0, clock=clock)
+    assert cache.allow("HERMAN YEH")
+    for _ in range(4):
+        clock.advance(1.0)
+        assert not cache.allow("HERMAN YEH")
+    clock.advance(1.0)
+    assert cache.allow("HERMAN YEH")
+    assert cache.allow("ANNA LEE")
+    assert (cache.allowed, cache.suppressed) == (3, 4)
+
+def test_least_recently_used_entry_is_evicted_at_capacity():
+    """A full cache evicts the entry used longest ago, after dropping expired ones"""
+    clock = FakeClock()
+    cache = TTLCache(ttl=60.0, max_entries=3, clock=clock)
+    for name in ("A", "B", "C"):
+        cache.set(name, name.lower())
+        clock.advance(1.0)
+
+    # Using A makes B the least recently used
+    assert cache.get("A") == "a"
+    cache.set("D", "d")
+    assert len(cache) == 3 and cache.evicted == 1
+    assert "B" not in cache
+    assert [cache.get(name) for name in ("A", "C", "D")] == ["a", "c", "d"]
+
+    # Expired entries make room before anything live is evicted
+    clock.advance(60.0)
+    cache.set("E", "e")
+    assert len(cache) == 1 and cache.evicted == 1 and cache.expired == 3
+
+    # Placeholder identities seen once each never grow the cache past its bound
+    for i in range(100):
+        cache.allow(f"User_{i}")
+    assert len(cache) == 3 and cache.evicted == 1 + 98
+    assert cache.get_stats()['entries'] == 3
+
+if __name__ == "__main__":
+    test_entries_expire_after_ttl()
+    print("✓ Entries expire after ttl")
+    test_allow_lets_a_key_through_once_per_ttl()
+    print("✓ Allow lets a key through once per ttl")
+    test_least_recently_used_entry_is_evicted_at_capacity()
+    print("✓ Least recently used entry is evicted at capacity")
@@ -0,0 +1,143 @@
+'''
+TTL Cache
+Size-bounded cache whose entries expire, usable as a per-key rate limiter
+'''
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+_MISSING = object()
+
+class TTLCache:
+    """Mapping with a per-entry time to live and least-recently-used eviction"""
+
+    def __init__(self, ttl: float, max_entries: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize the cache
+
+        Every operation is O(1): entries live in an OrderedDict ordered by
+        last use, expired entries are dropped when they are looked up or
+        reach the front, and once max_entries is reached the least recently
+        used entry is evicted. Identities that are seen once and never again
+        (misrecognitions, User_N placeholders) therefore cannot pile up.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+        self.hits = 0
+        self.misses = 0
+        self.allowed = 0
+        self.suppressed = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _lookup(self, key: Hashable, now: float) -> Any:
+        """Live value for key, dropping it if it has expired; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= now:
+            del self._entries[key]
+            self.expired += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: Hashable, value: Any, now: float):
+        """Insert or refresh key; caller holds the lock"""
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        # Drop expired entries at the front, then the least recently used if still full
+        while self._entries:
+            oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[oldest_key]
+            self.expired += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, key: Hashable, default: Any = None, now: float = None) -> Any:
+        """Value for key if it has not expired, else default"""
+        with self._lock:
+            value = self._lookup(key, self.clock() if now is None else now)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any = True, now: float = None):
+        """Store value for key for the next ttl seconds"""
+        with self._lock:
+            self._store(key, value, self.clock() if now is None else now)
+
+    def allow(self, key: Hashable, now: float = None) -> bool:
+        """Rate limit: True at most once per ttl seconds per key
+
+        A suppressed call does not extend the window, so a person standing
+        in front of the camera is let through again every ttl seconds.
+        """
+        with self._lock:
+            now = self.clock() if now is None else now
+            if self._lookup(key, now) is not _MISSING:
+                self.suppressed += 1
+                return False
+            self._store(key, True, now)
+            self.allowed += 1
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key, self.clock()) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the entries"""
+        with self._lock:
+            return sys.getsizeof(self._entries) + sum(
+                sys.getsizeof(key) + sys.getsizeof(entry) for key, entry in self._entries.items())
+
+    def get_stats(self) -> Dict:
+        """Get hit, suppression and eviction counters and the current size"""
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'allowed': self.allowed,
+            'suppressed': self.suppressed,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'memory_bytes': self.memory_bytes()
+        }
+
+    def print_stats(self, label: str = "Cache"):
+        """Print the counters"""
+        stats = self.get_stats()
+        print(f"{label}: {stats['entries']}/{stats['max_entries']} entries, "
+              f"~{stats['memory_bytes'] / 1024:.1f} KiB, {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['allowed']} allowed, {stats['suppressed']} suppressed, "
+              f"{stats['expired']} expired, {stats['evicted']} evicted")